@@ -1,10 +1,13 @@
-from django.core.management.base import BaseCommand
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+
+from django.core.management.base import BaseCommand, CommandError
 from django.core.management.color import no_style
-from django.db import connection
+from django.db import connection, connections
 from django.db.models import Q
 
 from dcim.models import CablePath, ConsolePort, ConsoleServerPort, Interface, PowerFeed, PowerOutlet, PowerPort
-from dcim.signals import create_cablepath
+from dcim.tracing import CableGraph
 
 ENDPOINT_MODELS = (
     ConsolePort,
@@ -15,6 +18,27 @@ ENDPOINT_MODELS = (
     PowerPort
 )
 
+CHUNK_SIZE = 5000
+
+# The cable graph is loaded once by the parent process and inherited by worker processes
+graph = None
+
+
+def trace_chunk(model, origin_ids):
+    """
+    Trace and save the paths originating from a chunk of objects.
+    """
+    return graph.create_paths(model, origin_ids)
+
+
+def get_site_field(model):
+    """
+    Return the name of the field by which origins of the given model are grouped by site.
+    """
+    if model is PowerFeed:
+        return 'power_panel__site'
+    return 'device__site'
+
 
 class Command(BaseCommand):
     help = "Generate any missing cable paths among all cable termination objects in NetBox"
@@ -28,6 +52,10 @@ class Command(BaseCommand):
             "--no-input", action='store_true', dest='no_input',
             help="Do not prompt user for any input/confirmation"
         )
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="The number of worker processes among which paths are traced, sharded by site (default: 1)"
+        )
 
     def draw_progress_bar(self, percentage):
         """
@@ -37,6 +65,8 @@ class Command(BaseCommand):
         self.stdout.write(f"\r  [{'#' * bar_size}{' ' * (20 - bar_size)}] {int(percentage)}%", ending='')
 
     def handle(self, *model_names, **options):
+        if options['workers'] < 1:
+            raise CommandError("The number of workers must be at least 1.")
 
         # If --force was passed, first delete all existing CablePaths
         if options['force']:
@@ -66,25 +96,66 @@ class Command(BaseCommand):
                 for sql in sequence_sql:
                     cursor.execute(sql)
 
+        # Load the cable graph into memory
+        global graph
+        self.stdout.write('Loading cable graph...')
+        graph = CableGraph.load()
+        self.stdout.write(self.style.SUCCESS(
+            f'  Loaded {len(graph.cables)} cables and {len(graph.cable_terminations)} terminations'
+        ))
+
+        # Trace paths in parallel among worker processes. Database connections must be closed prior to forking so
+        # that each worker establishes its own.
+        executor = None
+        if options['workers'] > 1:
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('fork')
+            )
+            # Start the worker processes before this process opens a new connection
+            executor.submit(connections.close_all).result()
+
         # Retrace paths
-        for model in ENDPOINT_MODELS:
-            params = Q(cable__isnull=False)
-            if hasattr(model, 'wireless_link'):
-                params |= Q(wireless_link__isnull=False)
-            origins = model.objects.filter(params)
-            if not options['force']:
-                origins = origins.filter(_path__isnull=True)
-            origins_count = origins.count()
-            if not origins_count:
-                self.stdout.write(f'Found no missing {model._meta.verbose_name} paths; skipping')
-                continue
-            self.stdout.write(f'Retracing {origins_count} cabled {model._meta.verbose_name_plural}...')
-            i = 0
-            for i, obj in enumerate(origins, start=1):
-                create_cablepath([obj])
-                if not i % 100:
-                    self.draw_progress_bar(i * 100 / origins_count)
-            self.draw_progress_bar(100)
-            self.stdout.write(self.style.SUCCESS(f'\n  Retraced {i} {model._meta.verbose_name_plural}'))
+        try:
+            for model in ENDPOINT_MODELS:
+                self.trace_model(model, executor, options['force'])
+        finally:
+            if executor:
+                executor.shutdown()
 
         self.stdout.write(self.style.SUCCESS('Finished.'))
+
+    def trace_model(self, model, executor, force):
+        params = Q(cable__isnull=False)
+        if hasattr(model, 'wireless_link'):
+            params |= Q(wireless_link__isnull=False)
+        origins = model.objects.filter(params)
+        if not force:
+            origins = origins.filter(_path__isnull=True)
+
+        # Order origins by site, so that each chunk is confined to as few sites as possible
+        origin_ids = list(origins.order_by(get_site_field(model), 'pk').values_list('pk', flat=True))
+        origins_count = len(origin_ids)
+        if not origins_count:
+            self.stdout.write(f'Found no missing {model._meta.verbose_name} paths; skipping')
+            return
+        self.stdout.write(f'Retracing {origins_count} cabled {model._meta.verbose_name_plural}...')
+
+        chunks = [origin_ids[i:i + CHUNK_SIZE] for i in range(0, origins_count, CHUNK_SIZE)]
+        if executor:
+            results = (
+                future.result() for future in as_completed([
+                    executor.submit(trace_chunk, model, chunk) for chunk in chunks
+                ])
+            )
+        else:
+            results = (trace_chunk(model, chunk) for chunk in chunks)
+
+        i = count = 0
+        for i, (created, errors) in enumerate(results, start=1):
+            count += created
+            for pk, error in errors:
+                self.stdout.write(self.style.WARNING(f'\n  Unable to trace {model._meta.verbose_name} {pk}: {error}'))
+            self.draw_progress_bar(i * 100 / len(chunks))
+        self.stdout.write(self.style.SUCCESS(f'\n  Retraced {count} {model._meta.verbose_name_plural}'))
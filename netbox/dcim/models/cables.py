@@ -1,6 +1,7 @@
 import itertools
 
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.postgres.indexes import GinIndex
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.dispatch import Signal
@@ -434,7 +435,8 @@ class CablePath(models.Model):
     if the instance represents a complete end-to-end path from origin(s) to destination(s). `is_split` is True if the
     path diverges across multiple cables.
 
-    `_nodes` retains a flattened list of all nodes within the path to enable simple filtering.
+    `_nodes` retains a flattened list of all nodes within the path to enable simple filtering. It is indexed to
+    enable the efficient retrieval of all paths which traverse a particular object.
     """
     path = models.JSONField(
         verbose_name=_('path'),
@@ -457,6 +459,9 @@ class CablePath(models.Model):
     _netbox_private = True
 
     class Meta:
+        indexes = (
+            GinIndex(fields=['_nodes'], name='dcim_cablepath_nodes'),
+        )
         verbose_name = _('cable path')
         verbose_name_plural = _('cable paths')
 
@@ -520,16 +525,21 @@ class CablePath(models.Model):
         return int(len(self.path) / 3)
 
     @classmethod
-    def from_origin(cls, terminations):
+    def from_origin(cls, terminations, context=None):
         """
         Create a new CablePath instance as traced from the given termination objects. These can be any object to which a
         Cable or WirelessLink connects (interfaces, console ports, circuit termination, etc.). All terminations must be
         of the same type and must belong to the same parent object.
+
+        A TraceContext may be passed to share memoized lookups among multiple traces.
         """
         from circuits.models import CircuitTermination
+        from dcim.tracing import TraceContext
 
         if not terminations:
             return None
+        if context is None:
+            context = TraceContext()
 
         # Ensure all originating terminations are attached to the same link
         if len(terminations) > 1 and not all(t.link == terminations[0].link for t in terminations[1:]):
@@ -599,22 +609,21 @@ class CablePath(models.Model):
             # Step 6: Determine the far-end terminations
             if isinstance(links[0], Cable):
                 termination_type = ObjectType.objects.get_for_model(terminations[0])
-                local_cable_terminations = CableTermination.objects.filter(
-                    termination_type=termination_type,
-                    termination_id__in=[t.pk for t in terminations]
-                )
+                termination_ids = {t.pk for t in terminations}
+                cable_terminations = context.get_cable_terminations([link.pk for link in links])
 
-                q_filter = Q()
-                for lct in local_cable_terminations:
-                    cable_end = 'A' if lct.cable_end == 'B' else 'B'
-                    q_filter |= Q(cable=lct.cable, cable_end=cable_end)
+                far_ends = {
+                    (ct.cable_id, 'A' if ct.cable_end == 'B' else 'B') for ct in cable_terminations
+                    if ct.termination_type_id == termination_type.pk and ct.termination_id in termination_ids
+                }
 
-                # Make sure this filter has been populated; if not, we have probably been given invalid data
-                if not q_filter:
+                # Make sure at least one far end has been found; if not, we have probably been given invalid data
+                if not far_ends:
                     break
 
-                remote_cable_terminations = CableTermination.objects.filter(q_filter)
-                remote_terminations = [ct.termination for ct in remote_cable_terminations]
+                remote_terminations = [
+                    ct.termination for ct in cable_terminations if (ct.cable_id, ct.cable_end) in far_ends
+                ]
             else:
                 # WirelessLink
                 remote_terminations = [
@@ -638,9 +647,7 @@ class CablePath(models.Model):
 
             if isinstance(remote_terminations[0], FrontPort):
                 # Follow FrontPorts to their corresponding RearPorts
-                rear_ports = RearPort.objects.filter(
-                    pk__in=[t.rear_port_id for t in remote_terminations]
-                )
+                rear_ports = context.get_rear_ports(remote_terminations)
                 if len(rear_ports) > 1 or rear_ports[0].positions > 1:
                     position_stack.append([fp.rear_port_position for fp in remote_terminations])
 
@@ -648,10 +655,7 @@ class CablePath(models.Model):
 
             elif isinstance(remote_terminations[0], RearPort):
                 if len(remote_terminations) == 1 and remote_terminations[0].positions == 1:
-                    front_ports = FrontPort.objects.filter(
-                        rear_port_id__in=[rp.pk for rp in remote_terminations],
-                        rear_port_position=1
-                    )
+                    front_ports = context.get_front_ports(remote_terminations, positions=[1])
                 # Obtain the individual front ports based on the termination and all positions
                 elif len(remote_terminations) > 1 and position_stack:
                     positions = position_stack.pop()
@@ -663,22 +667,17 @@ class CablePath(models.Model):
                         )
 
                     # Get our front ports
-                    q_filter = Q()
-                    for rt in remote_terminations:
-                        position = positions.pop()
-                        q_filter |= Q(rear_port_id=rt.pk, rear_port_position=position)
-                    if q_filter is Q():
-                        raise UnsupportedCablePath(_("Remote termination position filter is missing"))
-                    front_ports = FrontPort.objects.filter(q_filter)
+                    rear_port_positions = {(rt.pk, positions.pop()) for rt in remote_terminations}
+                    front_ports = [
+                        fp for fp in context.get_front_ports(remote_terminations)
+                        if (fp.rear_port_id, fp.rear_port_position) in rear_port_positions
+                    ]
                 # Obtain the individual front ports based on the termination and position
                 elif position_stack:
-                    front_ports = FrontPort.objects.filter(
-                        rear_port_id=remote_terminations[0].pk,
-                        rear_port_position__in=position_stack.pop()
-                    )
+                    front_ports = context.get_front_ports(remote_terminations[:1], positions=position_stack.pop())
                 # If all rear ports have a single position, we can just get the front ports
                 elif all([rp.positions == 1 for rp in remote_terminations]):
-                    front_ports = FrontPort.objects.filter(rear_port_id__in=[rp.pk for rp in remote_terminations])
+                    front_ports = context.get_front_ports(remote_terminations)
 
                     if len(front_ports) != len(remote_terminations):
                         # Some rear ports does not have a front port
@@ -696,10 +695,7 @@ class CablePath(models.Model):
                 if len(remote_terminations) > 1:
                     is_split = True
                     break
-                circuit_termination = CircuitTermination.objects.filter(
-                    circuit=remote_terminations[0].circuit,
-                    term_side='Z' if remote_terminations[0].term_side == 'A' else 'A'
-                ).first()
+                circuit_termination = context.get_peer_termination(remote_terminations[0])
                 if circuit_termination is None:
                     break
                 elif circuit_termination._provider_network:
@@ -739,11 +735,11 @@ class CablePath(models.Model):
             is_split=is_split
         )
 
-    def retrace(self):
+    def retrace(self, context=None):
         """
         Retrace the path from the currently-defined originating termination(s)
         """
-        _new = self.from_origin(self.origins)
+        _new = self.from_origin(self.origins, context=context)
         if _new:
             self.path = _new.path
             self.is_complete = _new.is_complete
@@ -1,10 +1,17 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from circuits.models import *
 from dcim.choices import LinkStatusChoices
 from dcim.models import *
 from dcim.svg import CableTraceSVG
-from dcim.utils import object_to_path_node
+from dcim.tracing import TraceContext
+from dcim.utils import object_to_path_node, retrace_paths
 from utilities.exceptions import AbortRequest
 
 
@@ -17,6 +24,7 @@ class CablePathTestCase(TestCase):
         2XX: Test different cable topologies
         3XX: Test responses to changes in existing objects
         4XX: Test to exclude specific cable topologies
+        5XX: Test bulk tracing of paths
     """
     @classmethod
     def setUpTestData(cls):
@@ -2510,3 +2518,157 @@ class CablePathTestCase(TestCase):
             is_active=True
         )
         self.assertEqual(CablePath.objects.count(), 0)
+
+    def test_501_bulk_trace_paths(self):
+        """
+        [IF1] --C1-- [FP1:1] [RP1] --C3-- [RP2] [FP2:1] --C4-- [IF3]
+        [IF2] --C2-- [FP1:2]                    [FP2:2] --C5-- [CT1] [CT2] --C6-- [IF4]
+        """
+        interface1 = Interface.objects.create(device=self.device, name='Interface 1')
+        interface2 = Interface.objects.create(device=self.device, name='Interface 2')
+        interface3 = Interface.objects.create(device=self.device, name='Interface 3')
+        interface4 = Interface.objects.create(device=self.device, name='Interface 4')
+        rearport1 = RearPort.objects.create(device=self.device, name='Rear Port 1', positions=4)
+        rearport2 = RearPort.objects.create(device=self.device, name='Rear Port 2', positions=4)
+        frontport1_1 = FrontPort.objects.create(
+            device=self.device, name='Front Port 1:1', rear_port=rearport1, rear_port_position=1
+        )
+        frontport1_2 = FrontPort.objects.create(
+            device=self.device, name='Front Port 1:2', rear_port=rearport1, rear_port_position=2
+        )
+        frontport2_1 = FrontPort.objects.create(
+            device=self.device, name='Front Port 2:1', rear_port=rearport2, rear_port_position=1
+        )
+        frontport2_2 = FrontPort.objects.create(
+            device=self.device, name='Front Port 2:2', rear_port=rearport2, rear_port_position=2
+        )
+        circuittermination1 = CircuitTermination.objects.create(
+            circuit=self.circuit, termination=self.site, term_side='A'
+        )
+        circuittermination2 = CircuitTermination.objects.create(
+            circuit=self.circuit, termination=self.site, term_side='Z'
+        )
+        Cable(a_terminations=[interface1], b_terminations=[frontport1_1]).save()
+        Cable(a_terminations=[interface2], b_terminations=[frontport1_2]).save()
+        Cable(a_terminations=[rearport1], b_terminations=[rearport2]).save()
+        Cable(a_terminations=[frontport2_1], b_terminations=[interface3]).save()
+        Cable(a_terminations=[frontport2_2], b_terminations=[circuittermination1]).save()
+        Cable(
+            a_terminations=[circuittermination2], b_terminations=[interface4], status=LinkStatusChoices.STATUS_PLANNED
+        ).save()
+
+        def get_paths():
+            return {
+                (tuple(map(tuple, cp.path)), cp.is_active, cp.is_complete, cp.is_split)
+                for cp in CablePath.objects.all()
+            }
+
+        # Record the paths traced incrementally
+        paths = get_paths()
+        self.assertEqual(len(paths), 4)
+
+        # An invalid number of workers is rejected before any paths are deleted
+        with self.assertRaises(CommandError):
+            call_command('trace_paths', force=True, no_input=True, workers=0, stdout=StringIO())
+        self.assertEqual(get_paths(), paths)
+
+        # Retrace all paths in bulk
+        call_command('trace_paths', force=True, no_input=True, stdout=StringIO())
+        self.assertEqual(get_paths(), paths)
+        for interface in (interface1, interface2, interface3, interface4):
+            interface.refresh_from_db()
+            self.assertPathIsSet(interface, CablePath.objects.get(pk=interface._path_id))
+
+    def test_502_trace_context(self):
+        """
+        [IF1] --C1-- [FP1:1] [RP1] --C3-- [RP2] [FP2:1] --C4-- [IF3]
+        [IF2] --C2-- [FP1:2]                    [FP2:2] --C5-- [IF4]
+        """
+        interfaces = [
+            Interface.objects.create(device=self.device, name=f'Interface {i}') for i in range(1, 5)
+        ]
+        rearport1 = RearPort.objects.create(device=self.device, name='Rear Port 1', positions=4)
+        rearport2 = RearPort.objects.create(device=self.device, name='Rear Port 2', positions=4)
+        frontport1_1 = FrontPort.objects.create(
+            device=self.device, name='Front Port 1:1', rear_port=rearport1, rear_port_position=1
+        )
+        frontport1_2 = FrontPort.objects.create(
+            device=self.device, name='Front Port 1:2', rear_port=rearport1, rear_port_position=2
+        )
+        frontport2_1 = FrontPort.objects.create(
+            device=self.device, name='Front Port 2:1', rear_port=rearport2, rear_port_position=1
+        )
+        frontport2_2 = FrontPort.objects.create(
+            device=self.device, name='Front Port 2:2', rear_port=rearport2, rear_port_position=2
+        )
+        cable1 = Cable(a_terminations=[interfaces[0]], b_terminations=[frontport1_1])
+        cable1.save()
+        cable2 = Cable(a_terminations=[interfaces[1]], b_terminations=[frontport1_2])
+        cable2.save()
+        cable3 = Cable(a_terminations=[rearport1], b_terminations=[rearport2])
+        cable3.save()
+        cable4 = Cable(a_terminations=[frontport2_1], b_terminations=[interfaces[2]])
+        cable4.save()
+        cable5 = Cable(a_terminations=[frontport2_2], b_terminations=[interfaces[3]])
+        cable5.save()
+
+        # Trace paths from the first two interfaces using a shared context
+        context = TraceContext()
+        interface1, interface2 = Interface.objects.filter(pk__in=[interfaces[0].pk, interfaces[1].pk])
+        with CaptureQueriesContext(connection) as first_trace:
+            path1 = CablePath.from_origin([interface1], context=context)
+        with CaptureQueriesContext(connection) as second_trace:
+            path2 = CablePath.from_origin([interface2], context=context)
+
+        self.assertEqual(path1.path, self._get_cablepath(
+            (interfaces[0], cable1, frontport1_1, rearport1, cable3, rearport2, frontport2_1, cable4, interfaces[2])
+        ).path)
+        self.assertEqual(path2.path, self._get_cablepath(
+            (interfaces[1], cable2, frontport1_2, rearport1, cable3, rearport2, frontport2_2, cable5, interfaces[3])
+        ).path)
+
+        # Lookups of the shared rear ports & trunk cable should be reused by the second trace
+        self.assertLess(len(second_trace), len(first_trace))
+
+    def test_503_retrace_paths(self):
+        """
+        [IF1] --C1-- [FP1:1] [RP1] --C3-- [RP2] [FP2:1] --C4-- [IF3]
+        [IF2] --C2-- [FP1:2]                    [FP2:2] --C5-- [IF4]
+        """
+        interfaces = [
+            Interface.objects.create(device=self.device, name=f'Interface {i}') for i in range(1, 5)
+        ]
+        rearport1 = RearPort.objects.create(device=self.device, name='Rear Port 1', positions=4)
+        rearport2 = RearPort.objects.create(device=self.device, name='Rear Port 2', positions=4)
+        frontport1_1 = FrontPort.objects.create(
+            device=self.device, name='Front Port 1:1', rear_port=rearport1, rear_port_position=1
+        )
+        frontport1_2 = FrontPort.objects.create(
+            device=self.device, name='Front Port 1:2', rear_port=rearport1, rear_port_position=2
+        )
+        frontport2_1 = FrontPort.objects.create(
+            device=self.device, name='Front Port 2:1', rear_port=rearport2, rear_port_position=1
+        )
+        frontport2_2 = FrontPort.objects.create(
+            device=self.device, name='Front Port 2:2', rear_port=rearport2, rear_port_position=2
+        )
+        Cable(a_terminations=[interfaces[0]], b_terminations=[frontport1_1]).save()
+        Cable(a_terminations=[interfaces[1]], b_terminations=[frontport1_2]).save()
+        cable3 = Cable(a_terminations=[rearport1], b_terminations=[rearport2])
+        cable3.save()
+        Cable(a_terminations=[frontport2_1], b_terminations=[interfaces[2]]).save()
+        Cable(a_terminations=[frontport2_2], b_terminations=[interfaces[3]]).save()
+        paths = {cp.pk: cp.path for cp in CablePath.objects.all()}
+        self.assertEqual(len(paths), 4)
+        self.assertFalse(CablePath.objects.filter(is_active=False).exists())
+
+        # Modify the trunk cable's status without triggering a retrace, then retrace all of its paths in bulk
+        Cable.objects.filter(pk=cable3.pk).update(status=LinkStatusChoices.STATUS_PLANNED)
+        retrace_paths(CablePath.objects.filter(_nodes__contains=cable3))
+
+        # All paths should be retained and marked as inactive
+        self.assertEqual({cp.pk: cp.path for cp in CablePath.objects.all()}, paths)
+        self.assertEqual(CablePath.objects.filter(is_active=False).count(), 4)
+        for interface in interfaces:
+            interface.refresh_from_db()
+            self.assertIn(interface._path_id, paths)
@@ -0,0 +1,494 @@
+import itertools
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils.translation import gettext as _
+
+from dcim.choices import LinkStatusChoices
+from dcim.exceptions import UnsupportedCablePath
+from dcim.utils import compile_path_node
+
+__all__ = (
+    'CableGraph',
+    'TraceContext',
+)
+
+CHUNK_SIZE = 10000
+
+
+class CableGraph:
+    """
+    An in-memory representation of all cables, wireless links, pass-through ports and circuit terminations, used to
+    trace large numbers of cable paths without querying the database for each hop. Each node is represented as a
+    (content type ID, object ID) tuple.
+
+    Paths are traced following the same rules as CablePath.from_origin().
+    """
+    def __init__(self):
+        from circuits.models import CircuitTermination, ProviderNetwork
+        from dcim.models import Cable, FrontPort, Interface, RearPort
+        from wireless.models import WirelessLink
+
+        get_ct = ContentType.objects.get_for_model
+        self.cable_type = get_ct(Cable).pk
+        self.wirelesslink_type = get_ct(WirelessLink).pk
+        self.interface_type = get_ct(Interface).pk
+        self.frontport_type = get_ct(FrontPort).pk
+        self.rearport_type = get_ct(RearPort).pk
+        self.circuittermination_type = get_ct(CircuitTermination).pk
+        self.providernetwork_type = get_ct(ProviderNetwork).pk
+
+        # Cable ID -> status
+        self.cables = {}
+        # Termination node -> (cable ID, cable end)
+        self.cable_terminations = {}
+        # (Cable ID, cable end) -> list of termination nodes
+        self.cable_ends = defaultdict(list)
+        # WirelessLink ID -> (interface A ID, interface B ID, status)
+        self.wireless_links = {}
+        # Interface ID -> WirelessLink ID
+        self.interface_wireless_links = {}
+        # RearPort ID -> (positions, device ID, order)
+        self.rear_ports = {}
+        # FrontPort ID -> (rear port ID, rear port position, device ID, order)
+        self.front_ports = {}
+        # RearPort ID -> list of FrontPort IDs
+        self.rear_port_front_ports = defaultdict(list)
+        # CircuitTermination ID -> (circuit ID, term side, provider network ID, termination node, cable ID)
+        self.circuit_terminations = {}
+        # (Circuit ID, term side) -> CircuitTermination ID
+        self.circuit_sides = {}
+
+    @classmethod
+    def load(cls):
+        """
+        Return a new CableGraph populated from the database.
+        """
+        from circuits.models import CircuitTermination
+        from dcim.models import Cable, CableTermination, FrontPort, Interface, RearPort
+        from wireless.models import WirelessLink
+
+        graph = cls()
+
+        for pk, status in Cable.objects.order_by().values_list('pk', 'status').iterator(chunk_size=CHUNK_SIZE):
+            graph.cables[pk] = status
+
+        # Terminations are retrieved in their natural order, so that each end of a cable lists its terminations in
+        # the same order as they would be retrieved by CablePath.from_origin()
+        cable_terminations = CableTermination.objects.values_list(
+            'cable_id', 'cable_end', 'termination_type_id', 'termination_id'
+        )
+        for cable_id, cable_end, termination_type_id, termination_id in cable_terminations.iterator(
+            chunk_size=CHUNK_SIZE
+        ):
+            node = (termination_type_id, termination_id)
+            graph.cable_terminations[node] = (cable_id, cable_end)
+            graph.cable_ends[(cable_id, cable_end)].append(node)
+
+        wireless_links = WirelessLink.objects.order_by().values_list('pk', 'interface_a_id', 'interface_b_id', 'status')
+        for pk, interface_a_id, interface_b_id, status in wireless_links.iterator(chunk_size=CHUNK_SIZE):
+            graph.wireless_links[pk] = (interface_a_id, interface_b_id, status)
+        interfaces = Interface.objects.filter(wireless_link__isnull=False).order_by().values_list(
+            'pk', 'wireless_link_id'
+        )
+        for pk, wireless_link_id in interfaces.iterator(chunk_size=CHUNK_SIZE):
+            graph.interface_wireless_links[pk] = wireless_link_id
+
+        rear_ports = RearPort.objects.values_list('pk', 'positions', 'device_id')
+        for i, (pk, positions, device_id) in enumerate(rear_ports.iterator(chunk_size=CHUNK_SIZE)):
+            graph.rear_ports[pk] = (positions, device_id, i)
+
+        front_ports = FrontPort.objects.values_list('pk', 'rear_port_id', 'rear_port_position', 'device_id')
+        for i, (pk, rear_port_id, position, device_id) in enumerate(front_ports.iterator(chunk_size=CHUNK_SIZE)):
+            graph.front_ports[pk] = (rear_port_id, position, device_id, i)
+            graph.rear_port_front_ports[rear_port_id].append(pk)
+
+        circuit_terminations = CircuitTermination.objects.values_list(
+            'pk', 'circuit_id', 'term_side', '_provider_network_id', 'termination_type_id', 'termination_id',
+            'cable_id'
+        )
+        for pk, circuit_id, term_side, provider_network_id, termination_type_id, termination_id, cable_id in (
+            circuit_terminations.iterator(chunk_size=CHUNK_SIZE)
+        ):
+            termination = (termination_type_id, termination_id) if termination_id is not None else None
+            graph.circuit_terminations[pk] = (circuit_id, term_side, provider_network_id, termination, cable_id)
+            graph.circuit_sides.setdefault((circuit_id, term_side), pk)
+
+        return graph
+
+    #
+    # Node attributes
+    #
+
+    def get_link(self, node):
+        """
+        Return the link (Cable or WirelessLink) attached to a termination node, if any.
+        """
+        if node in self.cable_terminations:
+            return self.cable_type, self.cable_terminations[node][0]
+        if node[0] == self.interface_type and node[1] in self.interface_wireless_links:
+            return self.wirelesslink_type, self.interface_wireless_links[node[1]]
+        return None
+
+    def get_link_status(self, link):
+        if link[0] == self.cable_type:
+            return self.cables[link[1]]
+        return self.wireless_links[link[1]][2]
+
+    def get_parent(self, node):
+        """
+        Return the parent object of a mid-span termination node, or None if the node is a path endpoint.
+        """
+        if node[0] == self.frontport_type:
+            return self.front_ports[node[1]][2]
+        if node[0] == self.rearport_type:
+            return self.rear_ports[node[1]][1]
+        if node[0] == self.circuittermination_type:
+            return self.circuit_terminations[node[1]][0]
+        return None
+
+    def get_front_ports(self, rear_port_ids, positions=None):
+        """
+        Return nodes for the FrontPorts mapped to the given RearPorts (and optionally, positions), in natural order.
+        """
+        front_port_ids = [
+            pk for rear_port_id in set(rear_port_ids) for pk in self.rear_port_front_ports[rear_port_id]
+            if positions is None or self.front_ports[pk][1] in positions
+        ]
+        front_port_ids.sort(key=lambda pk: self.front_ports[pk][3])
+        return [(self.frontport_type, pk) for pk in front_port_ids]
+
+    #
+    # Tracing
+    #
+
+    def trace(self, terminations):
+        """
+        Trace the path originating from the given termination nodes. Returns a dictionary of CablePath attributes,
+        or None if the originating terminations are not connected.
+        """
+        path = []
+        position_stack = []
+        is_complete = False
+        is_active = True
+        is_split = False
+
+        while terminations:
+
+            # Terminations must all be of the same type
+            if len({t[0] for t in terminations}) > 1:
+                raise UnsupportedCablePath(_("All mid-span terminations must have the same termination type"))
+
+            # All mid-span terminations must all be attached to the same device
+            parents = {self.get_parent(t) for t in terminations}
+            if len(parents) > 1:
+                raise UnsupportedCablePath(_("All mid-span terminations must have the same parent object"))
+
+            # Check for a split path
+            termination_links = [self.get_link(t) for t in terminations]
+            if len(set(termination_links)) > 1 and (
+                    position_stack and len(terminations) != len(position_stack[-1])
+            ):
+                is_split = True
+                break
+
+            # Step 1: Record the near-end termination object(s)
+            path.append(list(terminations))
+
+            # Step 2: Determine the attached links, if any
+            links = [link for link in termination_links if link is not None]
+            if not links:
+                if len(path) == 1:
+                    return None
+                break
+            if len({link[0] for link in links}) > 1:
+                raise UnsupportedCablePath(_("All links must match first link type"))
+
+            # Step 3: Record asymmetric paths as split
+            if len(links) < len(termination_links):
+                is_complete = False
+                is_split = True
+
+            # Step 4: Record the links, keeping cables in order
+            path.append(list(dict.fromkeys(links)))
+
+            # Step 5: Update the path status if a link is not connected
+            if any(self.get_link_status(link) != LinkStatusChoices.STATUS_CONNECTED for link in links):
+                is_active = False
+
+            # Step 6: Determine the far-end terminations
+            if links[0][0] == self.cable_type:
+                far_ends = sorted({
+                    (cable_id, 'A' if cable_end == 'B' else 'B')
+                    for cable_id, cable_end in (
+                        self.cable_terminations[t] for t in terminations if t in self.cable_terminations
+                    )
+                })
+                if not far_ends:
+                    break
+                remote_terminations = [node for far_end in far_ends for node in self.cable_ends[far_end]]
+            else:
+                remote_terminations = []
+                for link in links:
+                    interface_a_id, interface_b_id, _status = self.wireless_links[link[1]]
+                    remote_id = interface_b_id if interface_a_id == terminations[0][1] else interface_a_id
+                    remote_terminations.append((self.interface_type, remote_id))
+
+            # Remote terminations must all be of the same type, otherwise return a split path
+            if len({t[0] for t in remote_terminations}) > 1:
+                is_complete = False
+                is_split = True
+                break
+
+            # Step 7: Record the far-end termination object(s)
+            path.append(remote_terminations)
+
+            # Step 8: Determine the "next hop" terminations, if applicable
+            if not remote_terminations:
+                break
+            remote_type = remote_terminations[0][0]
+
+            if remote_type == self.frontport_type:
+                # Follow FrontPorts to their corresponding RearPorts
+                front_ports = [self.front_ports[t[1]] for t in remote_terminations]
+                rear_port_ids = sorted({fp[0] for fp in front_ports}, key=lambda pk: self.rear_ports[pk][2])
+                if len(rear_port_ids) > 1 or self.rear_ports[rear_port_ids[0]][0] > 1:
+                    position_stack.append([fp[1] for fp in front_ports])
+
+                terminations = [(self.rearport_type, pk) for pk in rear_port_ids]
+
+            elif remote_type == self.rearport_type:
+                rear_port_ids = [t[1] for t in remote_terminations]
+                if len(rear_port_ids) == 1 and self.rear_ports[rear_port_ids[0]][0] == 1:
+                    front_ports = self.get_front_ports(rear_port_ids, positions=(1,))
+                # Obtain the individual front ports based on the termination and all positions
+                elif len(rear_port_ids) > 1 and position_stack:
+                    positions = position_stack.pop()
+
+                    # Ensure we have a number of positions equal to the amount of remote terminations
+                    if len(rear_port_ids) != len(positions):
+                        raise UnsupportedCablePath(
+                            _("All positions counts within the path on opposite ends of links must match")
+                        )
+
+                    rear_port_positions = {(pk, positions.pop()) for pk in rear_port_ids}
+                    front_ports = [
+                        fp for fp in self.get_front_ports(rear_port_ids)
+                        if self.front_ports[fp[1]][:2] in rear_port_positions
+                    ]
+                # Obtain the individual front ports based on the termination and position
+                elif position_stack:
+                    front_ports = self.get_front_ports(rear_port_ids[:1], positions=position_stack.pop())
+                # If all rear ports have a single position, we can just get the front ports
+                elif all(self.rear_ports[pk][0] == 1 for pk in rear_port_ids):
+                    front_ports = self.get_front_ports(rear_port_ids)
+
+                    if len(front_ports) != len(rear_port_ids):
+                        # Some rear ports does not have a front port
+                        is_split = True
+                        break
+                else:
+                    # No position indicated: path has split, so we stop at the RearPorts
+                    is_split = True
+                    break
+
+                terminations = front_ports
+
+            elif remote_type == self.circuittermination_type:
+                # Follow a CircuitTermination to its corresponding CircuitTermination (A to Z or vice versa)
+                if len(remote_terminations) > 1:
+                    is_split = True
+                    break
+                circuit_id, term_side = self.circuit_terminations[remote_terminations[0][1]][:2]
+                peer_id = self.circuit_sides.get((circuit_id, 'Z' if term_side == 'A' else 'A'))
+                if peer_id is None:
+                    break
+                peer = (self.circuittermination_type, peer_id)
+                _circuit_id, _term_side, provider_network_id, termination, cable_id = self.circuit_terminations[
+                    peer_id
+                ]
+                if provider_network_id:
+                    # Circuit terminates to a ProviderNetwork
+                    path.extend([
+                        [peer],
+                        [(self.providernetwork_type, provider_network_id)],
+                    ])
+                    is_complete = True
+                    break
+                elif termination and not cable_id:
+                    # Circuit terminates to a Region/Site/etc.
+                    path.extend([
+                        [peer],
+                        [termination],
+                    ])
+                    break
+
+                terminations = [peer]
+
+            else:
+                # All remote terminations are of the same type, so the path is complete
+                is_complete = True
+                break
+
+        return {
+            'path': [[compile_path_node(*node) for node in step] for step in path],
+            'is_complete': is_complete,
+            'is_active': is_active,
+            'is_split': is_split,
+        }
+
+    def create_paths(self, model, origin_ids, batch_size=1000):
+        """
+        Trace the paths originating from each of the given objects, and save them as new CablePaths. Returns the
+        number of CablePaths created and a list of (origin ID, exception) tuples for any unsupported paths.
+        """
+        from dcim.models import CablePath
+
+        origin_type = ContentType.objects.get_for_model(model).pk
+        cable_paths = []
+        origins = []
+        errors = []
+
+        for pk in origin_ids:
+            try:
+                attrs = self.trace([(origin_type, pk)])
+            except UnsupportedCablePath as e:
+                errors.append((pk, e))
+                continue
+            if attrs:
+                cable_paths.append(CablePath(_nodes=list(itertools.chain(*attrs['path'])), **attrs))
+                origins.append(pk)
+
+        with transaction.atomic():
+            CablePath.objects.bulk_create(cable_paths, batch_size=batch_size)
+
+            # Record a direct reference to each CablePath on its originating object
+            model.objects.bulk_update(
+                [model(pk=pk, _path_id=cable_path.pk) for pk, cable_path in zip(origins, cable_paths)],
+                fields=['_path'],
+                batch_size=batch_size
+            )
+
+        return len(cable_paths), errors
+
+
+class TraceContext:
+    """
+    Batches and memoizes the database lookups performed while tracing cable paths with CablePath.from_origin().
+    The terminations at both ends of each cable are retrieved together, and all front & rear ports of a device are
+    retrieved as soon as any of its ports is encountered. A single context may be shared by multiple traces.
+    """
+    def __init__(self):
+        # Cable ID -> list of CableTerminations (in natural order)
+        self.cable_terminations = {}
+        # Device IDs for which all ports have been retrieved
+        self.devices = set()
+        # Port ID -> port instance
+        self.front_ports = {}
+        self.rear_ports = {}
+        # Port ID -> position in natural order
+        self.port_order = {}
+        # RearPort ID -> list of FrontPorts
+        self.rear_port_front_ports = defaultdict(list)
+        # CircuitTermination ID -> peer CircuitTermination (or None)
+        self.circuit_peers = {}
+
+    def load_ports(self, device_ids):
+        """
+        Retrieve all front and rear ports belonging to the given devices.
+        """
+        from dcim.models import FrontPort, RearPort
+
+        device_ids = set(device_ids) - self.devices
+        if not device_ids:
+            return
+        self.devices.update(device_ids)
+
+        for model, ports in ((RearPort, self.rear_ports), (FrontPort, self.front_ports)):
+            queryset = model.objects.filter(device_id__in=device_ids).select_related('device', 'cable')
+            for i, port in enumerate(queryset):
+                ports[port.pk] = port
+                self.port_order[(model, port.pk)] = i
+                if model is FrontPort:
+                    self.rear_port_front_ports[port.rear_port_id].append(port)
+
+    def get_cable_terminations(self, cable_ids):
+        """
+        Return the CableTerminations for both ends of the given cables, ordered by cable, cable end and ID.
+        """
+        from dcim.models import CableTermination, FrontPort, RearPort
+
+        if missing := set(cable_ids) - set(self.cable_terminations):
+            cable_terminations = list(
+                CableTermination.objects.filter(cable_id__in=missing).select_related('cable')
+            )
+            port_types = {
+                ContentType.objects.get_for_model(model).pk: ports
+                for model, ports in ((FrontPort, self.front_ports), (RearPort, self.rear_ports))
+            }
+
+            # Resolve terminations to pass-through ports from the cache of device ports
+            self.load_ports(
+                ct._device_id for ct in cable_terminations if ct.termination_type_id in port_types and ct._device_id
+            )
+            remaining = []
+            for ct in cable_terminations:
+                if ct.termination_id in port_types.get(ct.termination_type_id, {}):
+                    ct.termination = port_types[ct.termination_type_id][ct.termination_id]
+                else:
+                    remaining.append(ct)
+            prefetch_related_objects(remaining, 'termination')
+
+            for cable_id in missing:
+                self.cable_terminations[cable_id] = []
+            for ct in cable_terminations:
+                if ct.termination is not None:
+                    # Cache the Cable on its termination object
+                    ct.termination.cable = ct.cable
+                self.cable_terminations[ct.cable_id].append(ct)
+
+        return sorted(
+            itertools.chain.from_iterable(self.cable_terminations[cable_id] for cable_id in set(cable_ids)),
+            key=lambda ct: (ct.cable_id, ct.cable_end, ct.pk)
+        )
+
+    def get_rear_ports(self, front_ports):
+        """
+        Return the distinct RearPorts mapped to the given FrontPorts, in natural order.
+        """
+        from dcim.models import RearPort
+
+        self.load_ports(fp.device_id for fp in front_ports)
+        if missing := {fp.rear_port_id for fp in front_ports} - set(self.rear_ports):
+            self.load_ports(RearPort.objects.filter(pk__in=missing).values_list('device_id', flat=True))
+        rear_ports = {fp.rear_port_id: self.rear_ports[fp.rear_port_id] for fp in front_ports}
+        return sorted(rear_ports.values(), key=lambda rp: self.port_order[(RearPort, rp.pk)])
+
+    def get_front_ports(self, rear_ports, positions=None):
+        """
+        Return the FrontPorts mapped to the given RearPorts (and optionally, positions), in natural order.
+        """
+        from dcim.models import FrontPort
+
+        self.load_ports(rp.device_id for rp in rear_ports)
+        front_ports = [
+            fp for rear_port_id in {rp.pk for rp in rear_ports} for fp in self.rear_port_front_ports[rear_port_id]
+            if positions is None or fp.rear_port_position in positions
+        ]
+        return sorted(front_ports, key=lambda fp: self.port_order[(FrontPort, fp.pk)])
+
+    def get_peer_termination(self, circuit_termination):
+        """
+        Return the CircuitTermination on the opposite side of a circuit (if any).
+        """
+        from circuits.models import CircuitTermination
+
+        if circuit_termination.pk not in self.circuit_peers:
+            self.circuit_peers[circuit_termination.pk] = CircuitTermination.objects.filter(
+                circuit=circuit_termination.circuit_id,
+                term_side='Z' if circuit_termination.term_side == 'A' else 'A'
+            ).select_related('cable', '_provider_network').prefetch_related('termination').first()
+
+        return self.circuit_peers[circuit_termination.pk]
@@ -1,3 +1,6 @@
+import itertools
+from collections import defaultdict
+
 from django.apps import apps
 from django.contrib.contenttypes.models import ContentType
 from django.db import router, transaction
@@ -31,15 +34,16 @@ def path_node_to_object(repr):
     return ct.model_class().objects.filter(pk=object_id).first()
 
 
-def create_cablepath(terminations):
+def create_cablepath(terminations, context=None):
     """
     Create CablePaths for all paths originating from the specified set of nodes.
 
     :param terminations: Iterable of CableTermination objects
+    :param context: A TraceContext to be shared among multiple traces (optional)
     """
     from dcim.models import CablePath
 
-    cp = CablePath.from_origin(terminations)
+    cp = CablePath.from_origin(terminations, context=context)
     if cp:
         cp.save()
 
@@ -50,13 +54,71 @@ def rebuild_paths(terminations):
     """
     from dcim.models import CablePath
 
-    for obj in terminations:
-        cable_paths = CablePath.objects.filter(_nodes__contains=obj)
+    nodes = [object_to_path_node(obj) for obj in terminations]
+    retrace_paths(CablePath.objects.filter(_nodes__overlap=nodes))
+
+
+def retrace_paths(cable_paths, exclude=None):
+    """
+    Retrace a set of CablePaths from their originating terminations as a single batch. Lookups are shared among
+    all traces, and the retraced paths are saved in bulk. Paths which can no longer be traced are deleted.
 
-        with transaction.atomic(using=router.db_for_write(CablePath)):
-            for cp in cable_paths:
-                cp.delete()
-                create_cablepath(cp.origins)
+    :param cable_paths: Iterable of CablePaths
+    :param exclude: Iterable of objects to be removed from the originating terminations of each path (optional)
+    """
+    from dcim.models import CablePath
+    from dcim.tracing import TraceContext
+
+    cable_paths = list(cable_paths)
+    if not cable_paths:
+        return
+    excluded_nodes = {object_to_path_node(obj) for obj in exclude or [] if obj is not None}
+
+    # Retrieve the originating terminations of all paths in bulk
+    origin_ids = defaultdict(set)
+    for cp in cable_paths:
+        for node in cp.path[0] if cp.path else []:
+            ct_id, object_id = decompile_path_node(node)
+            origin_ids[ct_id].add(object_id)
+    origins = {}
+    for ct_id, object_ids in origin_ids.items():
+        model = ContentType.objects.get_for_id(ct_id).model_class()
+        for obj in model.objects.filter(pk__in=object_ids):
+            origins[compile_path_node(ct_id, obj.pk)] = obj
+
+    context = TraceContext()
+    retraced = []
+    deleted = []
+    for cp in cable_paths:
+        terminations = [
+            origins[node] for node in (cp.path[0] if cp.path else [])
+            if node in origins and node not in excluded_nodes
+        ]
+        _new = CablePath.from_origin(terminations, context=context)
+        if _new:
+            cp.path = _new.path
+            cp.is_complete = _new.is_complete
+            cp.is_active = _new.is_active
+            cp.is_split = _new.is_split
+            cp._nodes = list(itertools.chain(*cp.path))
+            retraced.append(cp)
+        else:
+            deleted.append(cp.pk)
+
+    with transaction.atomic(using=router.db_for_write(CablePath)):
+        CablePath.objects.bulk_update(retraced, fields=('path', 'is_complete', 'is_active', 'is_split', '_nodes'))
+        if deleted:
+            CablePath.objects.filter(pk__in=deleted).delete()
+
+        # Record a direct reference to each CablePath on its originating object(s)
+        origin_paths = defaultdict(list)
+        for cp in retraced:
+            for node in cp.path[0]:
+                ct_id, object_id = decompile_path_node(node)
+                origin_paths[ct_id].append((object_id, cp.pk))
+        for ct_id, paths in origin_paths.items():
+            model = ContentType.objects.get_for_id(ct_id).model_class()
+            model.objects.bulk_update([model(pk=pk, _path_id=path_id) for pk, path_id in paths], fields=['_path'])
 
 
 def update_interface_bridges(device, interface_templates, module=None):
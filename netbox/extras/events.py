@@ -1,8 +1,12 @@
+import copy
 import logging
+import uuid
 from collections import defaultdict
 
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection, transaction
 from django.utils import timezone
 from django.utils.module_loading import import_string
 from django.utils.translation import gettext as _
@@ -13,14 +17,18 @@ from netbox.config import get_config
 from netbox.constants import RQ_QUEUE_DEFAULT
 from netbox.registry import registry
 from users.models import User
-from utilities.api import get_serializer_for_model
+from utilities.api import get_prefetches_for_serializer, get_serializer_for_model
 from utilities.rqworker import get_rq_retry
 from utilities.serialization import serialize_object
 from .choices import EventRuleActionChoices
 from .models import EventRule
+from .webhooks import enqueue_coalesced_events, get_webhook_context
 
 logger = logging.getLogger('netbox.events_processor')
 
+EVENTS_PIPELINE_DEFAULT = 'extras.events.process_event_queue'
+EVENT_RULES_VERSION_CACHE_KEY = 'event_rules_version'
+
 
 def serialize_for_event(instance):
     """
@@ -50,10 +58,113 @@ def get_snapshots(instance, event_type):
     return snapshots
 
 
+class EventRuleIndex:
+    """
+    A process-level index of enabled EventRules, keyed by object type and event type, with the conditions of each
+    rule pre-compiled. The index is rebuilt whenever invalidate_event_rules() has been called (in any process) since
+    it was last built, as indicated by a version key stored in the cache. The action objects of indexed rules are not
+    retained; see resolve_action_objects().
+    """
+    def __init__(self):
+        self.index = None
+        self.version = None
+
+    def clear(self):
+        self.index = None
+
+    def build(self):
+        index = defaultdict(list)
+        for event_rule in EventRule.objects.filter(enabled=True).prefetch_related('object_types'):
+            # Compile the rule's conditions
+            event_rule.condition_set
+            for object_type in event_rule.object_types.all():
+                for event_type in event_rule.event_types:
+                    index[(object_type.pk, event_type)].append(event_rule)
+        return index
+
+    def get_index(self):
+        """
+        Return the current index, rebuilding it if it has been invalidated.
+        """
+        version = cache.get(EVENT_RULES_VERSION_CACHE_KEY)
+        if self.index is None or version != self.version:
+            index = self.build()
+            # Retain the index only if it reflects committed data
+            if connection.in_atomic_block:
+                return index
+            self.index, self.version = index, version
+        return self.index
+
+    def get(self, object_type, event_type):
+        """
+        Return a list of all enabled EventRules which apply to the given object type and event type.
+        """
+        return self.get_index().get((object_type.pk, event_type), [])
+
+
+event_rule_index = EventRuleIndex()
+
+
+def invalidate_event_rules():
+    """
+    Invalidate the EventRule index in the current process immediately, and in all other processes once the current
+    transaction has been committed.
+    """
+    event_rule_index.clear()
+    transaction.on_commit(lambda: cache.set(EVENT_RULES_VERSION_CACHE_KEY, uuid.uuid4().hex, None))
+
+
+def resolve_action_objects(event_rules):
+    """
+    Return a copy of each of the given (indexed) EventRules with its action object freshly retrieved, mapped by
+    EventRule ID. The action objects of each type are retrieved in bulk. EventRules whose action object no longer
+    exists are omitted.
+    """
+    object_ids = defaultdict(set)
+    for event_rule in event_rules:
+        object_ids[event_rule.action_object_type_id].add(event_rule.action_object_id)
+
+    action_objects = {}
+    for object_type_id, pks in object_ids.items():
+        if model := ContentType.objects.get_for_id(object_type_id).model_class():
+            for pk, action_object in model.objects.in_bulk(pks).items():
+                action_objects[(object_type_id, pk)] = action_object
+
+    ret = {}
+    for event_rule in event_rules:
+        action_object = action_objects.get((event_rule.action_object_type_id, event_rule.action_object_id))
+        if action_object is None:
+            logger.warning(f"Skipping event rule {event_rule}: its action object no longer exists")
+            continue
+        # Copy the indexed EventRule, which is shared with other threads
+        event_rule = copy.copy(event_rule)
+        event_rule.action_object = action_object
+        ret[event_rule.pk] = event_rule
+
+    return ret
+
+
+def has_event_rules(object_type, event_type):
+    """
+    Return True if any enabled EventRules apply to the given object type and event type.
+    """
+    return bool(event_rule_index.get(object_type, event_type))
+
+
+def requires_serialization(object_type, event_type):
+    """
+    Return True if events of the given type must be serialized for processing.
+    """
+    # Additional pipeline handlers (e.g. those provided by plugins) may consume the serialized data of any event
+    if settings.EVENTS_PIPELINE != [EVENTS_PIPELINE_DEFAULT]:
+        return True
+    return has_event_rules(object_type, event_type)
+
+
 def enqueue_event(queue, instance, user, request_id, event_type):
     """
-    Enqueue a serialized representation of a created/updated/deleted object for the processing of
-    events once the request has completed.
+    Enqueue a created/updated/deleted object for the processing of events once the request has completed.
+    Serialization of created & updated objects is deferred until the queue is flushed (see serialize_events()).
     """
     # Determine whether this type of object supports event rules
     app_label = instance._meta.app_label
@@ -63,25 +174,76 @@ def enqueue_event(queue, instance, user, request_id, event_type):
 
     assert instance.pk is not None
     key = f'{app_label}.{model_name}:{instance.pk}'
-    if key in queue:
-        queue[key]['data'] = serialize_for_event(instance)
-        queue[key]['snapshots']['postchange'] = get_snapshots(instance, event_type)['postchange']
-        # If the object is being deleted, update any prior "update" event to "delete"
-        if event_type == OBJECT_DELETED:
-            queue[key]['event_type'] = event_type
-    else:
+    if key not in queue:
         queue[key] = {
             'object_type': ContentType.objects.get_for_model(instance),
             'object_id': instance.pk,
             'event_type': event_type,
-            'data': serialize_for_event(instance),
-            'snapshots': get_snapshots(instance, event_type),
+            'data': None,
+            'snapshots': {
+                'prechange': getattr(instance, '_prechange_snapshot', None),
+                'postchange': None,
+            },
             'username': user.username,
             'request_id': request_id
         }
+    elif event_type == OBJECT_DELETED:
+        # If the object is being deleted, update any prior "update" event to "delete"
+        queue[key]['event_type'] = event_type
+
+    if event_type == OBJECT_DELETED:
+        # The object will no longer exist once the queue is flushed, so it must be serialized now (if needed)
+        queue[key].pop('instance', None)
+        queue[key]['snapshots']['postchange'] = None
+        if requires_serialization(queue[key]['object_type'], event_type):
+            queue[key]['data'] = serialize_for_event(instance)
+    else:
+        queue[key]['instance'] = instance
+
+
+def serialize_events(events):
+    """
+    Serialize the objects associated with any deferred events in bulk, re-fetching the objects of each model with
+    all related objects needed by its serializer prefetched. Events which do not require serialization (because
+    no enabled EventRules apply to them) are omitted from the returned list.
+    """
+    required = {}
+    deferred = defaultdict(list)
+    ret = []
+
+    for event in events:
+        key = (event['object_type'], event['event_type'])
+        if key not in required:
+            required[key] = requires_serialization(*key)
+        if not required[key]:
+            continue
+        if 'instance' in event:
+            deferred[event['object_type']].append(event)
+        ret.append(event)
 
+    for object_type, model_events in deferred.items():
+        model = object_type.model_class()
+        prefetch = get_prefetches_for_serializer(get_serializer_for_model(model))
+        instances = model.objects.prefetch_related(*prefetch).in_bulk([event['object_id'] for event in model_events])
 
-def process_event_rules(event_rules, object_type, event_type, data, username=None, snapshots=None, request_id=None):
+        for event in model_events:
+            # Fall back to the original instance if it can no longer be retrieved
+            instance = instances.get(event['object_id'], event['instance'])
+            event['data'] = serialize_for_event(instance)
+            event['snapshots']['postchange'] = get_snapshots(instance, event['event_type'])['postchange']
+            del event['instance']
+
+    return ret
+
+
+def process_event_rules(event_rules, object_type, event_type, data, username=None, snapshots=None, request_id=None,
+                        webhook_batch=None, webhook_coalesce=None):
+    """
+    Process the actions of any event rules whose conditions are met by the given event data. If a list is passed
+    as `webhook_batch`, webhooks are appended to it for batch delivery rather than being enqueued individually.
+    If a dictionary is passed as `webhook_coalesce`, the context of each event for a Webhook with event coalescing
+    enabled is appended to the list mapped to that Webhook, for delivery as a single request.
+    """
     user = User.objects.get(username=username) if username else None
 
     for event_rule in event_rules:
@@ -90,17 +252,13 @@ def process_event_rules(event_rules, object_type, event_type, data, username=Non
         if not event_rule.eval_conditions(data):
             continue
 
-        # Compile event data
-        event_data = event_rule.action_data or {}
+        # Compile event data (without modifying the rule's action data)
+        event_data = dict(event_rule.action_data or {})
         event_data.update(data)
 
         # Webhooks
         if event_rule.action_type == EventRuleActionChoices.WEBHOOK:
 
-            # Select the appropriate RQ queue
-            queue_name = get_config().QUEUE_MAPPINGS.get('webhook', RQ_QUEUE_DEFAULT)
-            rq_queue = get_queue(queue_name)
-
             # Compile the task parameters
             params = {
                 "event_rule": event_rule,
@@ -110,16 +268,38 @@ def process_event_rules(event_rules, object_type, event_type, data, username=Non
                 "snapshots": snapshots,
                 "timestamp": timezone.now().isoformat(),
                 "username": username,
-                "retry": get_rq_retry()
             }
             if snapshots:
                 params["snapshots"] = snapshots
             if request_id:
                 params["request_id"] = request_id
 
+            # Defer the event for delivery with others to the same webhook
+            if webhook_coalesce is not None and event_rule.action_object.coalesce_events:
+                webhook_coalesce[event_rule.action_object].append(get_webhook_context(
+                    model_name=object_type.model,
+                    event_type=event_type,
+                    data=event_data,
+                    timestamp=params["timestamp"],
+                    username=username,
+                    request_id=request_id,
+                    snapshots=snapshots
+                ))
+                continue
+
+            # Defer the webhook for batch delivery
+            if webhook_batch is not None:
+                webhook_batch.append(params)
+                continue
+
+            # Select the appropriate RQ queue
+            queue_name = get_config().QUEUE_MAPPINGS.get('webhook', RQ_QUEUE_DEFAULT)
+            rq_queue = get_queue(queue_name)
+
             # Enqueue the task
             rq_queue.enqueue(
                 "extras.webhooks.send_webhook",
+                retry=get_rq_retry(),
                 **params
             )
 
@@ -157,37 +337,86 @@ def process_event_queue(events):
     """
     Flush a list of object representation to RQ for EventRule processing.
     """
-    events_cache = defaultdict(dict)
+    index = event_rule_index.get_index()
+
+    # Retrieve the action objects of all applicable EventRules once per flush
+    event_rules = resolve_action_objects({
+        event_rule.pk: event_rule
+        for event in events for event_rule in index.get((event['object_type'].pk, event['event_type']), [])
+    }.values())
+
+    # Collect webhooks for batch delivery (if enabled)
+    batch_size = settings.WEBHOOK_BATCH_SIZE
+    webhook_batch = [] if batch_size else None
+
+    # Collect events for webhooks which coalesce events
+    webhook_coalesce = defaultdict(list)
 
     for event in events:
-        event_type = event['event_type']
         object_type = event['object_type']
-
-        # Cache applicable Event Rules
-        if object_type not in events_cache[event_type]:
-            events_cache[event_type][object_type] = EventRule.objects.filter(
-                event_types__contains=[event['event_type']],
-                object_types=object_type,
-                enabled=True
-            )
-        event_rules = events_cache[event_type][object_type]
+        event_rule_ids = [event_rule.pk for event_rule in index.get((object_type.pk, event['event_type']), [])]
+        if not (applicable_rules := [event_rules[pk] for pk in event_rule_ids if pk in event_rules]):
+            continue
 
         process_event_rules(
-            event_rules=event_rules,
+            event_rules=applicable_rules,
             object_type=object_type,
             event_type=event['event_type'],
             data=event['data'],
             username=event['username'],
             snapshots=event['snapshots'],
-            request_id=event['request_id']
+            request_id=event['request_id'],
+            webhook_batch=webhook_batch,
+            webhook_coalesce=webhook_coalesce
+        )
+
+    if webhook_batch:
+        enqueue_webhook_batches(webhook_batch, batch_size)
+    if webhook_coalesce:
+        enqueue_coalesced_webhooks(webhook_coalesce)
+
+
+def enqueue_webhook_batches(deliveries, batch_size):
+    """
+    Enqueue jobs to send the given webhook deliveries in batches of up to `batch_size`.
+    """
+    queue_name = get_config().QUEUE_MAPPINGS.get('webhook', RQ_QUEUE_DEFAULT)
+    rq_queue = get_queue(queue_name)
+
+    for i in range(0, len(deliveries), batch_size):
+        rq_queue.enqueue(
+            "extras.webhooks.send_webhooks",
+            deliveries=deliveries[i:i + batch_size]
         )
 
 
+def enqueue_coalesced_webhooks(webhook_coalesce):
+    """
+    Enqueue the delivery of coalesced events for each Webhook as a single request. Events for Webhooks with a
+    coalescing window are instead added to a pending batch, which is delivered once the window has elapsed.
+    """
+    queue_name = get_config().QUEUE_MAPPINGS.get('webhook', RQ_QUEUE_DEFAULT)
+    rq_queue = get_queue(queue_name)
+    timestamp = timezone.now().isoformat()
+
+    for webhook, events in webhook_coalesce.items():
+        if webhook.coalesce_window:
+            enqueue_coalesced_events(rq_queue, webhook, events)
+        else:
+            rq_queue.enqueue(
+                "extras.webhooks.send_coalesced_webhook",
+                retry=get_rq_retry(),
+                webhook=webhook,
+                events=events,
+                timestamp=timestamp
+            )
+
+
 def flush_events(events):
     """
     Flush a list of object representations to RQ for event processing.
     """
-    if events:
+    if events := serialize_events(events):
         for name in settings.EVENTS_PIPELINE:
             try:
                 func = import_string(name)
@@ -264,8 +264,18 @@ class WebhookBulkEditForm(NetBoxModelBulkEditForm):
         required=False,
         label=_('CA file path')
     )
+    coalesce_events = forms.NullBooleanField(
+        required=False,
+        widget=BulkEditNullBooleanSelect(),
+        label=_('Coalesce events')
+    )
+    coalesce_window = forms.IntegerField(
+        required=False,
+        min_value=1,
+        label=_('Coalescing window')
+    )
 
-    nullable_fields = ('secret', 'ca_file_path')
+    nullable_fields = ('secret', 'ca_file_path', 'coalesce_window')
 
 
 class EventRuleBulkEditForm(NetBoxModelBulkEditForm):
@@ -434,6 +434,7 @@ class WebhookForm(NetBoxModelForm):
             name=_('HTTP Request')
         ),
         FieldSet('ssl_verification', 'ca_file_path', name=_('SSL')),
+        FieldSet('coalesce_events', 'coalesce_window', name=_('Coalescing')),
     )
 
     class Meta:
@@ -1,10 +1,30 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext as _
 
 from netbox.registry import registry
 from netbox.search.backends import search_backend
 
+CHECKPOINT_CACHE_KEY = 'reindex_checkpoint'
+CHECKPOINT_TIMEOUT = 7 * 24 * 3600
+CHUNK_SIZE = 2000
+
+
+def reindex_chunk(object_type_id, object_ids):
+    """
+    Reindex a chunk of objects of the same type. Cached values for each chunk are replaced atomically, so that
+    the objects remain searchable while being reindexed.
+    """
+    object_type = ContentType.objects.get_for_id(object_type_id)
+    with transaction.atomic():
+        return search_backend.reindex(object_type, object_ids)
+
 
 class Command(BaseCommand):
     help = 'Reindex objects for search'
@@ -21,6 +41,23 @@ class Command(BaseCommand):
             action='store_true',
             help="For each model, reindex objects only if no cache entries already exist"
         )
+        parser.add_argument(
+            '--since',
+            metavar='TIMESTAMP',
+            help="Reindex only objects modified since the given ISO 8601 timestamp (models lacking a last_updated "
+                 "field are skipped)"
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help="The number of worker processes among which objects are distributed for reindexing (default: 1)"
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help="Resume a previously interrupted run with the same arguments from its last checkpoint"
+        )
 
     def _get_indexers(self, *model_names):
         indexers = {}
@@ -59,7 +96,61 @@ class Command(BaseCommand):
 
         return indexers
 
+    def _get_chunks(self, queryset, start_after=None):
+        """
+        Yield lists of object IDs in ascending order, using keyset pagination to avoid large offsets.
+        """
+        queryset = queryset.order_by('pk').values_list('pk', flat=True)
+        if start_after is not None:
+            queryset = queryset.filter(pk__gt=start_after)
+        chunk = []
+        for pk in queryset.iterator(chunk_size=CHUNK_SIZE):
+            chunk.append(pk)
+            if len(chunk) >= CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _save_checkpoint(self, key, checkpoint):
+        cache.set(key, checkpoint, CHECKPOINT_TIMEOUT)
+
+    def _reindex_model(self, model, queryset, executor, workers, checkpoint, checkpoint_key):
+        """
+        Reindex all objects in the queryset in chunks, optionally distributing chunks among worker processes. The
+        checkpoint is updated after each batch of chunks has been completed.
+        """
+        label = model._meta.label_lower
+        object_type = ContentType.objects.get_for_model(model)
+        count = 0
+
+        batch = []
+        for chunk in self._get_chunks(queryset, start_after=checkpoint['models'].get(label)):
+            batch.append(chunk)
+            if len(batch) >= workers:
+                count += self._process_batch(object_type, batch, executor)
+                checkpoint['models'][label] = batch[-1][-1]
+                self._save_checkpoint(checkpoint_key, checkpoint)
+                batch = []
+        if batch:
+            count += self._process_batch(object_type, batch, executor)
+
+        return count
+
+    def _process_batch(self, object_type, batch, executor):
+        if executor is None:
+            return sum(reindex_chunk(object_type.pk, chunk) for chunk in batch)
+        futures = [executor.submit(reindex_chunk, object_type.pk, chunk) for chunk in batch]
+        return sum(future.result() for future in futures)
+
     def handle(self, *model_labels, **kwargs):
+        since = None
+        if kwargs['since']:
+            since = parse_datetime(kwargs['since'])
+            if since is None:
+                raise CommandError(_("Invalid timestamp: {value}").format(value=kwargs['since']))
+        if kwargs['workers'] < 1:
+            raise CommandError(_("The number of workers must be at least 1."))
 
         # Determine which models to reindex
         indexers = self._get_indexers(*model_labels)
@@ -67,37 +158,81 @@ class Command(BaseCommand):
             raise CommandError(_("No indexers found!"))
         self.stdout.write(f'Reindexing {len(indexers)} models.')
 
-        # Clear cached values for the specified models (if not being lazy)
-        if not kwargs['lazy']:
-            if model_labels:
-                content_types = [ContentType.objects.get_for_model(model) for model in indexers.keys()]
-            else:
-                content_types = None
-
-            self.stdout.write('Clearing cached values... ', ending='')
-            self.stdout.flush()
-            deleted_count = search_backend.clear(object_types=content_types)
-            self.stdout.write(f'{deleted_count} entries deleted.')
+        # Load the checkpoint for an interrupted run (if resuming)
+        checkpoint_key = f"{CHECKPOINT_CACHE_KEY}:{','.join(sorted(model_labels))}:{kwargs['since'] or ''}"
+        checkpoint = cache.get(checkpoint_key) if kwargs['resume'] else None
+        if checkpoint:
+            self.stdout.write('Resuming from last checkpoint.')
+        else:
+            checkpoint = {'models': {}, 'completed': []}
+
+        # Distribute chunks among worker processes. Database connections must be closed prior to forking so that
+        # each worker establishes its own.
+        executor = None
+        if kwargs['workers'] > 1:
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=kwargs['workers'],
+                mp_context=multiprocessing.get_context('fork')
+            )
+            # Start the worker processes before this process opens a new connection
+            executor.submit(connections.close_all).result()
 
         # Index models
         self.stdout.write('Indexing models')
-        for model, idx in indexers.items():
-            app_label = model._meta.app_label
-            model_name = model._meta.model_name
-            self.stdout.write(f'  {app_label}.{model_name}... ', ending='')
-            self.stdout.flush()
+        try:
+            for model, idx in indexers.items():
+                app_label = model._meta.app_label
+                model_name = model._meta.model_name
+                self.stdout.write(f'  {app_label}.{model_name}... ', ending='')
+                self.stdout.flush()
+
+                if model._meta.label_lower in checkpoint['completed']:
+                    self.stdout.write('Skipping (completed prior to checkpoint).')
+                    continue
 
-            if kwargs['lazy']:
                 content_type = ContentType.objects.get_for_model(model)
-                if cached_count := search_backend.count(object_types=[content_type]):
-                    self.stdout.write(f'Skipping (found {cached_count} existing).')
-                    continue
+                queryset = model.objects.all()
+
+                if kwargs['lazy'] and model._meta.label_lower not in checkpoint['models']:
+                    if cached_count := search_backend.count(object_types=[content_type]):
+                        self.stdout.write(f'Skipping (found {cached_count} existing).')
+                        continue
+
+                if since:
+                    if not any(field.name == 'last_updated' for field in model._meta.get_fields()):
+                        self.stdout.write('Skipping (no last_updated field).')
+                        continue
+                    queryset = queryset.filter(last_updated__gte=since)
+
+                i = self._reindex_model(model, queryset, executor, kwargs['workers'], checkpoint, checkpoint_key)
+
+                # Remove cached values for any objects which no longer exist
+                if not since and not kwargs['lazy']:
+                    search_backend.remove_stale(content_type)
+
+                checkpoint['completed'].append(model._meta.label_lower)
+                self._save_checkpoint(checkpoint_key, checkpoint)
+
+                if i:
+                    self.stdout.write(f'{i} entries cached.')
+                else:
+                    self.stdout.write('No objects found.')
+        finally:
+            if executor:
+                executor.shutdown()
+
+        # Clear cached values for any models which are no longer indexed (e.g. following the removal of a plugin)
+        if not model_labels and not since and not kwargs['lazy']:
+            self.stdout.write('Clearing stale cached values... ', ending='')
+            self.stdout.flush()
+            content_types = ContentType.objects.exclude(
+                pk__in=[ContentType.objects.get_for_model(model).pk for model in indexers.keys()]
+            )
+            deleted_count = search_backend.clear(object_types=list(content_types)) if content_types else 0
+            self.stdout.write(f'{deleted_count} entries deleted.')
 
-            i = search_backend.cache(model.objects.iterator(), remove_existing=False)
-            if i:
-                self.stdout.write(f'{i} entries cached.')
-            else:
-                self.stdout.write('No objects found.')
+        cache.delete(checkpoint_key)
 
         msg = 'Completed.'
         if total_count := search_backend.size:
@@ -1,6 +1,6 @@
 import json
 import sys
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 from django.core.management.base import BaseCommand
 
@@ -9,6 +9,8 @@ request_counter = 1
 
 
 class WebhookHandler(BaseHTTPRequestHandler):
+    # Support persistent (keep-alive) connections
+    protocol_version = 'HTTP/1.1'
     show_headers = True
 
     def __getattr__(self, item):
@@ -33,9 +35,11 @@ class WebhookHandler(BaseHTTPRequestHandler):
         global request_counter
 
         # Send a 200 response regardless of the request content
+        response_body = b'Webhook received!\n'
         self.send_response(200)
+        self.send_header('Content-Length', str(len(response_body)))
         self.end_headers()
-        self.wfile.write(b'Webhook received!\n')
+        self.wfile.write(response_body)
 
         # Print the request headers
         if self.show_headers:
@@ -81,7 +85,7 @@ class Command(BaseCommand):
         WebhookHandler.show_headers = not options['no_headers']
 
         self.stdout.write('Listening on port http://localhost:{}. Stop with {}.'.format(port, quit_command))
-        httpd = HTTPServer(('localhost', port), WebhookHandler)
+        httpd = ThreadingHTTPServer(('localhost', port), WebhookHandler)
 
         try:
             httpd.serve_forever()
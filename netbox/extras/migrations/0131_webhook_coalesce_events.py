@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('extras', '0130_cachedvalue_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhook',
+            name='coalesce_events',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='webhook',
+            name='coalesce_window',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
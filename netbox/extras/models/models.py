@@ -8,6 +8,7 @@ from django.core.validators import ValidationError
 from django.db import models
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from rest_framework.utils.encoders import JSONEncoder
 
@@ -134,6 +135,14 @@ class EventRule(CustomFieldsMixin, ExportTemplatesMixin, TagsMixin, ChangeLogged
             except ValueError as e:
                 raise ValidationError({'conditions': e})
 
+    @cached_property
+    def condition_set(self):
+        """
+        Return the compiled ConditionSet for the event rule's conditions (if any).
+        """
+        if self.conditions:
+            return ConditionSet(self.conditions)
+
     def eval_conditions(self, data):
         """
         Test whether the given data meets the conditions of the event rule (if any). Return True
@@ -145,7 +154,7 @@ class EventRule(CustomFieldsMixin, ExportTemplatesMixin, TagsMixin, ChangeLogged
         logger = logging.getLogger('netbox.event_rules')
 
         try:
-            result = ConditionSet(self.conditions).eval(data)
+            result = self.condition_set.eval(data)
             logger.debug(f'{self.name}: Evaluated as {result}')
             return result
         except InvalidCondition as e:
@@ -233,6 +242,24 @@ class Webhook(CustomFieldsMixin, ExportTemplatesMixin, TagsMixin, ChangeLoggedMo
             "The specific CA certificate file to use for SSL verification. Leave blank to use the system defaults."
         )
     )
+    coalesce_events = models.BooleanField(
+        default=False,
+        verbose_name=_('coalesce events'),
+        help_text=_(
+            "Deliver all events for this webhook resulting from a single request (or occurring within the coalescing "
+            "window) as a single batched request. The context data for each event is available as "
+            "<code>events</code>."
+        )
+    )
+    coalesce_window = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_('coalescing window'),
+        help_text=_(
+            "The number of seconds for which events are collected before being delivered. If blank, events are "
+            "coalesced per request."
+        )
+    )
     events = GenericRelation(
         EventRule,
         content_type_field='action_object_type',
@@ -263,6 +290,12 @@ class Webhook(CustomFieldsMixin, ExportTemplatesMixin, TagsMixin, ChangeLoggedMo
                 'ca_file_path': _('Do not specify a CA certificate file if SSL verification is disabled.')
             })
 
+        # Coalescing window requires event coalescing enabled
+        if not self.coalesce_events and self.coalesce_window:
+            raise ValidationError({
+                'coalesce_window': _('A coalescing window may be set only if event coalescing is enabled.')
+            })
+
     def render_headers(self, context):
         """
         Render additional_headers and return a dict of Header: Value pairs.
@@ -1,11 +1,11 @@
 from django.contrib.contenttypes.models import ContentType
-from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
 from core.events import *
 from core.models import ObjectType
 from core.signals import job_end, job_start
-from extras.events import process_event_rules
+from extras.events import invalidate_event_rules, process_event_rules
 from extras.models import EventRule, Notification, Subscription
 from netbox.config import get_config
 from netbox.registry import registry
@@ -172,3 +172,24 @@ def notify_object_changed(sender, instance, **kwargs):
         )
         for user in subscribed_users
     ])
+
+
+#
+# Event rule index
+#
+
+@receiver((post_save, post_delete), sender=EventRule)
+def handle_eventrule_changed(sender, instance, **kwargs):
+    """
+    Invalidate the EventRule index when an EventRule is created, modified, or deleted.
+    """
+    invalidate_event_rules()
+
+
+@receiver(m2m_changed, sender=EventRule.object_types.through)
+def handle_eventrule_object_types_changed(sender, instance, action, **kwargs):
+    """
+    Invalidate the EventRule index when object types are assigned to or removed from an EventRule.
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_event_rules()
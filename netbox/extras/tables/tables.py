@@ -425,6 +425,9 @@ class WebhookTable(NetBoxTable):
     ssl_validation = columns.BooleanColumn(
         verbose_name=_('SSL Validation')
     )
+    coalesce_events = columns.BooleanColumn(
+        verbose_name=_('Coalesce Events')
+    )
     tags = columns.TagColumn(
         url_name='extras:webhook_list'
     )
@@ -433,7 +436,7 @@ class WebhookTable(NetBoxTable):
         model = Webhook
         fields = (
             'pk', 'id', 'name', 'http_method', 'payload_url', 'http_content_type', 'secret', 'ssl_verification',
-            'ca_file_path', 'description', 'tags', 'created', 'last_updated',
+            'ca_file_path', 'coalesce_events', 'coalesce_window', 'description', 'tags', 'created', 'last_updated',
         )
         default_columns = (
             'pk', 'name', 'http_method', 'payload_url', 'description',
@@ -1,22 +1,34 @@
 import json
 import uuid
+from datetime import timedelta
+from http.client import HTTPMessage
 from unittest.mock import patch
 
 import django_rq
+from django.core.cache import cache
 from django.http import HttpResponse
-from django.test import RequestFactory
+from django.test import RequestFactory, override_settings
 from django.urls import reverse
-from requests import Session
+from django.utils import timezone
+from django.utils.http import http_date
+from requests import Response, Session
+from requests.cookies import MockRequest, MockResponse
 from rest_framework import status
 
 from core.events import *
 from core.models import ObjectType
 from dcim.choices import SiteStatusChoices
-from dcim.models import Site
+from dcim.models import Region, Site
 from extras.choices import EventRuleActionChoices
-from extras.events import enqueue_event, flush_events, serialize_for_event
+from extras.constants import WEBHOOK_EVENT_TYPES
+from extras.events import (
+    EVENT_RULES_VERSION_CACHE_KEY, enqueue_event, event_rule_index, flush_events, serialize_events, serialize_for_event,
+)
 from extras.models import EventRule, Tag, Webhook
-from extras.webhooks import generate_signature, send_webhook
+from extras.webhooks import (
+    WebhookDispatcher, build_webhook_request, enqueue_coalesced_events, flush_coalesced_events, generate_signature,
+    send_coalesced_webhook, send_webhook, send_webhooks,
+)
 from netbox.context_managers import event_tracking
 from utilities.testing import APITestCase
 
@@ -433,3 +445,353 @@ class EventRuleTest(APITestCase):
         job = self.queue.get_jobs()[0]
         self.assertEqual(job.kwargs['event_type'], OBJECT_DELETED)
         self.queue.empty()
+
+    @override_settings(EVENTS_PIPELINE=['extras.events.process_event_queue'])
+    def test_deferred_serialization(self):
+        """
+        Test that objects are serialized only once the queue is flushed, and only if an EventRule applies.
+        """
+        queue = {}
+        request_id = uuid.uuid4()
+        site = Site.objects.create(name='Site 1', slug='site-1')
+        region = Region.objects.create(name='Region 1', slug='region-1')
+
+        with patch('extras.events.serialize_for_event', wraps=serialize_for_event) as serialize:
+            enqueue_event(queue, instance=site, user=self.user, request_id=request_id, event_type=OBJECT_CREATED)
+            enqueue_event(queue, instance=region, user=self.user, request_id=request_id, event_type=OBJECT_CREATED)
+            site.description = 'foo'
+            site.save()
+            enqueue_event(queue, instance=site, user=self.user, request_id=request_id, event_type=OBJECT_UPDATED)
+            serialize.assert_not_called()
+
+            # No EventRules apply to regions, so only the site should be serialized
+            events = serialize_events(list(queue.values()))
+            self.assertEqual(serialize.call_count, 1)
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['event_type'], OBJECT_CREATED)
+        self.assertEqual(events[0]['data']['description'], 'foo')
+        self.assertEqual(events[0]['snapshots']['postchange']['description'], 'foo')
+        self.assertNotIn('instance', events[0])
+
+    def test_event_rule_index(self):
+        """
+        Test that the EventRule index reflects changes to EventRules.
+        """
+        site_type = ObjectType.objects.get_for_model(Site)
+        event_rules = event_rule_index.get(site_type, OBJECT_CREATED)
+        self.assertEqual([rule.name for rule in event_rules], ['Event Rule 1'])
+
+        event_rule = EventRule.objects.get(name='Event Rule 1')
+        event_rule.enabled = False
+        event_rule.save()
+        self.assertEqual(event_rule_index.get(site_type, OBJECT_CREATED), [])
+
+        event_rule = EventRule.objects.get(name='Event Rule 2')
+        event_rule.event_types = [OBJECT_CREATED, OBJECT_UPDATED]
+        event_rule.save()
+        self.assertEqual([rule.name for rule in event_rule_index.get(site_type, OBJECT_CREATED)], ['Event Rule 2'])
+
+    def test_event_rule_action_object(self):
+        """
+        Test that events use the current action object of an indexed EventRule, rather than a cached instance.
+        """
+        site_type = ObjectType.objects.get_for_model(Site)
+        url = reverse('dcim-api:site-list')
+        self.add_permissions('dcim.add_site')
+
+        # Retain the index (which is otherwise rebuilt while a transaction is open), resolving its action objects
+        event_rule_index.index = event_rule_index.build()
+        event_rule_index.version = cache.get(EVENT_RULES_VERSION_CACHE_KEY)
+        self.addCleanup(event_rule_index.clear)
+        for event_rule in event_rule_index.get(site_type, OBJECT_CREATED):
+            self.assertEqual(event_rule.action_object.payload_url, 'http://localhost:9000/')
+
+        # Modify the Webhook without invalidating the index
+        Webhook.objects.filter(name='Webhook 1').update(payload_url='http://localhost:9001/')
+
+        response = self.client.post(url, {'name': 'Site 1', 'slug': 'site-1'}, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_201_CREATED)
+        self.assertEqual(self.queue.count, 1)
+        job = self.queue.jobs[0]
+        self.assertEqual(job.kwargs['event_rule'].name, 'Event Rule 1')
+        self.assertEqual(job.kwargs['event_rule'].action_object.payload_url, 'http://localhost:9001/')
+        self.queue.empty()
+
+        # Delete the Webhook (along with its EventRules) without invalidating the index
+        with patch('extras.signals.invalidate_event_rules'):
+            Webhook.objects.get(name='Webhook 1').delete()
+
+        response = self.client.post(url, {'name': 'Site 2', 'slug': 'site-2'}, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_201_CREATED)
+        self.assertEqual(self.queue.count, 0)
+
+    def test_coalesced_webhook(self):
+        """
+        Test that all events for a Webhook with event coalescing enabled are delivered as a single request.
+        """
+        webhook = Webhook.objects.get(name='Webhook 1')
+        webhook.coalesce_events = True
+        webhook.save()
+
+        # Create multiple sites, triggering Event Rule 1 for each
+        data = [
+            {'name': f'Site {i}', 'slug': f'site-{i}'} for i in range(1, 4)
+        ]
+        url = reverse('dcim-api:site-list')
+        self.add_permissions('dcim.add_site')
+        response = self.client.post(url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_201_CREATED)
+
+        # Verify that a single job was queued for all events
+        self.assertEqual(self.queue.count, 1)
+        job = self.queue.jobs[0]
+        self.assertEqual(job.func_name, 'extras.webhooks.send_coalesced_webhook')
+        self.assertEqual(job.kwargs['webhook'], webhook)
+        events = job.kwargs['events']
+        self.assertEqual(len(events), 3)
+        for event, site in zip(events, data):
+            self.assertEqual(event['event'], WEBHOOK_EVENT_TYPES[OBJECT_CREATED])
+            self.assertEqual(event['model'], 'site')
+            self.assertEqual(event['data']['name'], site['name'])
+            self.assertEqual(event['data']['foo'], 1)
+
+        def dummy_send(_, request, **kwargs):
+            body = json.loads(request.body)
+            self.assertEqual([event['data']['name'] for event in body['events']], ['Site 1', 'Site 2', 'Site 3'])
+            return HttpResponse()
+
+        # Patch the Session object with our dummy_send() method, then process the webhook for sending
+        with patch.object(Session, 'send', dummy_send):
+            send_coalesced_webhook(**job.kwargs)
+
+    @override_settings(EVENTS_PIPELINE=['extras.events.process_event_queue'], WEBHOOK_BATCH_SIZE=2)
+    def test_webhook_batches(self):
+        """
+        Test that webhooks triggered by a single request are enqueued in batches of up to WEBHOOK_BATCH_SIZE.
+        """
+        data = [
+            {'name': f'Site {i}', 'slug': f'site-{i}'} for i in range(1, 6)
+        ]
+        url = reverse('dcim-api:site-list')
+        self.add_permissions('dcim.add_site')
+        response = self.client.post(url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_201_CREATED)
+
+        jobs = self.queue.get_jobs()
+        self.assertEqual([job.func_name for job in jobs], ['extras.webhooks.send_webhooks'] * 3)
+        self.assertEqual([len(job.kwargs['deliveries']) for job in jobs], [2, 2, 1])
+        self.assertEqual(
+            [delivery['data']['name'] for job in jobs for delivery in job.kwargs['deliveries']],
+            [site['name'] for site in data]
+        )
+
+    def test_send_webhooks_requeue_failed(self):
+        """
+        Test that deliveries within a batch which fail are re-enqueued as individual jobs.
+        """
+        event_rule = EventRule.objects.get(name='Event Rule 1')
+        deliveries = [
+            {
+                'event_rule': event_rule,
+                'model_name': 'site',
+                'event_type': OBJECT_CREATED,
+                'data': {'name': f'Site {i}'},
+                'timestamp': timezone.now().isoformat(),
+                'username': 'testuser',
+            } for i in range(1, 4)
+        ]
+
+        def dummy_send(_, request, **kwargs):
+            response = Response()
+            # Fail delivery of the second site
+            response.status_code = 500 if json.loads(request.body)['data']['name'] == 'Site 2' else 200
+            return response
+
+        with patch.object(Session, 'send', dummy_send):
+            result = send_webhooks(deliveries)
+        self.assertEqual(result, '2 of 3 webhooks successfully processed.')
+
+        self.assertEqual(self.queue.count, 1)
+        job = self.queue.get_jobs()[0]
+        self.assertEqual(job.func_name, 'extras.webhooks.send_webhook')
+        self.assertEqual(job.kwargs['data'], {'name': 'Site 2'})
+
+
+class WebhookDispatcherTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.webhook = Webhook.objects.create(name='Webhook 1', payload_url='http://localhost:9000/')
+
+    def get_response(self, status_code, headers=None):
+        response = Response()
+        response.status_code = status_code
+        response.headers.update(headers or {})
+        return response
+
+    def test_retry(self):
+        """
+        Test that a request is retried upon receiving a retryable response status.
+        """
+        dispatcher = WebhookDispatcher(max_retries=2, backoff_factor=0)
+        prepared_request = build_webhook_request(self.webhook, {'event': 'created', 'model': 'site'})
+
+        with patch.object(Session, 'send', side_effect=[self.get_response(503), self.get_response(200)]) as send:
+            response = dispatcher.send(self.webhook, prepared_request, max_retries=2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(send.call_count, 2)
+
+        # The last response is returned once retries have been exhausted
+        with patch.object(Session, 'send', return_value=self.get_response(503)) as send:
+            response = dispatcher.send(self.webhook, prepared_request, max_retries=2)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(send.call_count, 3)
+
+    def test_backoff(self):
+        dispatcher = WebhookDispatcher(backoff_factor=0.5)
+        self.assertEqual(dispatcher.get_backoff(2), 2)
+        self.assertEqual(dispatcher.get_backoff(2, self.get_response(503, {'Retry-After': '5'})), 5)
+
+        # Excessive delays are capped, and invalid or negative delays are ignored
+        self.assertEqual(dispatcher.get_backoff(2, self.get_response(503, {'Retry-After': '86400'})), 60)
+        self.assertEqual(dispatcher.get_backoff(2, self.get_response(503, {'Retry-After': '-5'})), 2)
+        self.assertEqual(dispatcher.get_backoff(2, self.get_response(503, {'Retry-After': 'foo'})), 2)
+
+        # Retry-After may specify an HTTP date
+        retry_after = http_date((timezone.now() + timedelta(seconds=30)).timestamp())
+        backoff = dispatcher.get_backoff(2, self.get_response(503, {'Retry-After': retry_after}))
+        self.assertTrue(20 < backoff <= 30)
+
+    def test_session_cookies(self):
+        """
+        Test that sessions shared among webhooks to the same destination do not retain cookies.
+        """
+        dispatcher = WebhookDispatcher()
+        session, _ = dispatcher.get_session(self.webhook, self.webhook.payload_url)
+        prepared_request = build_webhook_request(self.webhook, {'event': 'created', 'model': 'site'})
+        headers = HTTPMessage()
+        headers['Set-Cookie'] = 'foo=bar'
+        session.cookies.extract_cookies(MockResponse(headers), MockRequest(prepared_request))
+        self.assertEqual(len(session.cookies), 0)
+
+
+class FakeRedis:
+    """
+    A minimal in-memory stand-in for the Redis operations used to coalesce webhook events.
+    """
+    def __init__(self):
+        self.data = {}
+
+    def rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(values)
+        return len(self.data[key])
+
+    def lrange(self, key, start, end):
+        return list(self.data.get(key, []))
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class FakeQueue:
+    """
+    A stand-in for an RQ queue which records enqueued and scheduled jobs.
+    """
+    def __init__(self):
+        self.connection = FakeRedis()
+        self.enqueued = []
+        self.scheduled = []
+
+    def enqueue(self, func, **kwargs):
+        self.enqueued.append((func, kwargs))
+
+    def enqueue_in(self, time_delta, func, **kwargs):
+        self.scheduled.append((time_delta, func, kwargs))
+
+
+class CoalescingWindowTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.webhook = Webhook.objects.create(
+            name='Webhook 1',
+            payload_url='http://localhost:9000/',
+            coalesce_events=True,
+            coalesce_window=30
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.rq_queue = FakeQueue()
+
+    def flush(self):
+        with patch('extras.webhooks.get_queue', return_value=self.rq_queue):
+            return flush_coalesced_events(webhook_id=self.webhook.pk)
+
+    def test_single_flush_per_window(self):
+        enqueue_coalesced_events(self.rq_queue, self.webhook, [{'data': 1}, {'data': 2}])
+        enqueue_coalesced_events(self.rq_queue, self.webhook, [{'data': 3}])
+
+        # A single flush is scheduled for the window
+        self.assertEqual(len(self.rq_queue.scheduled), 1)
+        time_delta, func, kwargs = self.rq_queue.scheduled[0]
+        self.assertEqual(time_delta, timedelta(seconds=30))
+        self.assertEqual(func, 'extras.webhooks.flush_coalesced_events')
+        self.assertEqual(kwargs, {'webhook_id': self.webhook.pk})
+
+        # Flushing enqueues the delivery of all pending events in a single request, and clears them
+        self.flush()
+        self.assertEqual(len(self.rq_queue.enqueued), 1)
+        func, kwargs = self.rq_queue.enqueued[0]
+        self.assertEqual(func, 'extras.webhooks.send_coalesced_webhook')
+        self.assertEqual(kwargs['webhook'], self.webhook)
+        self.assertEqual(kwargs['events'], [{'data': 1}, {'data': 2}, {'data': 3}])
+        self.assertEqual(self.rq_queue.connection.data, {})
+        self.assertEqual(self.flush(), 'No pending events.')
+
+        # Events arriving after the flush schedule a new one
+        enqueue_coalesced_events(self.rq_queue, self.webhook, [{'data': 4}])
+        self.assertEqual(len(self.rq_queue.scheduled), 2)
+        self.flush()
+        self.assertEqual(self.rq_queue.enqueued[1][1]['events'], [{'data': 4}])
+
+    def test_deleted_webhook(self):
+        enqueue_coalesced_events(self.rq_queue, self.webhook, [{'data': 1}])
+        webhook_id = self.webhook.pk
+        self.webhook.delete()
+
+        # Pending events for a deleted webhook are discarded
+        with patch('extras.webhooks.get_queue', return_value=self.rq_queue):
+            result = flush_coalesced_events(webhook_id=webhook_id)
+        self.assertEqual(result, f'Webhook {webhook_id} not found.')
+        self.assertEqual(self.rq_queue.enqueued, [])
+        self.assertEqual(self.rq_queue.connection.data, {})
@@ -1,16 +1,32 @@
 import hashlib
 import hmac
 import logging
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlparse
 
 import requests
-from django_rq import job
+from django.conf import settings
+from django.utils import timezone
+from django_rq import get_queue, job
 from jinja2.exceptions import TemplateError
+from requests.adapters import HTTPAdapter
 
+from netbox.config import get_config
+from netbox.constants import RQ_QUEUE_DEFAULT
 from utilities.proxy import resolve_proxies
+from utilities.rqworker import get_rq_retry
 from .constants import WEBHOOK_EVENT_TYPES
 
 logger = logging.getLogger('netbox.webhooks')
 
+COALESCE_KEY_PREFIX = 'webhook_coalesce'
+
 
 def generate_signature(request_body, secret):
     """
@@ -24,14 +40,122 @@ def generate_signature(request_body, secret):
     return hmac_prep.hexdigest()
 
 
-@job('default')
-def send_webhook(event_rule, model_name, event_type, data, timestamp, username, request_id=None, snapshots=None):
+class WebhookDispatcher:
     """
-    Make a POST request to the defined Webhook
+    Sends webhook requests using a pool of persistent HTTP sessions (one per destination), so that connections are
+    kept alive and reused across requests. Batches of requests are sent concurrently, subject to a per-destination
+    concurrency limit, and may be retried with exponential backoff on connection errors and retryable responses.
+
+    :param concurrency: The maximum number of concurrent requests per destination
+    :param max_retries: The maximum number of times a request within a batch will be retried
+    :param backoff_factor: The base delay (in seconds) between retries, doubled with each attempt
     """
-    webhook = event_rule.action_object
+    retry_statuses = (429, 502, 503, 504)
+    max_workers = 32
+    max_backoff = 60
 
-    # Prepare context data for headers & body templates
+    def __init__(self, concurrency=4, max_retries=3, backoff_factor=0.5):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._destinations = {}
+        self._lock = threading.Lock()
+
+    def get_session(self, webhook, url):
+        """
+        Return the session and concurrency semaphore for the destination of the given URL.
+        """
+        verify = webhook.ca_file_path or webhook.ssl_verification
+        parsed_url = urlparse(url)
+        key = (parsed_url.scheme, parsed_url.netloc, verify)
+
+        with self._lock:
+            if key not in self._destinations:
+                session = requests.Session()
+                session.verify = verify
+                # Sessions are shared among all webhooks to a destination, so cookies must not be retained
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._destinations[key] = (session, threading.BoundedSemaphore(self.concurrency))
+
+            return self._destinations[key]
+
+    def get_backoff(self, attempt, response=None):
+        """
+        Return the number of seconds to wait before the next attempt, honoring any Retry-After header (specified
+        either as a number of seconds or as an HTTP date). The delay never exceeds max_backoff.
+        """
+        delay = self.backoff_factor * (2 ** attempt)
+        if response is not None and (retry_after := response.headers.get('Retry-After')):
+            try:
+                retry_delay = float(retry_after)
+            except ValueError:
+                try:
+                    retry_delay = (parsedate_to_datetime(retry_after) - timezone.now()).total_seconds()
+                except (TypeError, ValueError):
+                    retry_delay = None
+            # Ignore invalid or negative delays
+            if retry_delay is not None and retry_delay >= 0:
+                delay = retry_delay
+        return min(delay, self.max_backoff)
+
+    def send(self, webhook, prepared_request, max_retries=0):
+        """
+        Send a prepared request to its destination and return the response.
+        """
+        url = prepared_request.url
+        session, semaphore = self.get_session(webhook, url)
+        proxies = resolve_proxies(url=url, context={'client': webhook})
+
+        for attempt in range(max_retries + 1):
+            response = error = None
+            with semaphore:
+                try:
+                    response = session.send(prepared_request, proxies=proxies)
+                except requests.exceptions.ConnectionError as e:
+                    error = e
+            if response is not None and response.status_code not in self.retry_statuses:
+                return response
+            if attempt < max_retries:
+                logger.info(f"Retrying request to {url} (attempt {attempt + 1} of {max_retries})")
+                time.sleep(self.get_backoff(attempt, response))
+
+        if error is not None:
+            raise error
+        return response
+
+    def dispatch(self, requests_):
+        """
+        Concurrently send a list of (webhook, prepared request) pairs. Returns a list of responses or exceptions
+        (one for each request, in order).
+        """
+        if not requests_:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(requests_))) as executor:
+            futures = [
+                executor.submit(self.send, webhook, prepared_request, self.max_retries)
+                for webhook, prepared_request in requests_
+            ]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except requests.exceptions.RequestException as e:
+                    results.append(e)
+
+        return results
+
+
+dispatcher = WebhookDispatcher(concurrency=settings.WEBHOOK_CONCURRENCY)
+
+
+def get_webhook_context(model_name, event_type, data, timestamp, username, request_id=None, snapshots=None):
+    """
+    Return the context data for rendering a webhook request for a single event.
+    """
     context = {
         'event': WEBHOOK_EVENT_TYPES.get(event_type, event_type),
         'timestamp': timestamp,
@@ -45,6 +169,13 @@ def send_webhook(event_rule, model_name, event_type, data, timestamp, username,
             'snapshots': snapshots
         })
 
+    return context
+
+
+def build_webhook_request(webhook, context):
+    """
+    Render and return the HTTP request for a Webhook using the given context data.
+    """
     # Build the headers for the HTTP request
     headers = {
         'Content-Type': webhook.http_content_type,
@@ -70,9 +201,12 @@ def send_webhook(event_rule, model_name, event_type, data, timestamp, username,
         'headers': headers,
         'data': body.encode('utf8'),
     }
-    logger.info(
-        f"Sending {params['method']} request to {params['url']} ({context['model']} {context['event']})"
-    )
+    if 'events' in context:
+        logger.info(f"Sending {params['method']} request to {params['url']} ({len(context['events'])} events)")
+    else:
+        logger.info(
+            f"Sending {params['method']} request to {params['url']} ({context['model']} {context['event']})"
+        )
     logger.debug(params)
     try:
         prepared_request = requests.Request(**params).prepare()
@@ -84,14 +218,26 @@ def send_webhook(event_rule, model_name, event_type, data, timestamp, username,
     if webhook.secret != '':
         prepared_request.headers['X-Hook-Signature'] = generate_signature(prepared_request.body, webhook.secret)
 
-    # Send the request
-    with requests.Session() as session:
-        session.verify = webhook.ssl_verification
-        if webhook.ca_file_path:
-            session.verify = webhook.ca_file_path
-        proxies = resolve_proxies(url=url, context={'client': webhook})
-        response = session.send(prepared_request, proxies=proxies)
+    return prepared_request
+
+
+def prepare_webhook_request(event_rule, model_name, event_type, data, timestamp, username, request_id=None,
+                            snapshots=None):
+    """
+    Render the HTTP request for the Webhook assigned to an event rule. Returns the Webhook and the prepared request.
+    """
+    webhook = event_rule.action_object
+    context = get_webhook_context(
+        model_name, event_type, data, timestamp, username, request_id=request_id, snapshots=snapshots
+    )
+
+    return webhook, build_webhook_request(webhook, context)
+
 
+def process_response(response):
+    """
+    Log the outcome of a webhook request, raising an exception if the request failed.
+    """
     if 200 <= response.status_code <= 299:
         logger.info(f"Request succeeded; response status {response.status_code}")
         return f"Status {response.status_code} returned, webhook successfully processed."
@@ -100,3 +246,122 @@ def send_webhook(event_rule, model_name, event_type, data, timestamp, username,
         raise requests.exceptions.RequestException(
             f"Status {response.status_code} returned with content '{response.content}', webhook FAILED to process."
         )
+
+
+@job('default')
+def send_webhook(event_rule, model_name, event_type, data, timestamp, username, request_id=None, snapshots=None):
+    """
+    Make a POST request to the defined Webhook
+    """
+    webhook, prepared_request = prepare_webhook_request(
+        event_rule, model_name, event_type, data, timestamp, username, request_id=request_id, snapshots=snapshots
+    )
+
+    # Send the request
+    response = dispatcher.send(webhook, prepared_request)
+
+    return process_response(response)
+
+
+@job('default')
+def send_coalesced_webhook(webhook, events, timestamp):
+    """
+    Send a single request to a Webhook conveying multiple events. The context data for each event (as returned by
+    get_webhook_context()) is available to the Webhook's templates as `events`.
+    """
+    context = {
+        'events': events,
+        'timestamp': timestamp,
+    }
+    prepared_request = build_webhook_request(webhook, context)
+
+    # Send the request
+    response = dispatcher.send(webhook, prepared_request)
+
+    return process_response(response)
+
+
+def enqueue_coalesced_events(rq_queue, webhook, events):
+    """
+    Append events to the pending batch for a Webhook with a coalescing window, and schedule the delivery of the
+    batch once the window has elapsed (if not already scheduled).
+    """
+    key = f'{COALESCE_KEY_PREFIX}:{webhook.pk}'
+    redis = rq_queue.connection
+    redis.rpush(key, *[pickle.dumps(event) for event in events])
+
+    # Allow a grace period beyond the window before the schedule lock expires, in case the flush job is lost
+    lock_timeout = webhook.coalesce_window * 2 + 60
+    if redis.set(f'{key}:scheduled', 1, nx=True, ex=lock_timeout):
+        rq_queue.enqueue_in(
+            timedelta(seconds=webhook.coalesce_window),
+            'extras.webhooks.flush_coalesced_events',
+            webhook_id=webhook.pk
+        )
+
+
+@job('default')
+def flush_coalesced_events(webhook_id):
+    """
+    Collect all pending events for a Webhook with a coalescing window and enqueue their delivery as a single request.
+    """
+    from extras.models import Webhook
+
+    rq_queue = get_queue(get_config().QUEUE_MAPPINGS.get('webhook', RQ_QUEUE_DEFAULT))
+    key = f'{COALESCE_KEY_PREFIX}:{webhook_id}'
+
+    # Atomically retrieve & clear the pending events. Any subsequent events will schedule a new delivery.
+    with rq_queue.connection.pipeline() as pipe:
+        pipe.lrange(key, 0, -1)
+        pipe.delete(key, f'{key}:scheduled')
+        items, _ = pipe.execute()
+    if not items:
+        return "No pending events."
+
+    try:
+        webhook = Webhook.objects.get(pk=webhook_id)
+    except Webhook.DoesNotExist:
+        logger.warning(f"Discarding {len(items)} pending events for deleted webhook {webhook_id}")
+        return f"Webhook {webhook_id} not found."
+
+    rq_queue.enqueue(
+        'extras.webhooks.send_coalesced_webhook',
+        retry=get_rq_retry(),
+        webhook=webhook,
+        events=[pickle.loads(item) for item in items],
+        timestamp=timezone.now().isoformat()
+    )
+
+    return f"Enqueued delivery of {len(items)} events."
+
+
+@job('default')
+def send_webhooks(deliveries):
+    """
+    Concurrently send a batch of webhooks. Each delivery is a dictionary of arguments for send_webhook(). Any
+    deliveries which cannot be completed are re-enqueued individually, subject to the configured RQ retry policy.
+    """
+    requests_ = []
+    failed = []
+    for delivery in deliveries:
+        try:
+            requests_.append((delivery, prepare_webhook_request(**delivery)))
+        except (TemplateError, ValueError, requests.exceptions.RequestException):
+            failed.append(delivery)
+
+    results = dispatcher.dispatch([request for _, request in requests_])
+    for (delivery, _), result in zip(requests_, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Request failed: {result}")
+            failed.append(delivery)
+        elif not 200 <= result.status_code <= 299:
+            logger.warning(f"Request failed; response status {result.status_code}: {result.content}")
+            failed.append(delivery)
+
+    # Re-enqueue failed deliveries as individual jobs
+    if failed:
+        rq_queue = get_queue(get_config().QUEUE_MAPPINGS.get('webhook', RQ_QUEUE_DEFAULT))
+        for delivery in failed:
+            rq_queue.enqueue('extras.webhooks.send_webhook', retry=get_rq_retry(), **delivery)
+
+    return f"{len(deliveries) - len(failed)} of {len(deliveries)} webhooks successfully processed."
@@ -1,13 +1,15 @@
 from django.contrib.contenttypes.models import ContentType
+from django.utils.translation import gettext as _
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
 from dcim.constants import LOCATION_SCOPE_TYPES
 from ipam.choices import *
 from ipam.constants import IPADDRESS_ASSIGNMENT_MODELS
-from ipam.models import Aggregate, IPAddress, IPRange, Prefix
+from ipam.models import Aggregate, IPAddress, IPRange, Prefix, VRF
 from netbox.api.fields import ChoiceField, ContentTypeField
 from netbox.api.serializers import NetBoxModelSerializer
+from netbox.config import get_config
 from tenancy.api.serializers_.tenants import TenantSerializer
 from utilities.api import get_serializer_for_model
 from .asns import RIRSerializer
@@ -24,6 +26,8 @@ __all__ = (
     'IPAddressSerializer',
     'IPRangeSerializer',
     'PrefixLengthSerializer',
+    'PrefixLookupResultSerializer',
+    'PrefixLookupSerializer',
     'PrefixSerializer',
 )
 
@@ -33,12 +37,13 @@ class AggregateSerializer(NetBoxModelSerializer):
     rir = RIRSerializer(nested=True)
     tenant = TenantSerializer(nested=True, required=False, allow_null=True)
     prefix = IPNetworkField()
+    utilization = serializers.FloatField(source='get_utilization', read_only=True)
 
     class Meta:
         model = Aggregate
         fields = [
             'id', 'url', 'display_url', 'display', 'family', 'prefix', 'rir', 'tenant', 'date_added', 'description',
-            'comments', 'tags', 'custom_fields', 'created', 'last_updated',
+            'comments', 'tags', 'custom_fields', 'created', 'last_updated', 'utilization',
         ]
         brief_fields = ('id', 'url', 'display', 'family', 'prefix', 'description')
 
@@ -62,6 +67,7 @@ class PrefixSerializer(NetBoxModelSerializer):
     role = RoleSerializer(nested=True, required=False, allow_null=True)
     children = serializers.IntegerField(read_only=True)
     _depth = serializers.IntegerField(read_only=True)
+    utilization = serializers.FloatField(source='get_utilization', read_only=True)
     prefix = IPNetworkField()
 
     class Meta:
@@ -69,7 +75,7 @@ class PrefixSerializer(NetBoxModelSerializer):
         fields = [
             'id', 'url', 'display_url', 'display', 'family', 'prefix', 'vrf', 'scope_type', 'scope_id', 'scope',
             'tenant', 'vlan', 'status', 'role', 'is_pool', 'mark_utilized', 'description', 'comments', 'tags',
-            'custom_fields', 'created', 'last_updated', 'children', '_depth',
+            'custom_fields', 'created', 'last_updated', 'children', '_depth', 'utilization',
         ]
         brief_fields = ('id', 'url', 'display', 'family', 'prefix', 'description', '_depth')
 
@@ -109,6 +115,34 @@ class PrefixLengthSerializer(serializers.Serializer):
         return data
 
 
+class PrefixLookupSerializer(serializers.Serializer):
+    """
+    A batch of IP addresses for which the containing prefixes are to be found.
+    """
+    vrf = serializers.PrimaryKeyRelatedField(queryset=VRF.objects.all(), required=False, allow_null=True)
+    addresses = serializers.ListField(child=IPAddressField(), allow_empty=False)
+
+    def validate_addresses(self, value):
+        # Limit the size of a batch to MAX_PAGE_SIZE (if set)
+        max_page_size = get_config().MAX_PAGE_SIZE
+        if max_page_size and len(value) > max_page_size:
+            raise serializers.ValidationError(
+                _("A maximum of {max_page_size} addresses may be looked up at once.").format(
+                    max_page_size=max_page_size
+                )
+            )
+        return value
+
+
+class PrefixLookupResultSerializer(serializers.Serializer):
+    """
+    The most specific prefix containing an IP address, and its ancestors (from the least specific).
+    """
+    address = serializers.CharField(read_only=True)
+    prefix = PrefixSerializer(nested=True, read_only=True, allow_null=True)
+    ancestors = PrefixSerializer(nested=True, many=True, read_only=True)
+
+
 class AvailablePrefixSerializer(serializers.Serializer):
     """
     Representation of a prefix which does not exist in the database.
@@ -39,6 +39,11 @@ urlpatterns = [
         views.IPRangeAvailableIPAddressesView.as_view(),
         name='iprange-available-ips'
     ),
+    path(
+        'prefixes/lookup/',
+        views.PrefixLookupView.as_view(),
+        name='prefix-lookup'
+    ),
     path(
         'prefixes/<int:pk>/available-prefixes/',
         views.AvailablePrefixesView.as_view(),
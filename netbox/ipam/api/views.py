@@ -7,7 +7,6 @@ from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext as _
 from django_pglocks import advisory_lock
 from drf_spectacular.utils import extend_schema
-from netaddr import IPSet
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
@@ -17,7 +16,10 @@ from rest_framework.views import APIView
 from dcim.models import Interface
 from ipam import filtersets
 from ipam.models import *
-from ipam.utils import get_next_available_prefix
+from ipam.prefix_index import prefix_index
+from ipam.signals import defer_prefix_maintenance
+from ipam.utils import allocate_prefixes
+from netbox.api.authentication import IsAuthenticatedOrLoginNotRequired
 from netbox.api.viewsets import NetBoxModelViewSet
 from netbox.api.viewsets.mixins import ObjectValidationMixin
 from netbox.config import get_config
@@ -238,6 +240,12 @@ class AvailableObjectsView(ObjectValidationMixin, APIView):
         """
         return requested_objects
 
+    def save_objects(self, serializer):
+        """
+        Create the requested objects from the validated serializer.
+        """
+        return serializer.save()
+
     def get(self, request, pk):
         parent = self.get_parent(request, pk)
         limit = get_results_limit(request)
@@ -296,7 +304,7 @@ class AvailableObjectsView(ObjectValidationMixin, APIView):
             # Create the new IP address(es)
             try:
                 with transaction.atomic(using=router.db_for_write(self.queryset.model)):
-                    created = serializer.save()
+                    created = self.save_objects(serializer)
                     self._validate_objects(created)
             except ObjectDoesNotExist:
                 raise PermissionDenied()
@@ -314,7 +322,7 @@ class AvailableASNsView(AvailableObjectsView):
         return get_object_or_404(ASNRange.objects.restrict(request.user), pk=pk)
 
     def get_available_objects(self, parent, limit=None):
-        return parent.get_available_asns()[:limit]
+        return parent.get_available_asns(limit=limit)
 
     def get_extra_context(self, parent):
         return {
@@ -357,11 +365,8 @@ class AvailablePrefixesView(AvailableObjectsView):
         return parent.get_available_prefixes().iter_cidrs()
 
     def check_sufficient_available(self, requested_objects, available_objects):
-        available_prefixes = IPSet(available_objects)
-        for requested_object in requested_objects:
-            if not get_next_available_prefix(available_prefixes, requested_object['prefix_length']):
-                return False
-        return True
+        prefix_lengths = [requested_object['prefix_length'] for requested_object in requested_objects]
+        return allocate_prefixes(available_objects, prefix_lengths) is not None
 
     def get_extra_context(self, parent):
         return {
@@ -370,20 +375,25 @@ class AvailablePrefixesView(AvailableObjectsView):
         }
 
     def prep_object_data(self, requested_objects, available_objects, parent):
-        available_prefixes = IPSet(available_objects)
-        for i, request_data in enumerate(requested_objects):
+        # Plan the allocation of all requested prefixes at once
+        prefix_lengths = [request_data['prefix_length'] for request_data in requested_objects]
+        allocated_prefixes = allocate_prefixes(available_objects, prefix_lengths)
+        if allocated_prefixes is None:
+            raise ValidationError(_("Insufficient space is available to accommodate the requested prefix size(s)"))
 
-            # Find the first available prefix equal to or larger than the requested size
-            if allocated_prefix := get_next_available_prefix(available_prefixes, request_data['prefix_length']):
-                request_data.update({
-                    'prefix': allocated_prefix,
-                    'vrf': parent.vrf.pk if parent.vrf else None,
-                })
-            else:
-                raise ValidationError(_("Insufficient space is available to accommodate the requested prefix size(s)"))
+        for request_data, allocated_prefix in zip(requested_objects, allocated_prefixes):
+            request_data.update({
+                'prefix': allocated_prefix,
+                'vrf': parent.vrf.pk if parent.vrf else None,
+            })
 
         return requested_objects
 
+    def save_objects(self, serializer):
+        # Update the prefix hierarchy & utilization once for all new prefixes
+        with defer_prefix_maintenance():
+            return super().save_objects(serializer)
+
     @extend_schema(methods=["get"], responses={200: serializers.AvailablePrefixSerializer(many=True)})
     def get(self, request, pk):
         return super().get(request, pk)
@@ -404,13 +414,8 @@ class AvailableIPAddressesView(AvailableObjectsView):
     advisory_lock_key = 'available-ips'
 
     def get_available_objects(self, parent, limit=None):
-        # Calculate available IPs within the parent
-        ip_list = []
-        for index, ip in enumerate(parent.get_available_ips(), start=1):
-            ip_list.append(ip)
-            if index == limit:
-                break
-        return ip_list
+        # Find the first available IPs within the parent
+        return parent.get_next_available_ips(count=limit)
 
     def get_extra_context(self, parent):
         return {
@@ -463,7 +468,7 @@ class AvailableVLANsView(AvailableObjectsView):
         return get_object_or_404(VLANGroup.objects.restrict(request.user), pk=pk)
 
     def get_available_objects(self, parent, limit=None):
-        return parent.get_available_vids()[:limit]
+        return parent.get_available_vids(limit=limit)
 
     def get_extra_context(self, parent):
         return {
@@ -490,3 +495,51 @@ class AvailableVLANsView(AvailableObjectsView):
     )
     def post(self, request, pk):
         return super().post(request, pk)
+
+
+#
+# Miscellaneous
+#
+
+class PrefixLookupView(APIView):
+    """
+    Find the most specific prefix (and its ancestors) containing each of a list of IP addresses within a VRF (or the
+    global table, if no VRF is specified). Lookups are made against an in-memory index of all prefixes, and only
+    prefixes which the user is permitted to view are returned.
+    """
+    permission_classes = [IsAuthenticatedOrLoginNotRequired]
+
+    def get_view_name(self):
+        return "Prefix Lookup"
+
+    @extend_schema(
+        request=serializers.PrefixLookupSerializer,
+        responses={200: serializers.PrefixLookupResultSerializer(many=True)}
+    )
+    def post(self, request):
+        serializer = serializers.PrefixLookupSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        addresses = [address.ip for address in serializer.validated_data['addresses']]
+        vrf = serializer.validated_data.get('vrf')
+        matches = prefix_index.lookup(addresses, vrf_id=vrf.pk if vrf else None)
+
+        # Retrieve all matching prefixes which the user is permitted to view
+        prefixes = Prefix.objects.restrict(request.user, 'view').in_bulk({
+            pk for address_matches in matches for pks in address_matches for pk in pks
+        })
+
+        results = []
+        for address, address_matches in zip(addresses, matches):
+            # Select the first viewable prefix of each length, from the most specific
+            chain = []
+            for pks in address_matches:
+                if viewable := [prefixes[pk] for pk in pks if pk in prefixes]:
+                    chain.append(viewable[0])
+            results.append({
+                'address': str(address),
+                'prefix': chain[0] if chain else None,
+                'ancestors': list(reversed(chain[1:])),
+            })
+
+        serializer = serializers.PrefixLookupResultSerializer(results, many=True, context={'request': request})
+        return Response(serializer.data)
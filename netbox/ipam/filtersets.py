@@ -15,7 +15,8 @@ from netbox.filtersets import ChangeLoggedModelFilterSet, OrganizationalModelFil
 from tenancy.filtersets import ContactModelFilterSet, TenancyFilterSet
 
 from utilities.filters import (
-    ContentTypeFilter, MultiValueCharFilter, MultiValueNumberFilter, NumericArrayFilter, TreeNodeMultipleChoiceFilter,
+    ContentTypeFilter, MultiValueCharFilter, MultiValueDecimalFilter, MultiValueNumberFilter, NumericArrayFilter,
+    TreeNodeMultipleChoiceFilter,
 )
 from virtualization.models import VirtualMachine, VMInterface
 from vpn.models import L2VPN
@@ -168,6 +169,9 @@ class AggregateFilterSet(NetBoxModelFilterSet, TenancyFilterSet, ContactModelFil
         to_field_name='slug',
         label=_('RIR (slug)'),
     )
+    utilization = MultiValueDecimalFilter(
+        field_name='_utilization'
+    )
 
     class Meta:
         model = Aggregate
@@ -317,6 +321,9 @@ class PrefixFilterSet(NetBoxModelFilterSet, ScopedFilterSet, TenancyFilterSet, C
     children = MultiValueNumberFilter(
         field_name='_children'
     )
+    utilization = MultiValueDecimalFilter(
+        field_name='_utilization'
+    )
     mask_length = MultiValueNumberFilter(
         field_name='prefix',
         lookup_expr='net_mask_length',
@@ -107,6 +107,10 @@ class AggregateType(NetBoxObjectType, ContactsMixin, BaseIPAddressFamilyType):
     rir: Annotated["RIRType", strawberry.lazy('ipam.graphql.types')] | None
     tenant: Annotated["TenantType", strawberry.lazy('tenancy.graphql.types')] | None
 
+    @strawberry_django.field
+    def utilization(self) -> float:
+        return self.get_utilization()
+
 
 @strawberry_django.type(
     models.FHRPGroup,
@@ -197,6 +201,10 @@ class PrefixType(NetBoxObjectType, ContactsMixin, BaseIPAddressFamilyType):
     ], strawberry.union("PrefixScopeType")] | None:
         return self.scope
 
+    @strawberry_django.field
+    def utilization(self) -> float:
+        return self.get_utilization()
+
 
 @strawberry_django.type(
     models.RIR,
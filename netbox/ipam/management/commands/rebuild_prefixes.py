@@ -1,4 +1,8 @@
-from django.core.management.base import BaseCommand
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 
 from ipam.models import Prefix, VRF
 from ipam.utils import rebuild_prefixes
@@ -7,21 +11,61 @@ from ipam.utils import rebuild_prefixes
 class Command(BaseCommand):
     help = "Rebuild the prefix hierarchy (depth and children counts)"
 
-    def handle(self, *model_names, **options):
-        self.stdout.write(f'Rebuilding {Prefix.objects.count()} prefixes...')
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--vrf", action='append', dest='vrfs', metavar='VRF_ID',
+            help="Rebuild only the VRF with the specified ID, or 'global' for the global table (may be repeated)"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="The number of worker processes among which VRFs are rebuilt concurrently (default: 1)"
+        )
+
+    def get_vrfs(self, vrf_ids):
+        """
+        Return a dictionary mapping the ID of each VRF to be rebuilt (or None for the global table) to its name.
+        """
+        if not vrf_ids:
+            return {
+                None: 'Global',
+                **{vrf.pk: f'VRF {vrf}' for vrf in VRF.objects.all()}
+            }
 
-        # Reset existing counts
-        Prefix.objects.update(_depth=0, _children=0)
+        vrfs = {}
+        for vrf_id in vrf_ids:
+            if vrf_id.lower() == 'global':
+                vrfs[None] = 'Global'
+                continue
+            try:
+                vrf = VRF.objects.get(pk=vrf_id)
+            except (ValueError, VRF.DoesNotExist):
+                raise CommandError(f"Invalid VRF ID: {vrf_id}")
+            vrfs[vrf.pk] = f'VRF {vrf}'
+        return vrfs
+
+    def handle(self, *model_names, **options):
+        if options['workers'] < 1:
+            raise CommandError("The number of workers must be at least 1.")
 
-        # Rebuild the global table
-        global_count = Prefix.objects.filter(vrf__isnull=True).count()
-        self.stdout.write(f'Global: {global_count} prefixes...')
-        rebuild_prefixes(None)
+        vrfs = self.get_vrfs(options['vrfs'])
+        prefix_count = Prefix.objects.filter(vrf__in=[pk for pk in vrfs if pk is not None]).count()
+        if None in vrfs:
+            prefix_count += Prefix.objects.filter(vrf__isnull=True).count()
+        self.stdout.write(f'Rebuilding {prefix_count} prefixes in {len(vrfs)} tables...')
 
-        # Rebuild each VRF
-        for vrf in VRF.objects.all():
-            vrf_count = Prefix.objects.filter(vrf=vrf).count()
-            self.stdout.write(f'VRF {vrf}: {vrf_count} prefixes...')
-            rebuild_prefixes(vrf.pk)
+        # Rebuild VRFs in parallel among worker processes. Database connections must be closed prior to forking so
+        # that each worker establishes its own.
+        if options['workers'] > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('fork')
+            ) as executor:
+                futures = {executor.submit(rebuild_prefixes, vrf_id): vrf_id for vrf_id in vrfs}
+                for future in as_completed(futures):
+                    self.stdout.write(f'{vrfs[futures[future]]}: {future.result()} prefixes')
+        else:
+            for vrf_id, name in vrfs.items():
+                self.stdout.write(f'{name}: {rebuild_prefixes(vrf_id)} prefixes')
 
         self.stdout.write(self.style.SUCCESS('Finished.'))
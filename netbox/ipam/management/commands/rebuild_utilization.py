@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from ipam.models import Aggregate, Prefix, VRF
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached utilization of all prefixes and aggregates"
+
+    def handle(self, *model_names, **options):
+        self.stdout.write(f'Rebuilding utilization for {Prefix.objects.count()} prefixes...')
+
+        # Rebuild the global table
+        global_count = Prefix.objects.filter(vrf__isnull=True).count()
+        self.stdout.write(f'Global: {global_count} prefixes...')
+        Prefix.objects.filter(vrf__isnull=True).update_utilization()
+
+        # Rebuild each VRF
+        for vrf in VRF.objects.all():
+            vrf_count = Prefix.objects.filter(vrf=vrf).count()
+            self.stdout.write(f'VRF {vrf}: {vrf_count} prefixes...')
+            Prefix.objects.filter(vrf=vrf).update_utilization()
+
+        # Rebuild aggregates
+        self.stdout.write(f'Rebuilding utilization for {Aggregate.objects.count()} aggregates...')
+        Aggregate.objects.update_utilization()
+
+        self.stdout.write(self.style.SUCCESS('Finished.'))
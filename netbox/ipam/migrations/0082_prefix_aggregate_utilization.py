@@ -0,0 +1,132 @@
+from django.db import migrations, models
+from django.db.models.expressions import RawSQL
+
+# Utilization expressions as defined at the time of this migration (see ipam.querysets)
+
+PREFIX_POPULATED_SIZE = (
+    'SELECT ('
+    '  SELECT COUNT(DISTINCT CAST(HOST(U0."address") AS INET)) '
+    '  FROM "ipam_ipaddress" U0 '
+    '  WHERE (CAST(HOST(U0."address") AS INET) <<= "ipam_prefix"."prefix" '
+    '  AND COALESCE(U0."vrf_id", 0) = COALESCE("ipam_prefix"."vrf_id", 0) '
+    '  AND NOT EXISTS ('
+    '    SELECT 1 FROM "ipam_iprange" U1 '
+    '    WHERE (U1."mark_utilized" '
+    '    AND COALESCE(U1."vrf_id", 0) = COALESCE("ipam_prefix"."vrf_id", 0) '
+    '    AND CAST(HOST(U1."start_address") AS INET) <<= "ipam_prefix"."prefix" '
+    '    AND CAST(HOST(U1."end_address") AS INET) <<= "ipam_prefix"."prefix" '
+    '    AND CAST(HOST(U0."address") AS INET) BETWEEN CAST(HOST(U1."start_address") AS INET) '
+    '    AND CAST(HOST(U1."end_address") AS INET))'
+    '  ))'
+    ') + ('
+    '  SELECT COALESCE(SUM(U2."size"), 0) '
+    '  FROM "ipam_iprange" U2 '
+    '  WHERE (U2."mark_utilized" '
+    '  AND COALESCE(U2."vrf_id", 0) = COALESCE("ipam_prefix"."vrf_id", 0) '
+    '  AND CAST(HOST(U2."start_address") AS INET) <<= "ipam_prefix"."prefix" '
+    '  AND CAST(HOST(U2."end_address") AS INET) <<= "ipam_prefix"."prefix")'
+    ')'
+)
+
+PREFIX_CHILD_SIZE = (
+    'SELECT COALESCE(SUM(POWER(2::numeric, '
+    '  (CASE WHEN FAMILY(U0."prefix") = 4 THEN 32 ELSE 128 END) - MASKLEN(U0."prefix"))), 0) '
+    'FROM ('
+    '  SELECT DISTINCT U1."prefix" FROM "ipam_prefix" U1 '
+    '  WHERE (U1."prefix" << "ipam_prefix"."prefix" '
+    '  AND COALESCE(U1."vrf_id", 0) = COALESCE("ipam_prefix"."vrf_id", 0) '
+    '  AND NOT EXISTS ('
+    '    SELECT 1 FROM "ipam_prefix" U2 '
+    '    WHERE (U2."prefix" >> U1."prefix" AND U2."prefix" << "ipam_prefix"."prefix" '
+    '    AND COALESCE(U2."vrf_id", 0) = COALESCE("ipam_prefix"."vrf_id", 0))'
+    '  ))'
+    ') U0'
+)
+
+PREFIX_UTILIZATION = (
+    'SELECT CASE '
+    'WHEN "ipam_prefix"."mark_utilized" THEN 100 '
+    'WHEN "ipam_prefix"."status" = %s THEN LEAST(100, '
+    '  CAST("ipam_prefix"."_child_size" AS DOUBLE PRECISION) / CAST(POWER(2::numeric, '
+    '  (CASE WHEN FAMILY("ipam_prefix"."prefix") = 4 THEN 32 ELSE 128 END) - MASKLEN("ipam_prefix"."prefix")) '
+    '  AS DOUBLE PRECISION) * 100) '
+    'ELSE LEAST(100, '
+    '  CAST("ipam_prefix"."_populated_size" AS DOUBLE PRECISION) / CAST(POWER(2::numeric, '
+    '  (CASE WHEN FAMILY("ipam_prefix"."prefix") = 4 THEN 32 ELSE 128 END) - MASKLEN("ipam_prefix"."prefix")) - '
+    '  (CASE WHEN FAMILY("ipam_prefix"."prefix") = 4 AND MASKLEN("ipam_prefix"."prefix") < 31 '
+    '  AND NOT "ipam_prefix"."is_pool" THEN 2 ELSE 0 END) AS DOUBLE PRECISION) * 100) '
+    'END'
+)
+
+AGGREGATE_CHILD_SIZE = (
+    'SELECT COALESCE(SUM(POWER(2::numeric, '
+    '  (CASE WHEN FAMILY(U0."prefix") = 4 THEN 32 ELSE 128 END) - MASKLEN(U0."prefix"))), 0) '
+    'FROM ('
+    '  SELECT DISTINCT U1."prefix" FROM "ipam_prefix" U1 '
+    '  WHERE (U1."prefix" <<= "ipam_aggregate"."prefix" '
+    '  AND NOT EXISTS ('
+    '    SELECT 1 FROM "ipam_prefix" U2 '
+    '    WHERE (U2."prefix" >> U1."prefix" AND U2."prefix" <<= "ipam_aggregate"."prefix")'
+    '  ))'
+    ') U0'
+)
+
+AGGREGATE_UTILIZATION = (
+    'SELECT LEAST(100, '
+    '  CAST("ipam_aggregate"."_child_size" AS DOUBLE PRECISION) / CAST(POWER(2::numeric, '
+    '  (CASE WHEN FAMILY("ipam_aggregate"."prefix") = 4 THEN 32 ELSE 128 END) - '
+    '  MASKLEN("ipam_aggregate"."prefix")) AS DOUBLE PRECISION) * 100)'
+)
+
+
+def populate_utilization(apps, schema_editor):
+    """
+    Calculate the cached utilization of all existing prefixes and aggregates.
+    """
+    Aggregate = apps.get_model('ipam', 'Aggregate')
+    Prefix = apps.get_model('ipam', 'Prefix')
+    db_alias = schema_editor.connection.alias
+
+    Prefix.objects.using(db_alias).update(
+        _populated_size=RawSQL(PREFIX_POPULATED_SIZE, ()),
+        _child_size=RawSQL(PREFIX_CHILD_SIZE, ())
+    )
+    Prefix.objects.using(db_alias).update(_utilization=RawSQL(PREFIX_UTILIZATION, ('container',)))
+    Aggregate.objects.using(db_alias).update(_child_size=RawSQL(AGGREGATE_CHILD_SIZE, ()))
+    Aggregate.objects.using(db_alias).update(_utilization=RawSQL(AGGREGATE_UTILIZATION, ()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ipam', '0081_remove_service_device_virtual_machine_add_parent_gfk_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aggregate',
+            name='_child_size',
+            field=models.DecimalField(decimal_places=0, default=0, editable=False, max_digits=39),
+        ),
+        migrations.AddField(
+            model_name='aggregate',
+            name='_utilization',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='prefix',
+            name='_child_size',
+            field=models.DecimalField(decimal_places=0, default=0, editable=False, max_digits=39),
+        ),
+        migrations.AddField(
+            model_name='prefix',
+            name='_populated_size',
+            field=models.DecimalField(decimal_places=0, default=0, editable=False, max_digits=39),
+        ),
+        migrations.AddField(
+            model_name='prefix',
+            name='_utilization',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(code=populate_utilization, reverse_code=migrations.RunPython.noop),
+    ]
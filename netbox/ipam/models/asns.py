@@ -1,3 +1,5 @@
+from itertools import islice
+
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -77,15 +79,23 @@ class ASNRange(OrganizationalModel):
             asn__lte=self.end
         )
 
-    def get_available_asns(self):
+    def get_available_asns(self, limit=None):
         """
-        Return all available ASNs within this range.
+        Return a list of up to `limit` available ASNs within this range, in ascending order.
         """
-        range = set(self.range)
-        existing_asns = set(self.get_child_asns().values_list('asn', flat=True))
-        available_asns = sorted(range - existing_asns)
+        return list(islice(self.iter_available_asns(), limit))
 
-        return available_asns
+    def iter_available_asns(self):
+        """
+        Lazily yield all available ASNs within this range, in ascending order. Available ASNs are derived from the
+        gaps between allocated ASNs, so that the cost is proportional to the number of ASNs allocated rather than
+        to the size of the range.
+        """
+        next_asn = self.start
+        for asn in self.get_child_asns().order_by('asn').values_list('asn', flat=True).iterator():
+            yield from range(next_asn, asn)
+            next_asn = asn + 1
+        yield from range(next_asn, self.end + 1)
 
 
 class ASN(PrimaryModel):
@@ -12,9 +12,9 @@ from dcim.models.mixins import CachedScopeMixin
 from ipam.choices import *
 from ipam.constants import *
 from ipam.fields import IPNetworkField, IPAddressField
-from ipam.lookups import Host
+from ipam.lookups import Host, Inet
 from ipam.managers import IPAddressManager
-from ipam.querysets import PrefixQuerySet
+from ipam.querysets import AggregateQuerySet, PrefixQuerySet
 from ipam.validators import DNSValidator
 from netbox.config import get_config
 from netbox.models import OrganizationalModel, PrimaryModel
@@ -100,6 +100,20 @@ class Aggregate(ContactsMixin, GetAvailablePrefixesMixin, PrimaryModel):
         null=True
     )
 
+    # Cached utilization
+    _child_size = models.DecimalField(
+        max_digits=39,
+        decimal_places=0,
+        default=0,
+        editable=False
+    )
+    _utilization = models.FloatField(
+        default=0,
+        editable=False
+    )
+
+    objects = AggregateQuerySet.as_manager()
+
     clone_fields = (
         'rir', 'tenant', 'date_added', 'description',
     )
@@ -112,6 +126,12 @@ class Aggregate(ContactsMixin, GetAvailablePrefixesMixin, PrimaryModel):
         verbose_name = _('aggregate')
         verbose_name_plural = _('aggregates')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Cache the original prefix so we can check if it has changed on post_save
+        self._prefix = self.__dict__.get('prefix')
+
     def __str__(self):
         return str(self.prefix)
 
@@ -175,11 +195,10 @@ class Aggregate(ContactsMixin, GetAvailablePrefixesMixin, PrimaryModel):
 
     def get_utilization(self):
         """
-        Determine the prefix utilization of the aggregate and return it as a percentage.
+        Determine the prefix utilization of the aggregate and return it as a percentage. This is calculated from the
+        cached size of all child prefixes.
         """
-        queryset = Prefix.objects.filter(prefix__net_contained_or_equal=str(self.prefix))
-        child_prefixes = netaddr.IPSet([p.prefix for p in queryset])
-        utilization = float(child_prefixes.size) / self.prefix.size * 100
+        utilization = float(self._child_size) / self.prefix.size * 100
 
         return min(utilization, 100)
 
@@ -271,6 +290,24 @@ class Prefix(ContactsMixin, GetAvailablePrefixesMixin, CachedScopeMixin, Primary
         editable=False
     )
 
+    # Cached utilization
+    _populated_size = models.DecimalField(
+        max_digits=39,
+        decimal_places=0,
+        default=0,
+        editable=False
+    )
+    _child_size = models.DecimalField(
+        max_digits=39,
+        decimal_places=0,
+        default=0,
+        editable=False
+    )
+    _utilization = models.FloatField(
+        default=0,
+        editable=False
+    )
+
     objects = PrefixQuerySet.as_manager()
 
     clone_fields = (
@@ -289,6 +326,11 @@ class Prefix(ContactsMixin, GetAvailablePrefixesMixin, CachedScopeMixin, Primary
         self._prefix = self.__dict__.get('prefix')
         self._vrf_id = self.__dict__.get('vrf_id')
 
+        # Cache the original attributes which determine utilization, for the same reason
+        self._status = self.__dict__.get('status')
+        self._is_pool = self.__dict__.get('is_pool')
+        self._mark_utilized = self.__dict__.get('mark_utilized')
+
     def __str__(self):
         return str(self.prefix)
 
@@ -446,42 +488,63 @@ class Prefix(ContactsMixin, GetAvailablePrefixesMixin, CachedScopeMixin, Primary
 
         return available_ips
 
+    def get_next_available_ips(self, count=None):
+        """
+        Return a list of up to `count` available IPs within this prefix, in ascending order. Unlike
+        get_available_ips(), gaps between child IPs and ranges are found within the database.
+        """
+        from ipam.utils import get_next_available_ips
+
+        first = netaddr.IPAddress(self.prefix.first, self.family)
+        last = netaddr.IPAddress(self.prefix.last, self.family)
+
+        # IPv6 /127's, pool, or IPv4 /31-/32 sets are fully usable
+        if not ((self.family == 6 and self.prefix.prefixlen >= 127) or self.is_pool or (
+                self.family == 4 and self.prefix.prefixlen >= 31
+        )):
+            # Omit the first address (network or Subnet-Router anycast address), and for IPv4 the broadcast address
+            first += 1
+            if self.family == 4:
+                last -= 1
+
+        occupied = (
+            self.get_child_ips().order_by().annotate(
+                first=Inet(Host('address')),
+                last=Inet(Host('address'))
+            ).values_list('first', 'last'),
+            self.get_child_ranges(mark_populated=True).order_by().annotate(
+                first=Inet(Host('start_address')),
+                last=Inet(Host('end_address'))
+            ).values_list('first', 'last'),
+        )
+
+        return get_next_available_ips(first, last, occupied, count)
+
     def get_first_available_ip(self):
         """
         Return the first available IP within the prefix (or None).
         """
-        available_ips = self.get_available_ips()
+        available_ips = self.get_next_available_ips(count=1)
         if not available_ips:
             return None
-        return '{}/{}'.format(next(available_ips.__iter__()), self.prefix.prefixlen)
+        return '{}/{}'.format(available_ips[0], self.prefix.prefixlen)
 
     def get_utilization(self):
         """
         Determine the utilization of the prefix and return it as a percentage. For Prefixes with a status of
-        "container", calculate utilization based on child prefixes. For all others, count child IP addresses.
+        "container", calculate utilization based on the cached size of child prefixes. For all others, use the cached
+        number of populated addresses (child IP addresses and utilized IP ranges).
         """
         if self.mark_utilized:
             return 100
 
         if self.status == PrefixStatusChoices.STATUS_CONTAINER:
-            queryset = Prefix.objects.filter(
-                prefix__net_contained=str(self.prefix),
-                vrf=self.vrf
-            )
-            child_prefixes = netaddr.IPSet([p.prefix for p in queryset])
-            utilization = float(child_prefixes.size) / self.prefix.size * 100
+            utilization = float(self._child_size) / self.prefix.size * 100
         else:
-            # Compile an IPSet to avoid counting duplicate IPs
-            child_ips = netaddr.IPSet()
-            for iprange in self.get_child_ranges().filter(mark_utilized=True):
-                child_ips.add(iprange.range)
-            for ip in self.get_child_ips():
-                child_ips.add(ip.address.ip)
-
             prefix_size = self.prefix.size
             if self.prefix.version == 4 and self.prefix.prefixlen < 31 and not self.is_pool:
                 prefix_size -= 2
-            utilization = float(child_ips.size) / prefix_size * 100
+            utilization = float(self._populated_size) / prefix_size * 100
 
         return min(utilization, 100)
 
@@ -552,6 +615,15 @@ class IPRange(ContactsMixin, PrimaryModel):
         verbose_name = _('IP range')
         verbose_name_plural = _('IP ranges')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Cache the original addresses, VRF, and utilized designation so we can check if they have changed on post_save
+        self._start_address = self.__dict__.get('start_address')
+        self._end_address = self.__dict__.get('end_address')
+        self._vrf_id = self.__dict__.get('vrf_id')
+        self._mark_utilized = self.__dict__.get('mark_utilized')
+
     def __str__(self):
         return self.name
 
@@ -689,16 +761,35 @@ class IPRange(ContactsMixin, PrimaryModel):
 
         return netaddr.IPSet(range) - child_ips
 
+    def get_next_available_ips(self, count=None):
+        """
+        Return a list of up to `count` available IPs within this range, in ascending order. Unlike
+        get_available_ips(), gaps between child IPs are found within the database.
+        """
+        from ipam.utils import get_next_available_ips
+
+        if self.mark_populated:
+            return []
+
+        occupied = (
+            self.get_child_ips().order_by().annotate(
+                first=Inet(Host('address')),
+                last=Inet(Host('address'))
+            ).values_list('first', 'last'),
+        )
+
+        return get_next_available_ips(self.start_address.ip, self.end_address.ip, occupied, count)
+
     @cached_property
     def first_available_ip(self):
         """
         Return the first available IP within the range (or None).
         """
-        available_ips = self.get_available_ips()
+        available_ips = self.get_next_available_ips(count=1)
         if not available_ips:
             return None
 
-        return '{}/{}'.format(next(available_ips.__iter__()), self.start_address.prefixlen)
+        return '{}/{}'.format(available_ips[0], self.start_address.prefixlen)
 
     @cached_property
     def utilization(self):
@@ -818,6 +909,10 @@ class IPAddress(ContactsMixin, PrimaryModel):
         self._original_assigned_object_id = self.__dict__.get('assigned_object_id')
         self._original_assigned_object_type_id = self.__dict__.get('assigned_object_type_id')
 
+        # Cache the original address and VRF so we can check if they have changed on post_save
+        self._address = self.__dict__.get('address')
+        self._vrf_id = self.__dict__.get('vrf_id')
+
     @property
     def ipv6_full(self):
         if self.address and self.address.version == 6:
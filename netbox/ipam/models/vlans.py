@@ -1,3 +1,5 @@
+from itertools import islice
+
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.postgres.fields import ArrayField, IntegerRangeField
@@ -136,27 +138,52 @@ class VLANGroup(OrganizationalModel):
 
         super().save(*args, **kwargs)
 
-    def get_available_vids(self):
+    def iter_available_vid_ranges(self):
         """
-        Return all available VLANs within this group.
+        Lazily yield a (first, last) tuple for each contiguous range of available VLAN IDs within this group, in
+        ascending order. Ranges are derived from the gaps between the VIDs of child VLANs, so that the cost is
+        proportional to the number of VLANs and VID ranges rather than to the number of VLAN IDs.
         """
-        available_vlans = set()
-        for vlan_range in self.vid_ranges:
-            available_vlans = available_vlans.union({
-                vid for vid in range(vlan_range.lower, vlan_range.upper)
-            })
-        available_vlans -= set(VLAN.objects.filter(group=self).values_list('vid', flat=True))
+        vid_ranges = sorted(
+            (
+                vid_range.lower if vid_range.lower_inc else vid_range.lower + 1,
+                vid_range.upper if vid_range.upper_inc else vid_range.upper - 1,
+            )
+            for vid_range in self.vid_ranges
+        )
+        used_vids = self.get_child_vlans().values_list('vid', flat=True).iterator()
+        next_used = next(used_vids, None)
+
+        for lower, upper in vid_ranges:
+            first_vid = lower
+            while next_used is not None and next_used <= upper:
+                # Ignore VIDs outside the current range
+                if next_used >= first_vid:
+                    if next_used > first_vid:
+                        yield first_vid, next_used - 1
+                    first_vid = next_used + 1
+                next_used = next(used_vids, None)
+            if first_vid <= upper:
+                yield first_vid, upper
+
+    def iter_available_vids(self):
+        """
+        Lazily yield all available VLAN IDs within this group, in ascending order.
+        """
+        for first_vid, last_vid in self.iter_available_vid_ranges():
+            yield from range(first_vid, last_vid + 1)
 
-        return sorted(available_vlans)
+    def get_available_vids(self, limit=None):
+        """
+        Return a list of up to `limit` available VLAN IDs within this group, in ascending order.
+        """
+        return list(islice(self.iter_available_vids(), limit))
 
     def get_next_available_vid(self):
         """
         Return the first available VLAN ID (1-4094) in the group.
         """
-        available_vids = self.get_available_vids()
-        if available_vids:
-            return available_vids[0]
-        return None
+        return next(self.iter_available_vids(), None)
 
     def get_child_vlans(self):
         """
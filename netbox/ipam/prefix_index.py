@@ -0,0 +1,86 @@
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import Prefix
+
+__all__ = (
+    'PrefixIndex',
+    'invalidate_prefix_index',
+    'prefix_index',
+)
+
+PREFIX_INDEX_VERSION_CACHE_KEY = 'prefix_index_version'
+
+
+class PrefixIndex:
+    """
+    A process-level index of all Prefixes, supporting longest-prefix-match lookups of IP addresses. For each VRF (or
+    the global table) and address family, prefixes are held in a table per prefix length keyed by network address, so
+    that the prefixes containing an address are found with a single probe per prefix length in use. The index is
+    rebuilt whenever invalidate_prefix_index() has been called (in any process) since it was last built, as indicated
+    by a version key stored in the cache.
+    """
+    def __init__(self):
+        self.index = None
+        self.version = None
+
+    def clear(self):
+        self.index = None
+
+    def build(self):
+        # Map each VRF ID & family to a table of prefix IDs for each prefix length, keyed by network address
+        index = defaultdict(lambda: defaultdict(dict))
+        for pk, vrf_id, prefix in Prefix.objects.order_by('pk').values_list('pk', 'vrf_id', 'prefix').iterator():
+            host_bits = (32 if prefix.version == 4 else 128) - prefix.prefixlen
+            table = index[(vrf_id, prefix.version)][prefix.prefixlen]
+            table.setdefault(prefix.first >> host_bits, []).append(pk)
+
+        # Order the tables for each VRF & family from the most specific prefix length to the least
+        return {
+            key: sorted(tables.items(), reverse=True) for key, tables in index.items()
+        }
+
+    def get_index(self):
+        """
+        Return the current index, rebuilding it if it has been invalidated.
+        """
+        version = cache.get(PREFIX_INDEX_VERSION_CACHE_KEY)
+        if self.index is None or version != self.version:
+            index = self.build()
+            # Retain the index only if it reflects committed data
+            if connection.in_atomic_block:
+                return index
+            self.index, self.version = index, version
+        return self.index
+
+    def lookup(self, addresses, vrf_id=None):
+        """
+        Return, for each of the given IP addresses, the IDs of all Prefixes within the VRF (or the global table, if
+        None) which contain it, as a list of lists ordered from the most specific prefix length to the least. Each
+        inner list holds duplicate prefixes ordered by ID.
+        """
+        index = self.get_index()
+        results = []
+        for address in addresses:
+            width = 32 if address.version == 4 else 128
+            value = int(address)
+            results.append([
+                pks for prefixlen, table in index.get((vrf_id, address.version), ())
+                if (pks := table.get(value >> (width - prefixlen)))
+            ])
+        return results
+
+
+prefix_index = PrefixIndex()
+
+
+def invalidate_prefix_index():
+    """
+    Invalidate the Prefix index in the current process immediately, and in all other processes once the current
+    transaction has been committed.
+    """
+    prefix_index.clear()
+    transaction.on_commit(lambda: cache.set(PREFIX_INDEX_VERSION_CACHE_KEY, uuid.uuid4().hex, None))
@@ -5,15 +5,143 @@ from django.db.models.functions import Round
 
 from utilities.query import count_related
 from utilities.querysets import RestrictedQuerySet
+from .choices import PrefixStatusChoices
 
 __all__ = (
+    'AggregateQuerySet',
     'ASNRangeQuerySet',
     'PrefixQuerySet',
     'VLANGroupQuerySet',
     'VLANQuerySet',
+    'get_aggregate_child_size',
+    'get_aggregate_utilization',
+    'get_prefix_child_size',
+    'get_prefix_populated_size',
+    'get_prefix_utilization',
 )
 
 
+def get_prefix_populated_size():
+    """
+    Return an expression for the number of populated addresses within a Prefix: the number of distinct child IP
+    addresses plus the size of all child IP ranges marked as utilized (excluding any IP addresses within those
+    ranges). Cast null VRF values to zero for comparison. (NULL != NULL).
+    """
+    return RawSQL(
+        'SELECT ('
+        '  SELECT COUNT(DISTINCT CAST(HOST(U0."address") AS INET)) '
+        '  FROM "ipam_ipaddress" U0 '
+        '  WHERE (CAST(HOST(U0."address") AS INET) <<= "ipam_prefix"."prefix" '
+        '  AND COALESCE(U0."vrf_id", 0) = COALESCE("ipam_prefix"."vrf_id", 0) '
+        '  AND NOT EXISTS ('
+        '    SELECT 1 FROM "ipam_iprange" U1 '
+        '    WHERE (U1."mark_utilized" '
+        '    AND COALESCE(U1."vrf_id", 0) = COALESCE("ipam_prefix"."vrf_id", 0) '
+        '    AND CAST(HOST(U1."start_address") AS INET) <<= "ipam_prefix"."prefix" '
+        '    AND CAST(HOST(U1."end_address") AS INET) <<= "ipam_prefix"."prefix" '
+        '    AND CAST(HOST(U0."address") AS INET) BETWEEN CAST(HOST(U1."start_address") AS INET) '
+        '    AND CAST(HOST(U1."end_address") AS INET))'
+        '  ))'
+        ') + ('
+        '  SELECT COALESCE(SUM(U2."size"), 0) '
+        '  FROM "ipam_iprange" U2 '
+        '  WHERE (U2."mark_utilized" '
+        '  AND COALESCE(U2."vrf_id", 0) = COALESCE("ipam_prefix"."vrf_id", 0) '
+        '  AND CAST(HOST(U2."start_address") AS INET) <<= "ipam_prefix"."prefix" '
+        '  AND CAST(HOST(U2."end_address") AS INET) <<= "ipam_prefix"."prefix")'
+        ')',
+        ()
+    )
+
+
+def get_prefix_child_size():
+    """
+    Return an expression for the amount of address space within a Prefix covered by child prefixes: the total size of
+    all distinct child prefixes not contained by another child prefix. Cast null VRF values to zero for comparison.
+    (NULL != NULL).
+    """
+    return RawSQL(
+        'SELECT COALESCE(SUM(POWER(2::numeric, '
+        '  (CASE WHEN FAMILY(U0."prefix") = 4 THEN 32 ELSE 128 END) - MASKLEN(U0."prefix"))), 0) '
+        'FROM ('
+        '  SELECT DISTINCT U1."prefix" FROM "ipam_prefix" U1 '
+        '  WHERE (U1."prefix" << "ipam_prefix"."prefix" '
+        '  AND COALESCE(U1."vrf_id", 0) = COALESCE("ipam_prefix"."vrf_id", 0) '
+        '  AND NOT EXISTS ('
+        '    SELECT 1 FROM "ipam_prefix" U2 '
+        '    WHERE (U2."prefix" >> U1."prefix" AND U2."prefix" << "ipam_prefix"."prefix" '
+        '    AND COALESCE(U2."vrf_id", 0) = COALESCE("ipam_prefix"."vrf_id", 0))'
+        '  ))'
+        ') U0',
+        ()
+    )
+
+
+def get_prefix_utilization():
+    """
+    Return an expression for the utilization of a Prefix (as a percentage), computed from its cached populated and
+    child sizes. Mirrors Prefix.get_utilization().
+    """
+    return RawSQL(
+        'SELECT CASE '
+        'WHEN "ipam_prefix"."mark_utilized" THEN 100 '
+        'WHEN "ipam_prefix"."status" = %s THEN LEAST(100, '
+        '  CAST("ipam_prefix"."_child_size" AS DOUBLE PRECISION) / CAST(POWER(2::numeric, '
+        '  (CASE WHEN FAMILY("ipam_prefix"."prefix") = 4 THEN 32 ELSE 128 END) - MASKLEN("ipam_prefix"."prefix")) '
+        '  AS DOUBLE PRECISION) * 100) '
+        'ELSE LEAST(100, '
+        '  CAST("ipam_prefix"."_populated_size" AS DOUBLE PRECISION) / CAST(POWER(2::numeric, '
+        '  (CASE WHEN FAMILY("ipam_prefix"."prefix") = 4 THEN 32 ELSE 128 END) - MASKLEN("ipam_prefix"."prefix")) - '
+        '  (CASE WHEN FAMILY("ipam_prefix"."prefix") = 4 AND MASKLEN("ipam_prefix"."prefix") < 31 '
+        '  AND NOT "ipam_prefix"."is_pool" THEN 2 ELSE 0 END) AS DOUBLE PRECISION) * 100) '
+        'END',
+        (PrefixStatusChoices.STATUS_CONTAINER,)
+    )
+
+
+def get_aggregate_child_size():
+    """
+    Return an expression for the amount of address space within an Aggregate covered by prefixes (in any VRF).
+    """
+    return RawSQL(
+        'SELECT COALESCE(SUM(POWER(2::numeric, '
+        '  (CASE WHEN FAMILY(U0."prefix") = 4 THEN 32 ELSE 128 END) - MASKLEN(U0."prefix"))), 0) '
+        'FROM ('
+        '  SELECT DISTINCT U1."prefix" FROM "ipam_prefix" U1 '
+        '  WHERE (U1."prefix" <<= "ipam_aggregate"."prefix" '
+        '  AND NOT EXISTS ('
+        '    SELECT 1 FROM "ipam_prefix" U2 '
+        '    WHERE (U2."prefix" >> U1."prefix" AND U2."prefix" <<= "ipam_aggregate"."prefix")'
+        '  ))'
+        ') U0',
+        ()
+    )
+
+
+def get_aggregate_utilization():
+    """
+    Return an expression for the utilization of an Aggregate (as a percentage), computed from its cached child size.
+    Mirrors Aggregate.get_utilization().
+    """
+    return RawSQL(
+        'SELECT LEAST(100, '
+        '  CAST("ipam_aggregate"."_child_size" AS DOUBLE PRECISION) / CAST(POWER(2::numeric, '
+        '  (CASE WHEN FAMILY("ipam_aggregate"."prefix") = 4 THEN 32 ELSE 128 END) - '
+        '  MASKLEN("ipam_aggregate"."prefix")) AS DOUBLE PRECISION) * 100)',
+        ()
+    )
+
+
+class AggregateQuerySet(RestrictedQuerySet):
+
+    def update_utilization(self):
+        """
+        Recalculate the cached child size and utilization of each Aggregate.
+        """
+        self.update(_child_size=get_aggregate_child_size())
+        return self.update(_utilization=get_aggregate_utilization())
+
+
 class ASNRangeQuerySet(RestrictedQuerySet):
 
     def annotate_asn_counts(self):
@@ -56,6 +184,20 @@ class PrefixQuerySet(RestrictedQuerySet):
             )
         )
 
+    def update_utilization(self, populated=True, children=True):
+        """
+        Recalculate the cached populated size, child size, and utilization of each Prefix. Either of the sizes may be
+        omitted if it is known not to have changed.
+        """
+        sizes = {}
+        if populated:
+            sizes['_populated_size'] = get_prefix_populated_size()
+        if children:
+            sizes['_child_size'] = get_prefix_child_size()
+        if sizes:
+            self.update(**sizes)
+        return self.update(_utilization=get_prefix_utilization())
+
 
 class VLANGroupQuerySet(RestrictedQuerySet):
 
@@ -1,52 +1,353 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import netaddr
+from django.db.models import F, Q
 from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
 from dcim.models import Device
 from virtualization.models import VirtualMachine
-from .models import IPAddress, Prefix
+from .lookups import Host, Inet
+from .models import Aggregate, IPAddress, IPRange, Prefix
+from .prefix_index import invalidate_prefix_index
+from .querysets import get_aggregate_utilization, get_prefix_utilization
+from .utils import bulk_update_hierarchy
+
+# Prefixes created, modified, or deleted while maintenance is deferred (see defer_prefix_maintenance())
+deferred_prefixes = ContextVar('deferred_prefixes', default=None)
+
+
+def has_changed(instance, *fields):
+    """
+    Return True if any of the given fields differs from its original value (cached on the instance with a leading
+    underscore)
+    """
+    return any(getattr(instance, field) != getattr(instance, f'_{field}') for field in fields)
+
+
+def update_hierarchy(pk, vrf_id, prefix, delta):
+    """
+    Adjust the child count on containing prefixes & depth on contained prefixes to reflect the addition (delta=1) or
+    removal (delta=-1) of a prefix
+    """
+    Prefix.objects.filter(
+        vrf_id=vrf_id,
+        prefix__net_contains=str(prefix)
+    ).exclude(pk=pk).update(_children=F('_children') + delta)
+
+    # The depth of contained prefixes is unaffected if a duplicate of this prefix exists
+    if not Prefix.objects.filter(vrf_id=vrf_id, prefix=str(prefix)).exclude(pk=pk).exists():
+        Prefix.objects.filter(
+            vrf_id=vrf_id,
+            prefix__net_contained=str(prefix)
+        ).exclude(pk=pk).update(_depth=F('_depth') + delta)
+
+
+def update_prefix_hierarchy(instance):
+    """
+    Update depth & child count on prefix
+    """
+    prefix = Prefix.objects.filter(pk=instance.pk).annotate_hierarchy().first()
+    instance._depth = prefix.hierarchy_depth
+    instance._children = prefix.hierarchy_children
+    Prefix.objects.filter(pk=instance.pk).update(_depth=instance._depth, _children=instance._children)
+
+
+def get_covered_size(pk, prefix, vrf_id=None, all_vrfs=False):
+    """
+    Return the amount of address space within the given prefix covered by other prefixes (within the VRF, or within
+    any VRF if all_vrfs is True)
+    """
+    children = Prefix.objects.filter(prefix__net_contained=str(prefix)).exclude(pk=pk)
+    if not all_vrfs:
+        children = children.filter(vrf_id=vrf_id)
+    return netaddr.IPSet(children.order_by().values_list('prefix', flat=True).distinct()).size
+
+
+def get_closest_parent(prefixes):
+    """
+    Return the most specific of the given (nested) prefixes, or None
+    """
+    return max(prefixes, key=lambda prefix: prefix.prefixlen, default=None)
+
+
+def update_child_size(pk, vrf_id, prefix, delta):
+    """
+    Adjust the cached child size & utilization of the closest prefixes (within the VRF) & aggregates containing the
+    given prefix to reflect its addition (delta=1) or removal (delta=-1). The populated size of containing prefixes is
+    unaffected, as it depends only on the IP addresses & ranges within them.
+    """
+    prefix = netaddr.IPNetwork(prefix)
+    others = Prefix.objects.exclude(pk=pk)
 
+    # Only the closest containing prefixes count this prefix as a child, and only if it is not a duplicate
+    if not others.filter(vrf_id=vrf_id, prefix=str(prefix)).exists():
+        parent = get_closest_parent(
+            others.filter(vrf_id=vrf_id, prefix__net_contains=str(prefix)).values_list('prefix', flat=True)
+        )
+        if parent is not None:
+            size = prefix.size - get_covered_size(pk, prefix, vrf_id=vrf_id)
+            parents = others.filter(vrf_id=vrf_id, prefix=str(parent))
+            parents.update(_child_size=F('_child_size') + delta * size)
+            parents.update(_utilization=get_prefix_utilization())
 
-def update_parents_children(prefix):
+    # Aggregates count prefixes within any VRF which are not contained by another prefix
+    if not others.filter(prefix=str(prefix)).exists():
+        aggregates = Aggregate.objects.filter(prefix__net_contains_or_equals=str(prefix))
+        parent = get_closest_parent(others.filter(prefix__net_contains=str(prefix)).values_list('prefix', flat=True))
+        if parent is not None:
+            aggregates = aggregates.filter(prefix__net_contained=str(parent))
+        if aggregates.exists():
+            size = prefix.size - get_covered_size(pk, prefix, all_vrfs=True)
+            aggregates.update(_child_size=F('_child_size') + delta * size)
+            aggregates.update(_utilization=get_aggregate_utilization())
+
+
+def update_populated_size(pk, vrf_id, address, delta):
     """
-    Update depth on prefix & containing prefixes
+    Adjust the cached populated size & utilization of all prefixes (within the VRF) containing the given IP address to
+    reflect the addition (delta=1) or removal (delta=-1) of an IP address
     """
-    parents = prefix.get_parents(include_self=True).annotate_hierarchy()
-    for parent in parents:
-        parent._children = parent.hierarchy_children
-    Prefix.objects.bulk_update(parents, ['_children'], batch_size=100)
+    host = str(address.ip)
+
+    # Duplicate addresses are counted only once
+    if IPAddress.objects.filter(vrf_id=vrf_id, address__net_host=host).exclude(pk=pk).exists():
+        return
+
+    # An address within a utilized IP range is counted as part of the range by any prefix containing the entire range
+    ranges = [
+        netaddr.IPRange(first.ip, last.ip) for first, last in IPRange.objects.filter(vrf_id=vrf_id, mark_utilized=True)
+        .annotate(first=Inet(Host('start_address')), last=Inet(Host('end_address')))
+        .filter(first__lte=host, last__gte=host)
+        .values_list('first', 'last')
+    ]
+    prefixes = [
+        pk for pk, prefix in Prefix.objects.filter(
+            vrf_id=vrf_id,
+            prefix__net_contains_or_equals=host
+        ).values_list('pk', 'prefix')
+        if not any(ip_range in prefix for ip_range in ranges)
+    ]
+
+    if prefixes:
+        Prefix.objects.filter(pk__in=prefixes).update(_populated_size=F('_populated_size') + delta)
+        Prefix.objects.filter(pk__in=prefixes).update(_utilization=get_prefix_utilization())
 
 
-def update_children_depth(prefix):
+def update_range_size(pk, vrf_id, start_address, end_address, delta):
     """
-    Update children count on prefix & contained prefixes
+    Adjust the cached populated size & utilization of all prefixes (within the VRF) containing the given utilized IP
+    range to reflect its addition (delta=1) or removal (delta=-1)
     """
-    children = prefix.get_children(include_self=True).annotate_hierarchy()
-    for child in children:
-        child._depth = child.hierarchy_depth
-    Prefix.objects.bulk_update(children, ['_depth'], batch_size=100)
+    first, last = str(start_address.ip), str(end_address.ip)
+    ip_range = netaddr.IPRange(first, last)
+    prefixes = Prefix.objects.filter(
+        vrf_id=vrf_id,
+        prefix__net_contains_or_equals=first
+    ).filter(
+        prefix__net_contains_or_equals=last
+    ).values_list('pk', 'prefix')
+    if not prefixes:
+        return
+
+    # Addresses within the range are counted as part of the range, unless they already are as part of another utilized
+    # range within the prefix
+    hosts = [
+        host.ip for host in IPAddress.objects.filter(vrf_id=vrf_id)
+        .annotate(host=Inet(Host('address')))
+        .filter(host__gte=first, host__lte=last)
+        .order_by().values_list('host', flat=True).distinct()
+    ]
+    ranges = [
+        netaddr.IPRange(start.ip, end.ip) for start, end in IPRange.objects.filter(vrf_id=vrf_id, mark_utilized=True)
+        .exclude(pk=pk)
+        .annotate(start=Inet(Host('start_address')), end=Inet(Host('end_address')))
+        .filter(start__lte=last, end__gte=first)
+        .values_list('start', 'end')
+    ]
+    sizes = defaultdict(list)
+    for prefix_pk, prefix in prefixes:
+        prefix_ranges = [r for r in ranges if r in prefix]
+        size = ip_range.size - sum(1 for host in hosts if not any(host in r for r in prefix_ranges))
+        sizes[size].append(prefix_pk)
+
+    for size, pks in sizes.items():
+        Prefix.objects.filter(pk__in=pks).update(_populated_size=F('_populated_size') + delta * size)
+    Prefix.objects.filter(pk__in=[prefix_pk for prefix_pk, prefix in prefixes]).update(
+        _utilization=get_prefix_utilization()
+    )
+
+
+def update_prefix_space(vrf_id, prefix):
+    """
+    Recalculate the hierarchy & cached utilization of all prefixes (within the VRF) & aggregates which contain, equal,
+    or are contained by the given prefix
+    """
+    lookup = Q(prefix__net_contains_or_equals=str(prefix)) | Q(prefix__net_contained=str(prefix))
+    prefixes = Prefix.objects.filter(lookup, vrf_id=vrf_id)
+    bulk_update_hierarchy(
+        list(prefixes.annotate_hierarchy().values_list('pk', 'hierarchy_depth', 'hierarchy_children'))
+    )
+    prefixes.update_utilization()
+    Aggregate.objects.filter(lookup).update_utilization()
+
+
+@contextmanager
+def defer_prefix_maintenance():
+    """
+    Defer maintenance of the prefix hierarchy & cached utilization for all prefixes created, modified, or deleted
+    within the context, and perform it once upon exit. This avoids repeatedly updating the same parent prefixes when
+    saving many prefixes at once.
+    """
+    token = deferred_prefixes.set([])
+    try:
+        yield
+        changes = deferred_prefixes.get()
+    finally:
+        deferred_prefixes.reset(token)
+    if not changes:
+        return
+
+    # Recalculate the affected space within each VRF, merged into as few prefixes as possible
+    affected_space = defaultdict(list)
+    for vrf_id, prefix, instance in changes:
+        affected_space[vrf_id].append(prefix)
+    for vrf_id, prefixes in affected_space.items():
+        for prefix in netaddr.cidr_merge(prefixes):
+            update_prefix_space(vrf_id, prefix)
+    invalidate_prefix_index()
+
+    # Update the computed attributes of saved instances
+    instances = [instance for vrf_id, prefix, instance in changes if instance is not None]
+    refreshed = Prefix.objects.in_bulk([instance.pk for instance in instances])
+    for instance in instances:
+        if prefix := refreshed.get(instance.pk):
+            for field in ('_depth', '_children', '_populated_size', '_child_size', '_utilization'):
+                setattr(instance, field, getattr(prefix, field))
 
 
 @receiver(post_save, sender=Prefix)
 def handle_prefix_saved(instance, created, **kwargs):
 
+    # Maintenance has been deferred
+    if (changes := deferred_prefixes.get()) is not None:
+        changes.append((instance.vrf_id, instance.prefix, instance))
+        if not created and (instance.vrf_id != instance._vrf_id or instance.prefix != instance._prefix):
+            changes.append((instance._vrf_id, instance._prefix, None))
+        instance._vrf_id = instance.vrf_id
+        instance._prefix = instance.prefix
+        instance._status = instance.status
+        instance._is_pool = instance.is_pool
+        instance._mark_utilized = instance.mark_utilized
+        return
+
     # Prefix has changed (or new instance has been created)
     if created or instance.vrf_id != instance._vrf_id or instance.prefix != instance._prefix:
 
-        update_parents_children(instance)
-        update_children_depth(instance)
-
         # If this is not a new prefix, clean up parent/children of previous prefix
         if not created:
-            old_prefix = Prefix(vrf_id=instance._vrf_id, prefix=instance._prefix)
-            update_parents_children(old_prefix)
-            update_children_depth(old_prefix)
+            update_hierarchy(instance.pk, instance._vrf_id, instance._prefix, -1)
+            update_child_size(instance.pk, instance._vrf_id, instance._prefix, -1)
+
+        update_hierarchy(instance.pk, instance.vrf_id, instance.prefix, 1)
+        update_prefix_hierarchy(instance)
+        update_child_size(instance.pk, instance.vrf_id, instance.prefix, 1)
+        Prefix.objects.filter(pk=instance.pk).update_utilization()
+        invalidate_prefix_index()
+
+    # Status, pool, or utilized designation has changed
+    elif has_changed(instance, 'status', 'is_pool', 'mark_utilized'):
+        Prefix.objects.filter(pk=instance.pk).update_utilization(populated=False, children=False)
+
+    # Nothing affecting the hierarchy or utilization has changed
+    else:
+        return
+
+    instance.refresh_from_db(fields=('_populated_size', '_child_size', '_utilization'))
+
+    # Record the saved attributes, in case the instance is modified & saved again
+    instance._vrf_id = instance.vrf_id
+    instance._prefix = instance.prefix
+    instance._status = instance.status
+    instance._is_pool = instance.is_pool
+    instance._mark_utilized = instance.mark_utilized
 
 
 @receiver(post_delete, sender=Prefix)
 def handle_prefix_deleted(instance, **kwargs):
 
-    update_parents_children(instance)
-    update_children_depth(instance)
+    # Maintenance has been deferred
+    if (changes := deferred_prefixes.get()) is not None:
+        changes.append((instance.vrf_id, instance.prefix, None))
+        return
+
+    update_hierarchy(instance.pk, instance.vrf_id, instance.prefix, -1)
+    update_child_size(instance.pk, instance.vrf_id, instance.prefix, -1)
+    invalidate_prefix_index()
+
+
+@receiver(post_save, sender=Aggregate)
+def handle_aggregate_saved(instance, created, **kwargs):
+
+    # Prefix has changed (or new instance has been created)
+    if created or instance.prefix != instance._prefix:
+        Aggregate.objects.filter(pk=instance.pk).update_utilization()
+        instance.refresh_from_db(fields=('_child_size', '_utilization'))
+
+    # Record the saved prefix, in case the instance is modified & saved again
+    instance._prefix = instance.prefix
+
+
+@receiver(post_save, sender=IPAddress)
+def handle_ipaddress_saved(instance, created, **kwargs):
+
+    # New instance has been created
+    if created:
+        update_populated_size(instance.pk, instance.vrf_id, instance.address, 1)
+
+    # Address has changed; remove it from the prefixes containing the previous address & add it to the current ones
+    elif instance.vrf_id != instance._vrf_id or instance.address != instance._address:
+        update_populated_size(instance.pk, instance._vrf_id, instance._address, -1)
+        update_populated_size(instance.pk, instance.vrf_id, instance.address, 1)
+
+    # Record the saved address, in case the instance is modified & saved again
+    instance._vrf_id = instance.vrf_id
+    instance._address = instance.address
+
+
+@receiver(post_delete, sender=IPAddress)
+def handle_ipaddress_deleted(instance, **kwargs):
+    update_populated_size(instance.pk, instance.vrf_id, instance.address, -1)
+
+
+@receiver(post_save, sender=IPRange)
+def handle_iprange_saved(instance, created, **kwargs):
+
+    # New instance has been created
+    if created:
+        if instance.mark_utilized:
+            update_range_size(instance.pk, instance.vrf_id, instance.start_address, instance.end_address, 1)
+
+    # Range or utilized designation has changed; remove the previous range & add the current one
+    elif has_changed(instance, 'vrf_id', 'start_address', 'end_address', 'mark_utilized'):
+        if instance._mark_utilized:
+            update_range_size(instance.pk, instance._vrf_id, instance._start_address, instance._end_address, -1)
+        if instance.mark_utilized:
+            update_range_size(instance.pk, instance.vrf_id, instance.start_address, instance.end_address, 1)
+
+    # Record the saved range, in case the instance is modified & saved again
+    instance._vrf_id = instance.vrf_id
+    instance._start_address = instance.start_address
+    instance._end_address = instance.end_address
+    instance._mark_utilized = instance.mark_utilized
+
+
+@receiver(post_delete, sender=IPRange)
+def handle_iprange_deleted(instance, **kwargs):
+    if instance.mark_utilized:
+        update_range_size(instance.pk, instance.vrf_id, instance.start_address, instance.end_address, -1)
 
 
 @receiver(pre_delete, sender=IPAddress)
@@ -77,7 +77,7 @@ class AggregateTable(TenancyColumnsMixin, NetBoxTable):
     utilization = columns.UtilizationColumn(
         verbose_name=_('Utilization'),
         accessor='get_utilization',
-        orderable=False
+        order_by=('_utilization',)
     )
     comments = columns.MarkdownColumn(
         verbose_name=_('Comments'),
@@ -221,7 +221,7 @@ class PrefixTable(TenancyColumnsMixin, NetBoxTable):
     utilization = PrefixUtilizationColumn(
         verbose_name=_('Utilization'),
         accessor='get_utilization',
-        orderable=False
+        order_by=('_utilization',)
     )
     comments = columns.MarkdownColumn(
         verbose_name=_('Comments'),
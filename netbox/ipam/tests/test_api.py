@@ -1,7 +1,7 @@
 import json
 import logging
 
-from django.test import tag
+from django.test import override_settings, tag
 from django.urls import reverse
 from netaddr import IPNetwork
 from rest_framework import status
@@ -481,6 +481,36 @@ class PrefixTest(APIViewTestCases.APIViewTestCase):
         self.assertHttpStatus(response, status.HTTP_201_CREATED)
         self.assertEqual(len(response.data), 4)
 
+    def test_create_multiple_available_prefixes_best_fit(self):
+        """
+        Test the allocation of available prefixes of mixed sizes, each from the smallest block able to accommodate it.
+        """
+        prefix = Prefix.objects.create(prefix=IPNetwork('192.0.2.0/24'), status=PrefixStatusChoices.STATUS_CONTAINER)
+        Prefix.objects.create(prefix=IPNetwork('192.0.2.64/26'))
+        Prefix.objects.create(prefix=IPNetwork('192.0.2.160/27'))
+        url = reverse('ipam-api:prefix-available-prefixes', kwargs={'pk': prefix.pk})
+        self.add_permissions('ipam.view_prefix', 'ipam.add_prefix')
+
+        # Available: 192.0.2.0/26, 192.0.2.128/27, 192.0.2.192/26
+        data = [
+            {'prefix_length': 28},
+            {'prefix_length': 26},
+            {'prefix_length': 27},
+            {'prefix_length': 28},
+        ]
+        response = self.client.post(url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [p['prefix'] for p in response.data],
+            ['192.0.2.192/28', '192.0.2.0/26', '192.0.2.128/27', '192.0.2.208/28']
+        )
+
+        # The hierarchy & utilization of the parent and new prefixes are updated
+        self.assertEqual(response.data[0]['_depth'], 1)
+        prefix.refresh_from_db()
+        self.assertEqual(prefix._children, 6)
+        self.assertEqual(prefix.get_utilization(), 87.5)
+
     def test_list_available_ips(self):
         """
         Test retrieval of all available IP addresses within a parent prefix.
@@ -546,6 +576,72 @@ class PrefixTest(APIViewTestCases.APIViewTestCase):
         self.assertHttpStatus(response, status.HTTP_201_CREATED)
         self.assertEqual(len(response.data), 8)
 
+    def test_lookup(self):
+        """
+        Test the lookup of the most specific prefixes containing a batch of IP addresses.
+        """
+        vrf = VRF.objects.create(name='VRF 1')
+        prefixes = (
+            Prefix.objects.create(prefix=IPNetwork('10.0.0.0/8')),
+            Prefix.objects.create(prefix=IPNetwork('10.1.0.0/16')),
+            Prefix.objects.create(prefix=IPNetwork('10.1.2.0/24')),
+            Prefix.objects.create(prefix=IPNetwork('10.1.2.0/24'), vrf=vrf),
+        )
+        url = reverse('ipam-api:prefix-lookup')
+        self.add_permissions('ipam.view_prefix')
+
+        data = {
+            'addresses': ['10.1.2.3', '10.1.3.1/24', '10.2.0.1', '192.0.2.1'],
+        }
+        response = self.client.post(url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual(response.data[0]['address'], '10.1.2.3')
+        self.assertEqual(response.data[0]['prefix']['id'], prefixes[2].pk)
+        self.assertEqual([p['id'] for p in response.data[0]['ancestors']], [prefixes[0].pk, prefixes[1].pk])
+        self.assertEqual(response.data[1]['prefix']['id'], prefixes[1].pk)
+        self.assertEqual(response.data[2]['prefix']['id'], prefixes[0].pk)
+        self.assertEqual(response.data[2]['ancestors'], [])
+        self.assertIsNone(response.data[3]['prefix'])
+
+        # Lookups are limited to the specified VRF
+        data = {
+            'vrf': vrf.pk,
+            'addresses': ['10.1.2.3', '10.2.0.1'],
+        }
+        response = self.client.post(url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['prefix']['id'], prefixes[3].pk)
+        self.assertIsNone(response.data[1]['prefix'])
+
+        # The VRF must exist
+        data = {
+            'vrf': vrf.pk + 1,
+            'addresses': ['10.1.2.3'],
+        }
+        response = self.client.post(url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(MAX_PAGE_SIZE=2)
+    def test_lookup_max_addresses(self):
+        """
+        Test that the number of IP addresses in a lookup is limited to MAX_PAGE_SIZE.
+        """
+        url = reverse('ipam-api:prefix-lookup')
+        self.add_permissions('ipam.view_prefix')
+
+        data = {
+            'addresses': ['10.0.0.1', '10.0.0.2', '10.0.0.3'],
+        }
+        response = self.client.post(url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('addresses', response.data)
+
+        data['addresses'] = data['addresses'][:2]
+        response = self.client.post(url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
 
 class IPRangeTest(APIViewTestCases.APIViewTestCase):
     model = IPRange
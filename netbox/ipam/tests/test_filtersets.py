@@ -813,6 +813,12 @@ class PrefixTestCase(TestCase, ChangeLoggedFilterSetTests):
         params = {'children__gt': '0'}
         self.assertEqual(self.filterset(params, self.queryset).qs.count(), 2)
 
+    def test_utilization(self):
+        params = {'utilization__gte': '100'}
+        self.assertEqual(self.filterset(params, self.queryset).qs.count(), 2)
+        params = {'utilization': '0'}
+        self.assertEqual(self.filterset(params, self.queryset).qs.count(), 8)
+
     def test_mask_length(self):
         params = {'mask_length': [24]}
         self.assertEqual(self.filterset(params, self.queryset).qs.count(), 4)
@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 from django.test import TestCase, override_settings
@@ -7,6 +9,38 @@ from utilities.data import string_to_ranges
 from dcim.models import Site, SiteGroup
 from ipam.choices import *
 from ipam.models import *
+from ipam.utils import AnnotatedIPSpace, AvailableIPSpace, rebuild_prefixes
+
+
+class TestASNRange(TestCase):
+
+    def test_get_available_asns(self):
+        rir = RIR.objects.create(name='RIR 1', slug='rir-1')
+        asn_range = ASNRange.objects.create(
+            name='Private 4-byte', slug='private-4-byte', rir=rir, start=4200000000, end=4294967294
+        )
+        ASN.objects.bulk_create((
+            ASN(asn=4200000000, rir=rir),
+            ASN(asn=4200000001, rir=rir),
+            ASN(asn=4200000003, rir=rir),
+            ASN(asn=4294967294, rir=rir),
+        ))
+
+        self.assertEqual(asn_range.get_available_asns(limit=3), [4200000002, 4200000004, 4200000005])
+
+        asn_range = ASNRange.objects.create(name='Range 2', slug='range-2', rir=rir, start=64512, end=64515)
+        ASN.objects.bulk_create((
+            ASN(asn=64512, rir=rir),
+            ASN(asn=64514, rir=rir),
+        ))
+        self.assertEqual(asn_range.get_available_asns(), [64513, 64515])
+
+        # A fully allocated range has no available ASNs
+        ASN.objects.bulk_create((
+            ASN(asn=64513, rir=rir),
+            ASN(asn=64515, rir=rir),
+        ))
+        self.assertEqual(asn_range.get_available_asns(), [])
 
 
 class TestAggregate(TestCase):
@@ -17,26 +51,27 @@ class TestAggregate(TestCase):
         aggregate.save()
 
         # 25% utilization
-        Prefix.objects.bulk_create((
-            Prefix(prefix=IPNetwork('10.0.0.0/12')),
-            Prefix(prefix=IPNetwork('10.16.0.0/12')),
-            Prefix(prefix=IPNetwork('10.32.0.0/12')),
-            Prefix(prefix=IPNetwork('10.48.0.0/12')),
-        ))
+        for prefix in ('10.0.0.0/12', '10.16.0.0/12', '10.32.0.0/12', '10.48.0.0/12'):
+            Prefix.objects.create(prefix=IPNetwork(prefix))
+        aggregate.refresh_from_db()
         self.assertEqual(aggregate.get_utilization(), 25)
+        self.assertEqual(aggregate._utilization, 25)
 
         # 50% utilization
-        Prefix.objects.bulk_create((
-            Prefix(prefix=IPNetwork('10.64.0.0/10')),
-        ))
+        Prefix.objects.create(prefix=IPNetwork('10.64.0.0/10'))
+        aggregate.refresh_from_db()
         self.assertEqual(aggregate.get_utilization(), 50)
 
         # 100% utilization
-        Prefix.objects.bulk_create((
-            Prefix(prefix=IPNetwork('10.128.0.0/9')),
-        ))
+        Prefix.objects.create(prefix=IPNetwork('10.128.0.0/9'))
+        aggregate.refresh_from_db()
         self.assertEqual(aggregate.get_utilization(), 100)
 
+        # Deleting a prefix reduces utilization
+        Prefix.objects.get(prefix='10.128.0.0/9').delete()
+        aggregate.refresh_from_db()
+        self.assertEqual(aggregate.get_utilization(), 50)
+
 
 class TestIPRange(TestCase):
 
@@ -238,6 +273,56 @@ class TestPrefix(TestCase):
 
         self.assertEqual(available_ips, missing_ips)
 
+        # The next available IPs are found within the database
+        self.assertEqual(parent_prefix.get_next_available_ips(), list(missing_ips))
+        self.assertEqual(parent_prefix.get_next_available_ips(count=3), list(missing_ips)[:3])
+
+    def test_annotated_ip_space(self):
+
+        parent_prefix = Prefix.objects.create(prefix=IPNetwork('10.0.0.0/28'))
+        ip_addresses = IPAddress.objects.bulk_create((
+            IPAddress(address=IPNetwork('10.0.0.1/28')),
+            IPAddress(address=IPNetwork('10.0.0.3/28')),
+            IPAddress(address=IPNetwork('10.0.0.7/28')),
+        ))
+        ip_range = IPRange.objects.create(
+            start_address=IPNetwork('10.0.0.9/28'),
+            end_address=IPNetwork('10.0.0.10/28'),
+            mark_populated=True
+        )
+        ip_space = AnnotatedIPSpace(parent_prefix)
+
+        # Only child IPs & ranges count toward the length
+        self.assertEqual(len(ip_space), 4)
+        self.assertEqual(ip_space[:], [
+            ip_addresses[0],
+            AvailableIPSpace(size=1, first_ip='10.0.0.2/28'),
+            ip_addresses[1],
+            AvailableIPSpace(size=3, first_ip='10.0.0.4/28'),
+            ip_addresses[2],
+            AvailableIPSpace(size=1, first_ip='10.0.0.8/28'),
+            ip_range,
+            AvailableIPSpace(size=4, first_ip='10.0.0.11/28'),
+        ])
+
+        # Each slice includes the available space following its records
+        self.assertEqual(ip_space[1:3], [
+            ip_addresses[1],
+            AvailableIPSpace(size=3, first_ip='10.0.0.4/28'),
+            ip_addresses[2],
+            AvailableIPSpace(size=1, first_ip='10.0.0.8/28'),
+        ])
+        self.assertEqual(ip_space[3:4], [
+            ip_range,
+            AvailableIPSpace(size=4, first_ip='10.0.0.11/28'),
+        ])
+
+        # An empty prefix is entirely available
+        empty_prefix = Prefix.objects.create(prefix=IPNetwork('10.0.1.0/28'))
+        self.assertEqual(AnnotatedIPSpace(empty_prefix)[:], [
+            AvailableIPSpace(size=14, first_ip='10.0.1.1/28'),
+        ])
+
     def test_get_first_available_prefix(self):
 
         prefixes = Prefix.objects.bulk_create((
@@ -282,8 +367,11 @@ class TestPrefix(TestCase):
             Prefix(prefix=IPNetwork('10.0.0.0/26')),
             Prefix(prefix=IPNetwork('10.0.0.128/26')),
         )
-        Prefix.objects.bulk_create(prefixes)
+        for prefix in prefixes:
+            prefix.save()
+        prefixes[0].refresh_from_db()
         self.assertEqual(prefixes[0].get_utilization(), 50)  # 50% utilization
+        self.assertEqual(prefixes[0]._utilization, 50)
 
     def test_get_utilization_noncontainer(self):
         prefix = Prefix.objects.create(
@@ -292,10 +380,11 @@ class TestPrefix(TestCase):
         )
 
         # Create 32 child IPs
-        IPAddress.objects.bulk_create([
-            IPAddress(address=IPNetwork(f'10.0.0.{i}/24')) for i in range(1, 33)
-        ])
+        for i in range(1, 33):
+            IPAddress.objects.create(address=IPNetwork(f'10.0.0.{i}/24'))
+        prefix.refresh_from_db()
         self.assertEqual(prefix.get_utilization(), 32 / 254 * 100)  # ~12.5% utilization
+        self.assertEqual(prefix._utilization, 32 / 254 * 100)
 
         # Create a utilized child range with 32 additional IPs
         IPRange.objects.create(
@@ -303,8 +392,219 @@ class TestPrefix(TestCase):
             end_address=IPNetwork('10.0.0.64/24'),
             mark_utilized=True
         )
+        prefix.refresh_from_db()
         self.assertEqual(prefix.get_utilization(), 64 / 254 * 100)  # ~25% utilization
 
+        # Delete a child IP
+        IPAddress.objects.get(address='10.0.0.1/24').delete()
+        prefix.refresh_from_db()
+        self.assertEqual(prefix.get_utilization(), 63 / 254 * 100)
+
+    def test_update_utilization(self):
+        prefixes = (
+            Prefix(prefix=IPNetwork('10.0.0.0/16'), status=PrefixStatusChoices.STATUS_CONTAINER),
+            Prefix(prefix=IPNetwork('10.0.0.0/24')),
+            Prefix(prefix=IPNetwork('10.0.0.0/25')),
+            Prefix(prefix=IPNetwork('10.0.1.0/24')),
+        )
+        Prefix.objects.bulk_create(prefixes)
+        IPAddress.objects.bulk_create([
+            IPAddress(address=IPNetwork(f'10.0.0.{i}/24')) for i in range(1, 33)
+        ])
+        IPRange.objects.bulk_create([
+            IPRange(
+                start_address=IPNetwork('10.0.0.21/24'),
+                end_address=IPNetwork('10.0.0.64/24'),
+                size=44,
+                mark_utilized=True
+            ),
+        ])
+
+        # Bulk creation bypasses signals; recalculate cached utilization for all prefixes
+        Prefix.objects.update_utilization()
+
+        prefix = Prefix.objects.get(pk=prefixes[0].pk)
+        self.assertEqual(prefix._child_size, 512)
+        self.assertEqual(prefix.get_utilization(), 512 / 65536 * 100)
+        prefix = Prefix.objects.get(pk=prefixes[1].pk)
+        self.assertEqual(prefix._populated_size, 64)
+        self.assertEqual(prefix._child_size, 128)
+        self.assertEqual(prefix.get_utilization(), 64 / 254 * 100)
+        self.assertEqual(prefix._utilization, prefix.get_utilization())
+
+    def test_populated_size_incremental(self):
+        prefixes = (
+            Prefix(prefix=IPNetwork('10.0.0.0/16'), status=PrefixStatusChoices.STATUS_CONTAINER),
+            Prefix(prefix=IPNetwork('10.0.0.0/24')),
+            Prefix(prefix=IPNetwork('10.0.0.0/27')),
+        )
+        Prefix.objects.bulk_create(prefixes)
+        IPRange.objects.create(
+            start_address=IPNetwork('10.0.0.20/24'),
+            end_address=IPNetwork('10.0.0.39/24'),
+            mark_utilized=True
+        )
+
+        def get_populated_sizes():
+            return [Prefix.objects.get(pk=prefix.pk)._populated_size for prefix in prefixes]
+
+        # Addresses are counted once, except within a utilized range contained by the prefix
+        ip1 = IPAddress.objects.create(address=IPNetwork('10.0.0.1/24'))
+        ip2 = IPAddress.objects.create(address=IPNetwork('10.0.0.1/24'))
+        ip3 = IPAddress.objects.create(address=IPNetwork('10.0.0.25/24'))
+        self.assertEqual(get_populated_sizes(), [21, 21, 2])
+
+        # Moving an address (including saving it twice) recalculates the affected prefixes
+        ip3.address = IPNetwork('10.0.0.45/24')
+        ip3.save()
+        ip3.save()
+        self.assertEqual(get_populated_sizes(), [22, 22, 1])
+
+        ip1.delete()
+        self.assertEqual(get_populated_sizes(), [22, 22, 1])
+        ip2.delete()
+        self.assertEqual(get_populated_sizes(), [21, 21, 0])
+
+        # Compare with a full recalculation
+        Prefix.objects.update_utilization()
+        self.assertEqual(get_populated_sizes(), [21, 21, 0])
+        for prefix in Prefix.objects.filter(pk__in=[prefix.pk for prefix in prefixes]):
+            self.assertEqual(prefix._utilization, prefix.get_utilization())
+
+    def assertUtilizationConsistent(self):
+        """
+        Compare the incrementally maintained utilization of all prefixes & aggregates with a full recalculation.
+        """
+        def get_utilization():
+            return (
+                {p.pk: (p._populated_size, p._child_size, p._utilization) for p in Prefix.objects.all()},
+                {a.pk: (a._child_size, a._utilization) for a in Aggregate.objects.all()},
+            )
+
+        utilization = get_utilization()
+        Prefix.objects.update_utilization()
+        Aggregate.objects.update_utilization()
+        self.assertEqual(utilization, get_utilization())
+
+    def test_child_size_incremental(self):
+        vrf = VRF.objects.create(name='VRF 1')
+        rir = RIR.objects.create(name='RIR 1', slug='rir-1')
+        aggregate = Aggregate.objects.create(prefix=IPNetwork('10.0.0.0/8'), rir=rir)
+        container = Prefix.objects.create(prefix=IPNetwork('10.0.0.0/16'), status=PrefixStatusChoices.STATUS_CONTAINER)
+        prefix1 = Prefix.objects.create(prefix=IPNetwork('10.0.0.0/24'))
+        Prefix.objects.create(prefix=IPNetwork('10.0.0.0/25'))
+        prefix3 = Prefix.objects.create(prefix=IPNetwork('10.0.1.0/24'), vrf=vrf)
+        IPAddress.objects.create(address=IPNetwork('10.0.0.1/24'))
+
+        container.refresh_from_db()
+        aggregate.refresh_from_db()
+        self.assertEqual(container._child_size, 256)
+        self.assertEqual(container._populated_size, 1)
+        self.assertEqual(aggregate._child_size, 65536)
+        self.assertUtilizationConsistent()
+
+        # Only the closest containing prefix counts a new child prefix
+        prefix4 = Prefix.objects.create(prefix=IPNetwork('10.0.0.0/20'))
+        container.refresh_from_db()
+        self.assertEqual(container._child_size, 4096)
+        self.assertUtilizationConsistent()
+
+        # A duplicate prefix does not change the space covered
+        Prefix.objects.create(prefix=IPNetwork('10.0.0.0/20'))
+        container.refresh_from_db()
+        self.assertEqual(container._child_size, 4096)
+        self.assertUtilizationConsistent()
+
+        # Move prefixes between VRFs and outside the container
+        prefix3.vrf = None
+        prefix3.save()
+        self.assertUtilizationConsistent()
+        prefix4.prefix = IPNetwork('10.1.0.0/20')
+        prefix4.save()
+        self.assertUtilizationConsistent()
+        container.prefix = IPNetwork('10.0.0.0/12')
+        container.save()
+        self.assertUtilizationConsistent()
+
+        # Delete prefixes, including one containing others
+        prefix3.delete()
+        self.assertUtilizationConsistent()
+        container.delete()
+        self.assertUtilizationConsistent()
+        aggregate.refresh_from_db()
+        self.assertEqual(aggregate._child_size, 4096 * 2)
+
+        # Changing the status of a prefix updates its own utilization
+        prefix1.status = PrefixStatusChoices.STATUS_CONTAINER
+        prefix1.save()
+        self.assertEqual(prefix1._utilization, 50)
+        self.assertUtilizationConsistent()
+
+        # Saving a prefix or aggregate without changing its prefix or utilization settings does not recalculate it
+        with patch('ipam.querysets.PrefixQuerySet.update_utilization') as update_prefix_utilization, \
+                patch('ipam.querysets.AggregateQuerySet.update_utilization') as update_aggregate_utilization:
+            prefix1.description = 'foo'
+            prefix1.save()
+            aggregate.description = 'foo'
+            aggregate.save()
+        update_prefix_utilization.assert_not_called()
+        update_aggregate_utilization.assert_not_called()
+
+    def test_range_size_incremental(self):
+        prefixes = (
+            Prefix.objects.create(prefix=IPNetwork('10.0.0.0/24')),
+            Prefix.objects.create(prefix=IPNetwork('10.0.0.0/26')),
+            Prefix.objects.create(prefix=IPNetwork('10.0.0.64/26')),
+        )
+        for i in (1, 10, 20, 30, 40, 70):
+            IPAddress.objects.create(address=IPNetwork(f'10.0.0.{i}/24'))
+
+        def get_populated_sizes():
+            return [Prefix.objects.get(pk=prefix.pk)._populated_size for prefix in prefixes]
+
+        # A utilized range replaces the addresses within it
+        range1 = IPRange.objects.create(
+            start_address=IPNetwork('10.0.0.5/24'),
+            end_address=IPNetwork('10.0.0.24/24'),
+            mark_utilized=True
+        )
+        self.assertEqual(get_populated_sizes(), [24, 23, 1])
+        self.assertUtilizationConsistent()
+
+        # Overlapping ranges
+        range2 = IPRange.objects.create(
+            start_address=IPNetwork('10.0.0.15/24'),
+            end_address=IPNetwork('10.0.0.80/24'),
+            mark_utilized=True
+        )
+        self.assertUtilizationConsistent()
+
+        # Resize, move, and toggle the ranges
+        range2.end_address = IPNetwork('10.0.0.35/24')
+        range2.save()
+        self.assertUtilizationConsistent()
+        range1.start_address = IPNetwork('10.0.0.65/24')
+        range1.end_address = IPNetwork('10.0.0.75/24')
+        range1.save()
+        self.assertUtilizationConsistent()
+        range2.mark_utilized = False
+        range2.save()
+        self.assertUtilizationConsistent()
+        range2.mark_utilized = True
+        range2.save()
+        self.assertUtilizationConsistent()
+
+        # Move an IP address into a range, then delete the ranges
+        ip = IPAddress.objects.get(address='10.0.0.1/24')
+        ip.address = IPNetwork('10.0.0.66/24')
+        ip.save()
+        self.assertUtilizationConsistent()
+        range1.delete()
+        self.assertUtilizationConsistent()
+        range2.delete()
+        self.assertEqual(get_populated_sizes(), [6, 4, 2])
+        self.assertUtilizationConsistent()
+
     #
     # Uniqueness enforcement tests
     #
@@ -470,6 +770,99 @@ class TestPrefixHierarchy(TestCase):
         self.assertEqual(prefixes[0]._depth, 0)
         self.assertEqual(prefixes[0]._children, 0)
 
+    def get_hierarchy(self, family=4):
+        return sorted(
+            (str(prefix.prefix), prefix._depth, prefix._children)
+            for prefix in Prefix.objects.filter(prefix__family=family)
+        )
+
+    def test_create_and_move_prefix_twice(self):
+        # Create 10.0.0.0/12, then move it to 10.0.0.0/20 and then to 10.1.0.0/16
+        p = Prefix(prefix='10.0.0.0/12')
+        p.save()
+        self.assertEqual(self.get_hierarchy(), [
+            ('10.0.0.0/12', 1, 2),
+            ('10.0.0.0/16', 2, 1),
+            ('10.0.0.0/24', 3, 0),
+            ('10.0.0.0/8', 0, 3),
+        ])
+
+        p.prefix = IPNetwork('10.0.0.0/20')
+        p.save()
+        self.assertEqual(self.get_hierarchy(), [
+            ('10.0.0.0/16', 1, 2),
+            ('10.0.0.0/20', 2, 1),
+            ('10.0.0.0/24', 3, 0),
+            ('10.0.0.0/8', 0, 3),
+        ])
+
+        p.prefix = IPNetwork('10.1.0.0/16')
+        p.save()
+        self.assertEqual(self.get_hierarchy(), [
+            ('10.0.0.0/16', 1, 1),
+            ('10.0.0.0/24', 2, 0),
+            ('10.0.0.0/8', 0, 3),
+            ('10.1.0.0/16', 1, 0),
+        ])
+
+        # Saving the prefix again without changes has no effect
+        p.save()
+        self.assertEqual(self.get_hierarchy(), [
+            ('10.0.0.0/16', 1, 1),
+            ('10.0.0.0/24', 2, 0),
+            ('10.0.0.0/8', 0, 3),
+            ('10.1.0.0/16', 1, 0),
+        ])
+
+    def test_move_prefix_and_back(self):
+        # Change 10.0.0.0/24 to 10.0.0.0/12, then back to 10.0.0.0/24
+        p = Prefix.objects.get(prefix='10.0.0.0/24')
+        p.prefix = IPNetwork('10.0.0.0/12')
+        p.save()
+        self.assertEqual(self.get_hierarchy(), [
+            ('10.0.0.0/12', 1, 1),
+            ('10.0.0.0/16', 2, 0),
+            ('10.0.0.0/8', 0, 2),
+        ])
+
+        p.prefix = IPNetwork('10.0.0.0/24')
+        p.save()
+        self.assertEqual(self.get_hierarchy(), [
+            ('10.0.0.0/16', 1, 1),
+            ('10.0.0.0/24', 2, 0),
+            ('10.0.0.0/8', 0, 2),
+        ])
+
+    def test_move_prefix_to_duplicate(self):
+        # Change 10.0.0.0/24 to 10.0.0.0/16, duplicating an existing prefix
+        p = Prefix.objects.get(prefix='10.0.0.0/24')
+        p.prefix = IPNetwork('10.0.0.0/16')
+        p.save()
+        self.assertEqual(self.get_hierarchy(), [
+            ('10.0.0.0/16', 1, 0),
+            ('10.0.0.0/16', 1, 0),
+            ('10.0.0.0/8', 0, 2),
+        ])
+
+        # Duplicate prefixes count once toward the depth of a new child
+        Prefix(prefix='10.0.0.0/20').save()
+        self.assertEqual(self.get_hierarchy(), [
+            ('10.0.0.0/16', 1, 1),
+            ('10.0.0.0/16', 1, 1),
+            ('10.0.0.0/20', 2, 0),
+            ('10.0.0.0/8', 0, 3),
+        ])
+
+        # Moving the duplicate away does not affect the depth of the child
+        p.prefix = IPNetwork('10.0.0.0/24')
+        p.save()
+        self.assertEqual(self.get_hierarchy(), [
+            ('10.0.0.0/16', 1, 2),
+            ('10.0.0.0/20', 2, 1),
+            ('10.0.0.0/24', 3, 0),
+            ('10.0.0.0/8', 0, 3),
+        ])
+
     def test_delete_prefix4(self):
         # Delete 10.0.0.0/16
         Prefix.objects.filter(prefix='10.0.0.0/16').delete()
@@ -530,6 +923,27 @@ class TestPrefixHierarchy(TestCase):
         self.assertEqual(prefixes[3]._depth, 2)
         self.assertEqual(prefixes[3]._children, 0)
 
+    def test_rebuild_prefixes(self):
+        # Bulk creation bypasses signals, leaving the hierarchy stale
+        Prefix.objects.bulk_create((
+            Prefix(prefix='10.0.0.0/16'),
+            Prefix(prefix='10.1.0.0/16'),
+        ))
+        Prefix.objects.update(_depth=0, _children=0)
+        self.assertEqual(rebuild_prefixes(None), 8)
+
+        prefixes = Prefix.objects.filter(prefix__family=4)
+        self.assertEqual(
+            [(str(p.prefix), p._depth, p._children) for p in prefixes],
+            [
+                ('10.0.0.0/8', 0, 4),
+                ('10.0.0.0/16', 1, 1),
+                ('10.0.0.0/16', 1, 1),
+                ('10.0.0.0/24', 2, 0),
+                ('10.1.0.0/16', 1, 0),
+            ]
+        )
+
 
 class TestIPAddress(TestCase):
 
@@ -629,6 +1043,27 @@ class TestVLANGroup(TestCase):
 
         available_vids = vlangroup.get_available_vids()
         self.assertListEqual(available_vids, list(range(104, 200)))
+        self.assertListEqual(vlangroup.get_available_vids(limit=3), [104, 105, 106])
+
+    def test_iter_available_vid_ranges(self):
+        vlangroup = VLANGroup.objects.create(
+            name='VLAN Group 2',
+            slug='vlan-group-2',
+            vid_ranges=string_to_ranges('10-19,100-3999'),
+        )
+        VLAN.objects.bulk_create((
+            VLAN(name='VLAN 5', vid=5, group=vlangroup),
+            VLAN(name='VLAN 10', vid=10, group=vlangroup),
+            VLAN(name='VLAN 15', vid=15, group=vlangroup),
+            VLAN(name='VLAN 16', vid=16, group=vlangroup),
+            VLAN(name='VLAN 19', vid=19, group=vlangroup),
+            VLAN(name='VLAN 50', vid=50, group=vlangroup),
+            VLAN(name='VLAN 3999', vid=3999, group=vlangroup),
+        ))
+        vlangroup.refresh_from_db()
+
+        # VIDs outside the group's ranges are ignored
+        self.assertListEqual(list(vlangroup.iter_available_vid_ranges()), [(11, 14), (17, 18), (100, 3998)])
 
     def test_get_next_available_vid(self):
         vlangroup = VLANGroup.objects.first()
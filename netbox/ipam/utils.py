@@ -1,20 +1,33 @@
+from collections import defaultdict
 from dataclasses import dataclass
+import heapq
 import netaddr
 
+from django.db import connection
+from django.db.models import Max, Value
+from django.db.models.functions import Cast
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
-from .constants import *
+from .fields import IPAddressField
+from .lookups import Host
 from .models import Prefix, VLAN
 
 __all__ = (
+    'AnnotatedIPSpace',
     'AvailableIPSpace',
     'add_available_vlans',
     'add_requested_prefixes',
-    'annotate_ip_space',
+    'allocate_prefixes',
+    'get_available_ip_ranges',
+    'get_next_available_ips',
     'get_next_available_prefix',
     'rebuild_prefixes',
 )
 
+# The number of prefixes to fetch and update at a time when rebuilding the prefix hierarchy
+REBUILD_BATCH_SIZE = 10000
+
 
 @dataclass
 class AvailableIPSpace:
@@ -63,124 +76,139 @@ def add_requested_prefixes(parent, prefix_list, show_available=True, show_assign
     return child_prefixes
 
 
-def annotate_ip_space(prefix):
-    # Compile child objects
-    records = []
-    records.extend([
-        (iprange.start_address.ip, iprange) for iprange in prefix.get_child_ranges(mark_populated=True)
-    ])
-    records.extend([
-        (ip.address.ip, ip) for ip in prefix.get_child_ips()
-    ])
-    records = sorted(records, key=lambda x: x[0])
-
-    # Determine the first & last valid IP addresses in the prefix
-    if prefix.family == 4 and prefix.mask_length < 31 and not prefix.is_pool:
-        # Ignore the network and broadcast addresses for non-pool IPv4 prefixes larger than /31
-        first_ip_in_prefix = netaddr.IPAddress(prefix.prefix.first + 1)
-        last_ip_in_prefix = netaddr.IPAddress(prefix.prefix.last - 1)
-    else:
-        first_ip_in_prefix = netaddr.IPAddress(prefix.prefix.first)
-        last_ip_in_prefix = netaddr.IPAddress(prefix.prefix.last)
-
-    if not records:
-        return [
-            AvailableIPSpace(
-                size=int(last_ip_in_prefix - first_ip_in_prefix + 1),
-                first_ip=f'{first_ip_in_prefix}/{prefix.mask_length}'
-            )
-        ]
-
-    output = []
-    prev_ip = None
-
-    # Account for any available IPs before the first real IP
-    if records[0][0] > first_ip_in_prefix:
-        output.append(AvailableIPSpace(
-            size=int(records[0][0] - first_ip_in_prefix),
-            first_ip=f'{first_ip_in_prefix}/{prefix.mask_length}'
-        ))
-
-    # Add IP ranges & addresses, annotating available space in between records
-    for record in records:
-        if prev_ip:
-            # Annotate available space
-            if (diff := int(record[0]) - int(prev_ip)) > 1:
-                first_skipped = f'{prev_ip + 1}/{prefix.mask_length}'
-                output.append(AvailableIPSpace(
-                    size=diff - 1,
-                    first_ip=first_skipped
-                ))
-
-        output.append(record[1])
-
-        # Update the previous IP address
-        if hasattr(record[1], 'end_address'):
-            prev_ip = record[1].end_address.ip
-        else:
-            prev_ip = record[0]
-
-    # Include any remaining available IPs
-    if prev_ip < last_ip_in_prefix:
-        output.append(AvailableIPSpace(
-            size=int(last_ip_in_prefix - prev_ip),
-            first_ip=f'{prev_ip + 1}/{prefix.mask_length}'
-        ))
-
-    return output
-
-
-def available_vlans_from_range(vlans, vlan_group, vid_range):
+class AnnotatedIPSpace:
     """
-    Create fake records for all gaps between used VLANs
+    A lazily evaluated sequence of the child IP addresses and populated IP ranges within a Prefix, ordered by address,
+    with AvailableIPSpace records representing the available space between them. Only the records within a requested
+    slice are retrieved from the database, so the cost of rendering a page is bounded by the page size rather than by
+    the number of child objects. The length of the sequence is the number of child IPs and ranges; AvailableIPSpace
+    records are not counted.
     """
-    min_vid = int(vid_range.lower) if vid_range else VLAN_VID_MIN
-    max_vid = int(vid_range.upper) if vid_range else VLAN_VID_MAX
-
-    if not vlans:
-        return [{
-            'vid': min_vid,
-            'vlan_group': vlan_group,
-            'available': max_vid - min_vid
-        }]
-
-    prev_vid = min_vid - 1
-    new_vlans = []
-    for vlan in vlans:
-
-        # Ignore VIDs outside the range
-        if not min_vid <= vlan.vid < max_vid:
-            continue
-
-        # Annotate any available VIDs between the previous (or minimum) VID
-        # and the current VID
-        if vlan.vid - prev_vid > 1:
-            new_vlans.append({
-                'vid': prev_vid + 1,
-                'vlan_group': vlan_group,
-                'available': vlan.vid - prev_vid - 1,
-            })
-
-        prev_vid = vlan.vid
-
-    # Annotate any remaining available VLANs
-    if prev_vid < max_vid:
-        new_vlans.append({
-            'vid': prev_vid + 1,
-            'vlan_group': vlan_group,
-            'available': max_vid - prev_vid - 1,
-        })
-
-    return new_vlans
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+        # Determine the first & last valid IP addresses in the prefix
+        if prefix.family == 4 and prefix.mask_length < 31 and not prefix.is_pool:
+            # Ignore the network and broadcast addresses for non-pool IPv4 prefixes larger than /31
+            self.first_ip = prefix.prefix.first + 1
+            self.last_ip = prefix.prefix.last - 1
+        else:
+            self.first_ip = prefix.prefix.first
+            self.last_ip = prefix.prefix.last
+
+    @cached_property
+    def ip_addresses(self):
+        return self.prefix.get_child_ips().order_by().annotate(
+            host=Cast(Host('address'), output_field=IPAddressField())
+        )
+
+    @cached_property
+    def ip_ranges(self):
+        return self.prefix.get_child_ranges(mark_populated=True).order_by().annotate(
+            host=Cast(Host('start_address'), output_field=IPAddressField()),
+            end_host=Cast(Host('end_address'), output_field=IPAddressField())
+        )
+
+    @cached_property
+    def count(self):
+        return self.ip_addresses.count() + self.ip_ranges.count()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("AnnotatedIPSpace supports only slicing")
+        start, stop, _ = key.indices(len(self))
+
+        # No child objects exist; the entire prefix is available
+        if not self.count:
+            return [self._get_available_space(None, self.last_ip)]
+        if start >= stop:
+            return []
+
+        # Retrieve the address, type (ranges before IPs), and ID of each record within the window, plus the next
+        # record (if any). Ordering by host address employs the same expression as the IPAddress host index.
+        records = list(
+            self.ip_ranges.annotate(kind=Value(0)).values_list('host', 'kind', 'pk').union(
+                self.ip_addresses.annotate(kind=Value(1)).values_list('host', 'kind', 'pk'),
+                all=True
+            ).order_by('host', 'kind', 'pk')[start:stop + 1]
+        )
+        next_record = records.pop() if len(records) > stop - start else None
+
+        ip_addresses = self.ip_addresses.filter(
+            pk__in=[pk for host, kind, pk in records if kind]
+        ).prefetch_related('vrf', 'tenant', 'tenant__group').in_bulk()
+        ip_ranges = self.ip_ranges.filter(
+            pk__in=[pk for host, kind, pk in records if not kind]
+        ).in_bulk()
+
+        # Find the last address occupied by any record preceding the window
+        prev_ip = None
+        if start:
+            first_host = records[0][0]
+            preceding = (
+                self.ip_addresses.filter(host__lt=first_host).aggregate(last=Max('host'))['last'],
+                self.ip_ranges.filter(host__lte=first_host).exclude(pk__in=list(ip_ranges)).aggregate(
+                    last=Max('end_host')
+                )['last'],
+            )
+            if preceding := [ip.value for ip in preceding if ip is not None]:
+                prev_ip = max(preceding)
+
+        # Add IP ranges & addresses, annotating available space in between records. Any available space preceding the
+        # window is included only on the first page, as it otherwise follows the last record of the preceding page.
+        output = []
+        for i, (host, kind, pk) in enumerate(records):
+            if i or not start:
+                if available := self._get_available_space(prev_ip, host.value - 1):
+                    output.append(available)
+            if kind:
+                output.append(ip_addresses[pk])
+                last_ip = host.value
+            else:
+                output.append(ip_ranges[pk])
+                last_ip = ip_ranges[pk].end_address.value
+            prev_ip = last_ip if prev_ip is None else max(prev_ip, last_ip)
+
+        # Include any remaining available IPs, up to the next record (if any)
+        last_ip = next_record[0].value - 1 if next_record else self.last_ip
+        if available := self._get_available_space(prev_ip, last_ip):
+            output.append(available)
+
+        return output
+
+    def _get_available_space(self, prev_ip, last_ip):
+        """
+        Return an AvailableIPSpace representing the IPs following prev_ip (or beginning at the first valid IP in the
+        prefix, if None) through last_ip. IPs are expressed as integers. Returns None if no space is available.
+        """
+        first_ip = self.first_ip if prev_ip is None else max(prev_ip + 1, self.first_ip)
+        last_ip = min(last_ip, self.last_ip)
+        if first_ip > last_ip:
+            return None
+        return AvailableIPSpace(
+            size=last_ip - first_ip + 1,
+            first_ip=f'{netaddr.IPAddress(first_ip, self.prefix.family)}/{self.prefix.mask_length}'
+        )
 
 
 def add_available_vlans(vlans, vlan_group):
     """
     Create fake records for all gaps between used VLANs
     """
-    new_vlans = []
-    for vid_range in vlan_group.vid_ranges:
-        new_vlans.extend(available_vlans_from_range(vlans, vlan_group, vid_range))
+    new_vlans = [
+        {
+            'vid': first_vid,
+            'vlan_group': vlan_group,
+            'available': last_vid - first_vid + 1,
+        }
+        for first_vid, last_vid in vlan_group.iter_available_vid_ranges()
+    ]
 
     vlans = list(vlans) + new_vlans
     vlans.sort(key=lambda v: v.vid if type(v) is VLAN else v['vid'])
@@ -188,9 +216,27 @@ def add_available_vlans(vlans, vlan_group):
     return vlans
 
 
+def bulk_update_hierarchy(updates):
+    """
+    Update the depth & child count of many Prefixes with a single query. Each update is a tuple of a Prefix ID, its
+    depth, and its number of children.
+    """
+    if not updates:
+        return
+    pks, depths, children = zip(*updates)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE "ipam_prefix" SET "_depth" = U0."depth", "_children" = U0."children" '
+            'FROM unnest(%s::bigint[], %s::smallint[], %s::bigint[]) AS U0("id", "depth", "children") '
+            'WHERE "ipam_prefix"."id" = U0."id"',
+            [list(pks), list(depths), list(children)]
+        )
+
+
 def rebuild_prefixes(vrf):
     """
-    Rebuild the prefix hierarchy for all prefixes in the specified VRF (or global table).
+    Rebuild the prefix hierarchy for all prefixes in the specified VRF (or global table). Prefixes are streamed from
+    the database in order, and updated in batches of REBUILD_BATCH_SIZE. Returns the number of prefixes rebuilt.
     """
     def contains(parent, child):
         return child in parent and child != parent
@@ -207,18 +253,22 @@ def rebuild_prefixes(vrf):
 
     stack = []
     update_queue = []
-    prefixes = Prefix.objects.filter(vrf=vrf).values('pk', 'prefix')
+    count = 0
+    prefixes = Prefix.objects.filter(vrf=vrf).order_by('prefix', 'pk').values('pk', 'prefix')
 
     # Iterate through all Prefixes in the VRF, growing and shrinking the stack as we go
-    for i, p in enumerate(prefixes):
+    for p in prefixes.iterator(chunk_size=REBUILD_BATCH_SIZE):
+        count += 1
 
         # Grow the stack if this is a child of the most recent prefix
         if not stack or contains(stack[-1]['prefix'], p['prefix']):
             push_to_stack(p)
 
-        # Handle duplicate prefixes
+        # Handle duplicate prefixes (which are counted as children of parent nodes)
         elif stack[-1]['prefix'] == p['prefix']:
             stack[-1]['pk'].append(p['pk'])
+            for n in stack[:-1]:
+                n['children'] += 1
 
         # If this is a sibling or parent of the most recent prefix, pop nodes from the
         # stack until we reach a parent prefix (or the root)
@@ -226,26 +276,138 @@ def rebuild_prefixes(vrf):
             while stack and not contains(stack[-1]['prefix'], p['prefix']):
                 node = stack.pop()
                 for pk in node['pk']:
-                    update_queue.append(
-                        Prefix(pk=pk, _depth=len(stack), _children=node['children'])
-                    )
+                    update_queue.append((pk, len(stack), node['children']))
             push_to_stack(p)
 
-        # Flush the update queue once it reaches 100 Prefixes
-        if len(update_queue) >= 100:
-            Prefix.objects.bulk_update(update_queue, ['_depth', '_children'])
+        # Flush the update queue once it reaches the batch size
+        if len(update_queue) >= REBUILD_BATCH_SIZE:
+            bulk_update_hierarchy(update_queue)
             update_queue = []
 
     # Clear out any prefixes remaining in the stack
     while stack:
         node = stack.pop()
         for pk in node['pk']:
-            update_queue.append(
-                Prefix(pk=pk, _depth=len(stack), _children=node['children'])
-            )
+            update_queue.append((pk, len(stack), node['children']))
 
     # Final flush of any remaining Prefixes
-    Prefix.objects.bulk_update(update_queue, ['_depth', '_children'])
+    bulk_update_hierarchy(update_queue)
+
+    return count
+
+
+def get_available_ip_ranges(first, last, occupied, limit=None):
+    """
+    Find the ranges of available IP addresses between two IP addresses (inclusive) within the database. Each occupied
+    queryset must return the first and last IP addresses (as INET values) of each occupied range. Returns a list of up
+    to `limit` (first, last) tuples in ascending order.
+
+    :param first: The first usable IP address
+    :param last: The last usable IP address
+    :param occupied: An iterable of querysets returning the first & last addresses of occupied ranges
+    :param limit: The maximum number of available ranges to return
+    """
+    subqueries = []
+    subquery_params = []
+    for queryset in occupied:
+        sql, params = queryset.query.sql_with_params()
+        subqueries.append(f'({sql})')
+        subquery_params.extend(params)
+    first, last = str(first), str(last)
+    if not subqueries:
+        return [(netaddr.IPAddress(first), netaddr.IPAddress(last))][:limit]
+
+    # Clamp each occupied range to the search bounds, then find the gaps between successive ranges (ordered by first
+    # address) which are not covered by any preceding range, plus any gap following the last range.
+    sql = (
+        'WITH occupied AS ('
+        '  SELECT GREATEST(U0."first", %s::inet) AS "first", LEAST(U0."last", %s::inet) AS "last" '
+        f' FROM ({" UNION ALL ".join(subqueries)}) U0 '
+        '  WHERE U0."first" <= %s::inet AND U0."last" >= %s::inet'
+        '), bounds AS ('
+        '  SELECT "first", '
+        '  MAX("last") OVER (ORDER BY "first" ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS "prev_last" '
+        '  FROM occupied'
+        ') '
+        'SELECT "first", "last" FROM ('
+        '  SELECT COALESCE("prev_last" + 1, %s::inet) AS "first", "first" - 1 AS "last" FROM bounds '
+        '  WHERE CASE '
+        '    WHEN "prev_last" IS NULL THEN "first" > %s::inet '
+        '    WHEN "prev_last" < "first" THEN "prev_last" + 1 < "first" '
+        '    ELSE false '
+        '  END '
+        '  UNION ALL '
+        '  SELECT CASE WHEN MAX("last") IS NULL THEN %s::inet WHEN MAX("last") < %s::inet THEN MAX("last") + 1 END, '
+        '  %s::inet '
+        '  FROM occupied '
+        '  HAVING MAX("last") IS NULL OR MAX("last") < %s::inet'
+        ') U1 '
+        'ORDER BY "first" '
+        'LIMIT %s'
+    )
+    params = [
+        first, last, *subquery_params, last, first,
+        first, first,
+        first, last, last, last,
+        limit,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            (netaddr.IPAddress(str(start)), netaddr.IPAddress(str(end))) for start, end in cursor.fetchall()
+        ]
+
+
+def get_next_available_ips(first, last, occupied, count=None):
+    """
+    Return a list of up to `count` available IP addresses between two IP addresses (inclusive), in ascending order.
+    (See get_available_ip_ranges().)
+    """
+    available_ips = []
+    for start, end in get_available_ip_ranges(first, last, occupied, limit=count or None):
+        for ip in netaddr.iter_iprange(start, end):
+            available_ips.append(ip)
+            if len(available_ips) == count:
+                return available_ips
+    return available_ips
+
+
+def allocate_prefixes(available_prefixes, prefix_lengths):
+    """
+    Plan the allocation of prefixes of the given lengths from a list of available prefixes (e.g. from
+    IPSet.iter_cidrs()). Requested prefixes are allocated from the largest to the smallest, each from the smallest
+    available block able to accommodate it (lowest address first), splitting larger blocks only as necessary. Returns
+    a list of the allocated prefixes in the order requested, or None if insufficient space is available.
+    """
+    if not available_prefixes:
+        return [] if not prefix_lengths else None
+    family = available_prefixes[0].version
+    width = 32 if family == 4 else 128
+
+    # Map each prefix length to a heap of the network addresses of available blocks of that length
+    available = defaultdict(list)
+    for prefix in available_prefixes:
+        heapq.heappush(available[prefix.prefixlen], prefix.first)
+
+    allocated_prefixes = [None] * len(prefix_lengths)
+    for i in sorted(range(len(prefix_lengths)), key=lambda i: prefix_lengths[i]):
+        prefix_length = prefix_lengths[i]
+
+        # Find the smallest available block which can accommodate the requested prefix
+        for block_length in range(prefix_length, -1, -1):
+            if available[block_length]:
+                break
+        else:
+            return None
+        network = heapq.heappop(available[block_length])
+
+        # Split the block down to the requested size, returning the upper half of each split to the available pool
+        for length in range(block_length + 1, prefix_length + 1):
+            heapq.heappush(available[length], network + (1 << (width - length)))
+
+        allocated_prefixes[i] = f'{netaddr.IPAddress(network, family)}/{prefix_length}'
+
+    return allocated_prefixes
 
 
 def get_next_available_prefix(ipset, prefix_size):
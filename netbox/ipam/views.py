@@ -4,6 +4,7 @@ from django.db.models.expressions import RawSQL
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
+from django_tables2.data import TableListData
 
 from circuits.models import Provider
 from dcim.filtersets import InterfaceFilterSet
@@ -21,7 +22,7 @@ from . import filtersets, forms, tables
 from .choices import PrefixStatusChoices
 from .constants import *
 from .models import *
-from .utils import add_requested_prefixes, add_available_vlans, annotate_ip_space
+from .utils import AnnotatedIPSpace, add_requested_prefixes, add_available_vlans
 
 
 #
@@ -640,7 +641,8 @@ class PrefixIPAddressesView(generic.ObjectChildrenView):
 
     def prep_table_data(self, request, queryset, parent):
         if not request.GET.get('q') and not get_table_ordering(request, self.table):
-            return annotate_ip_space(parent)
+            # Evaluate lazily, so that only the current page of IPs & available space is retrieved
+            return TableListData(AnnotatedIPSpace(parent))
         return queryset
 
     def get_extra_context(self, request, instance):
@@ -1,7 +1,17 @@
+import json
+from base64 import b64decode, b64encode
+
 from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.utils import encoders
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 from netbox.config import get_config
+from utilities.paginator import COUNT_MODE_DISABLED, COUNT_MODE_ESTIMATE, get_count_mode
+from utilities.query import get_estimated_count
 
 
 class OptionalLimitOffsetPagination(LimitOffsetPagination):
@@ -9,12 +19,36 @@ class OptionalLimitOffsetPagination(LimitOffsetPagination):
     Override the stock paginator to allow setting limit=0 to disable pagination for a request. This returns all objects
     matching a query, but retains the same format as a paginated request. The limit can only be disabled if
     MAX_PAGE_SIZE has been set to 0 or None.
+
+    Cursor-based pagination may be requested instead by passing the `cursor` query parameter (empty for the first
+    page). Objects are then ordered by ID, and each page is located by seeking past the last ID of the previous page
+    rather than by offset. The total count of objects is not calculated.
+
+    Counting all objects may also be skipped by passing `count=false`, or replaced with an estimate (for unfiltered
+    queries) by passing `count=estimate`.
+
+    When pagination has been disabled, the response may instead be streamed: objects are then retrieved, serialized
+    and written in chunks of `streaming_chunk_size`, rather than all at once.
     """
+    streaming_chunk_size = 1000
+    cursor_query_param = 'cursor'
+    cursor_query_description = _('The pagination cursor value. Pass an empty value to begin cursor-based pagination.')
+    invalid_cursor_message = _('Invalid cursor')
+
     def __init__(self):
         self.default_limit = get_config().PAGINATE_COUNT
+        self.use_cursor = False
+        self.next_cursor = None
+        self.has_next = None
 
     def paginate_queryset(self, queryset, request, view=None):
 
+        if isinstance(queryset, QuerySet) and self.cursor_query_param in request.query_params:
+            return self.paginate_queryset_by_cursor(queryset, request)
+
+        if isinstance(queryset, QuerySet) and (count_mode := get_count_mode(request)):
+            return self.paginate_queryset_without_count(queryset, request, estimate=count_mode == COUNT_MODE_ESTIMATE)
+
         if isinstance(queryset, QuerySet):
             self.count = self.get_queryset_count(queryset)
         else:
@@ -36,6 +70,100 @@ class OptionalLimitOffsetPagination(LimitOffsetPagination):
         else:
             return list(queryset[self.offset:])
 
+    def paginate_queryset_for_streaming(self, queryset, request):
+        """
+        Return a QuerySet of all objects beginning at the requested offset if the response may be streamed (i.e.
+        pagination has been disabled); otherwise, return None.
+        """
+        if not isinstance(queryset, QuerySet) or self.cursor_query_param in request.query_params:
+            return None
+
+        self.limit = self.get_limit(request)
+        if self.limit:
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+
+        count_mode = get_count_mode(request)
+        if count_mode == COUNT_MODE_DISABLED:
+            self.count = None
+        elif count_mode == COUNT_MODE_ESTIMATE:
+            self.count = get_estimated_count(queryset)
+        else:
+            self.count = self.get_queryset_count(queryset)
+
+        return queryset[self.offset:]
+
+    def get_streaming_response(self, data):
+        """
+        Return a StreamingHttpResponse which writes the paginated JSON response incrementally, given an iterable of
+        serialized objects.
+        """
+        def render(obj):
+            return json.dumps(obj, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+        def stream():
+            yield '{{"count":{},"next":{},"previous":{},"results":['.format(
+                render(self.count), render(self.get_next_link()), render(self.get_previous_link())
+            )
+            for i, obj in enumerate(data):
+                yield f',{render(obj)}' if i else render(obj)
+            yield ']}'
+
+        return StreamingHttpResponse(stream(), content_type='application/json')
+
+    def paginate_queryset_without_count(self, queryset, request, estimate=False):
+        """
+        Return the requested page of objects without counting all objects. An estimated count is reported if
+        `estimate` is True; otherwise, the count is omitted.
+        """
+        self.count = get_estimated_count(queryset) if estimate else None
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        self.request = request
+
+        if not self.limit:
+            return list(queryset[self.offset:])
+
+        # Retrieve one additional object to determine whether another page follows
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+
+        return results[:self.limit]
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        """
+        Return the page of objects following the object identified by the cursor (if any), ordered by ID.
+        """
+        self.use_cursor = True
+        self.count = None
+        self.limit = self.get_limit(request)
+        self.request = request
+
+        if cursor := request.query_params[self.cursor_query_param]:
+            queryset = queryset.filter(pk__gt=self.decode_cursor(cursor))
+        queryset = queryset.order_by('pk')
+
+        if not self.limit:
+            return list(queryset)
+
+        # Retrieve one additional object to determine whether another page follows
+        results = list(queryset[:self.limit + 1])
+        if len(results) > self.limit:
+            results = results[:self.limit]
+            self.next_cursor = self.encode_cursor(results[-1].pk)
+
+        return results
+
+    def encode_cursor(self, pk):
+        return b64encode(str(pk).encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, cursor):
+        try:
+            return int(b64decode(cursor.encode('ascii'), validate=True).decode('ascii'))
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
     def get_limit(self, request):
         if self.limit_query_param:
             MAX_PAGE_SIZE = get_config().MAX_PAGE_SIZE
@@ -59,20 +187,66 @@ class OptionalLimitOffsetPagination(LimitOffsetPagination):
 
     def get_next_link(self):
 
+        if self.use_cursor:
+            if not self.next_cursor:
+                return None
+            url = self.request.build_absolute_uri()
+            url = remove_query_param(url, self.offset_query_param)
+            url = replace_query_param(url, self.limit_query_param, self.limit)
+            return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
         # Pagination has been disabled
         if not self.limit:
             return None
 
+        # The count of objects is unknown or inexact
+        if self.has_next is not None:
+            if not self.has_next:
+                return None
+            url = self.request.build_absolute_uri()
+            url = replace_query_param(url, self.limit_query_param, self.limit)
+            return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
         return super().get_next_link()
 
     def get_previous_link(self):
 
-        # Pagination has been disabled
-        if not self.limit:
+        # Pagination has been disabled, or a cursor is in use (only forward traversal is supported)
+        if not self.limit or self.use_cursor:
             return None
 
         return super().get_previous_link()
 
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        # The count is omitted when using a cursor or count=false
+        response_schema['properties']['count']['nullable'] = True
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            *super().get_schema_operation_parameters(view),
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': str(self.cursor_query_description),
+                'schema': {
+                    'type': 'string',
+                },
+            },
+            {
+                'name': 'count',
+                'required': False,
+                'in': 'query',
+                'description': 'Pass "false" to omit the total count of objects, or "estimate" to estimate it.',
+                'schema': {
+                    'type': 'string',
+                    'enum': [COUNT_MODE_DISABLED, COUNT_MODE_ESTIMATE],
+                },
+            },
+        ]
+
 
 class StripCountAnnotationsPaginator(OptionalLimitOffsetPagination):
     """
@@ -89,6 +89,7 @@ class BaseViewSet(GenericViewSet):
 class NetBoxReadOnlyModelViewSet(
     mixins.CustomFieldsMixin,
     mixins.ExportTemplatesMixin,
+    mixins.StreamingListMixin,
     drf_mixins.RetrieveModelMixin,
     drf_mixins.ListModelMixin,
     BaseViewSet
@@ -102,6 +103,7 @@ class NetBoxModelViewSet(
     mixins.ObjectValidationMixin,
     mixins.CustomFieldsMixin,
     mixins.ExportTemplatesMixin,
+    mixins.StreamingListMixin,
     drf_mixins.CreateModelMixin,
     drf_mixins.RetrieveModelMixin,
     drf_mixins.UpdateModelMixin,
@@ -1,3 +1,5 @@
+from itertools import islice
+
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import router, transaction
 from django.http import Http404
@@ -6,6 +8,7 @@ from rest_framework.response import Response
 
 from core.models import ObjectType
 from extras.models import ExportTemplate
+from netbox.api.pagination import OptionalLimitOffsetPagination
 from netbox.api.serializers import BulkOperationSerializer
 
 __all__ = (
@@ -15,6 +18,7 @@ __all__ = (
     'ExportTemplatesMixin',
     'ObjectValidationMixin',
     'SequentialBulkCreatesMixin',
+    'StreamingListMixin',
 )
 
 
@@ -50,6 +54,30 @@ class ExportTemplatesMixin:
         return super().list(request, *args, **kwargs)
 
 
+class StreamingListMixin:
+    """
+    Stream the JSON response for list views when pagination has been disabled (limit=0). Objects are retrieved and
+    serialized in chunks, with any prefetches applied to each chunk, rather than all being held in memory at once.
+    """
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == 'json' and isinstance(self.paginator, OptionalLimitOffsetPagination):
+            queryset = self.filter_queryset(self.get_queryset())
+            if (queryset := self.paginator.paginate_queryset_for_streaming(queryset, request)) is not None:
+                return self.paginator.get_streaming_response(self.serialize_chunks(queryset))
+
+        return super().list(request, *args, **kwargs)
+
+    def serialize_chunks(self, queryset):
+        """
+        Yield the serialized representation of each object in the QuerySet, retrieving objects in chunks.
+        """
+        chunk_size = self.paginator.streaming_chunk_size
+        context = self.get_serializer_context()
+        objects = queryset.iterator(chunk_size=chunk_size)
+        while chunk := list(islice(objects, chunk_size)):
+            yield from self.get_serializer(chunk, many=True, context=context).data
+
+
 class SequentialBulkCreatesMixin:
     """
     Perform bulk creation of new objects sequentially, rather than all at once. This ensures that any validation
@@ -1,20 +1,24 @@
 import logging
+import uuid
 from collections import defaultdict
 
 from django.conf import settings
 from django.contrib.auth.backends import ModelBackend, RemoteUserBackend as _RemoteUserBackend
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
 from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 
-from users.constants import CONSTRAINT_TOKEN_USER
 from users.models import Group, ObjectPermission, User
 from utilities.permissions import (
-    permission_is_exempt, qs_filter_from_constraints, resolve_permission, resolve_permission_type,
+    permission_is_exempt, qs_filter_for_permission, resolve_permission, resolve_permission_type,
 )
 from .misc import _mirror_groups
 
+OBJECT_PERMISSIONS_VERSION_CACHE_KEY = 'object_permissions_version'
+
 AUTH_BACKEND_ATTRS = {
     # backend name: title, MDI icon name
     'amazon': ('Amazon AWS', 'aws'),
@@ -63,15 +67,71 @@ def get_saml_idps():
     return getattr(settings, "SOCIAL_AUTH_SAML_ENABLED_IDPS", {}).keys()
 
 
+class ObjectPermissionCache:
+    """
+    A process-level cache of the permissions granted to each user, along with the QuerySet filters compiled from their
+    constraints. The cache is cleared whenever invalidate_object_permissions() has been called (in any process) since
+    it was last populated, as indicated by a version key stored in the cache.
+    """
+    def __init__(self):
+        self.entries = {}
+        self.version = None
+
+    def clear(self):
+        self.entries = {}
+
+    def get(self, key, build):
+        """
+        Return the permissions and compiled filters cached under the given key, calling build() to retrieve the
+        permissions if they are not present.
+        """
+        version = cache.get(OBJECT_PERMISSIONS_VERSION_CACHE_KEY)
+        if version != self.version:
+            self.clear()
+            self.version = version
+        if (entry := self.entries.get(key)) is None:
+            entry = (dict(build()), {})
+            # Retain the entry only if it reflects committed data
+            if not connection.in_atomic_block:
+                self.entries[key] = entry
+        return entry
+
+
+object_permission_cache = ObjectPermissionCache()
+
+
+def invalidate_object_permissions():
+    """
+    Invalidate the cached permissions of all users in the current process immediately, and in all other processes once
+    the current transaction has been committed.
+    """
+    object_permission_cache.clear()
+    transaction.on_commit(lambda: cache.set(OBJECT_PERMISSIONS_VERSION_CACHE_KEY, uuid.uuid4().hex, None))
+
+
 class ObjectPermissionMixin:
 
     def get_all_permissions(self, user_obj, obj=None):
         if not user_obj.is_active or user_obj.is_anonymous:
             return dict()
         if not hasattr(user_obj, '_object_perm_cache'):
-            user_obj._object_perm_cache = self.get_object_permissions(user_obj)
+            if self.can_cache_permissions(user_obj):
+                user_obj._object_perm_cache, user_obj._object_perm_filters = object_permission_cache.get(
+                    (self.__class__, user_obj.pk),
+                    lambda: self.get_object_permissions(user_obj)
+                )
+            else:
+                user_obj._object_perm_cache = self.get_object_permissions(user_obj)
+                user_obj._object_perm_filters = {}
         return user_obj._object_perm_cache
 
+    def can_cache_permissions(self, user_obj):
+        """
+        Return True if the user's permissions are determined solely by the database, and thus may be cached across
+        requests.
+        """
+        return True
+
     def get_permission_filter(self, user_obj):
         return Q(users=user_obj) | Q(groups__user=user_obj)
 
@@ -140,10 +200,7 @@ class ObjectPermissionMixin:
             ))
 
         # Compile a QuerySet filter that matches all instances of the specified model
-        tokens = {
-            CONSTRAINT_TOKEN_USER: user_obj,
-        }
-        qs_filter = qs_filter_from_constraints(object_permissions[perm], tokens)
+        qs_filter = qs_filter_for_permission(user_obj, perm)
 
         # Permission to perform the requested action on the object depends on whether the specified object matches
         # the specified constraints. Note that this check is made against the *database* record representing the object,
@@ -325,6 +382,10 @@ try:
                 permission_filter = permission_filter | Q(groups__name__in=user_obj.ldap_user.group_names)
             return permission_filter
 
+        def can_cache_permissions(self, user_obj):
+            # Permissions may be granted by membership in LDAP groups
+            return not self.settings.FIND_GROUP_PERMS
+
     # Patch with our modified _mirror_groups() method to support our custom Group model
     _LDAPUser._mirror_groups = _mirror_groups
 
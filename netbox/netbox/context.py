@@ -3,8 +3,10 @@ from contextvars import ContextVar
 __all__ = (
     'current_request',
     'events_queue',
+    'search_cache_queue',
 )
 
 
 current_request = ContextVar('current_request', default=None)
 events_queue = ContextVar('events_queue', default=dict())
+search_cache_queue = ContextVar('search_cache_queue', default=None)
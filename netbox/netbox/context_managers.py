@@ -1,6 +1,12 @@
+from collections import defaultdict
 from contextlib import contextmanager
 
-from netbox.context import current_request, events_queue
+from django.conf import settings
+from django_rq import get_queue
+
+from netbox.config import get_config
+from netbox.constants import RQ_QUEUE_DEFAULT
+from netbox.context import current_request, events_queue, search_cache_queue
 from netbox.utils import register_request_processor
 from extras.events import flush_events
 
@@ -26,3 +32,33 @@ def event_tracking(request):
     # Clear context vars
     current_request.set(None)
     events_queue.set({})
+
+
+@register_request_processor
+@contextmanager
+def search_cache_tracking(request):
+    """
+    If SEARCH_CACHE_ASYNC is enabled, collect the objects created, updated, or deleted while processing a request,
+    then enqueue a single background job to re-index them in the search cache before returning the response.
+
+    :param request: WSGIRequest object with a unique `id` set
+    """
+    if not settings.SEARCH_CACHE_ASYNC:
+        yield
+        return
+
+    search_cache_queue.set(defaultdict(set))
+
+    try:
+        yield
+
+        # Enqueue a job to re-index all affected objects
+        if queue := search_cache_queue.get():
+            rq_queue = get_queue(get_config().QUEUE_MAPPINGS.get('search', RQ_QUEUE_DEFAULT))
+            rq_queue.enqueue(
+                'netbox.search.backends.cache_objects',
+                objects={object_type_id: list(object_ids) for object_type_id, object_ids in queue.items()}
+            )
+    finally:
+        # Clear context var
+        search_cache_queue.set(None)
@@ -2,7 +2,9 @@ from collections import defaultdict
 
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
 from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
 from django.db.models import F, Window, Q, prefetch_related_objects
 from django.db.models.fields.related import ForeignKey
 from django.db.models.functions import window
@@ -14,6 +16,7 @@ from netaddr.core import AddrFormatError
 
 from core.models import ObjectType
 from extras.models import CachedValue, CustomField
+from netbox.context import search_cache_queue
 from netbox.registry import registry
 from utilities.object_types import object_type_identifier
 from utilities.querysets import RestrictedPrefetch
@@ -62,14 +65,38 @@ class SearchBackend:
         """
         Receiver for the post_save signal, responsible for caching object creation/changes.
         """
+        if self.defer(instance):
+            return
         self.cache(instance, remove_existing=not created)
 
     def removal_handler(self, sender, instance, **kwargs):
         """
         Receiver for the post_delete signal, responsible for caching object deletion.
         """
+        if self.defer(instance):
+            return
         self.remove(instance)
 
+    def defer(self, instance):
+        """
+        If deferred caching is active for the current request (see SEARCH_CACHE_ASYNC), queue the given instance to
+        be re-indexed by a background job and return True. Otherwise, return False.
+        """
+        queue = search_cache_queue.get()
+        if queue is None:
+            return False
+
+        # Ignore non-cacheable objects
+        try:
+            get_indexer(instance)
+        except KeyError:
+            return True
+
+        object_type = ContentType.objects.get_for_model(instance)
+        queue[object_type.pk].add(instance.pk)
+
+        return True
+
     def cache(self, instances, indexer=None, remove_existing=True):
         """
         Create or update the cached representation of an instance.
@@ -82,6 +109,18 @@ class SearchBackend:
         """
         raise NotImplementedError
 
+    def reindex(self, object_type, object_ids):
+        """
+        Refresh the cached representations of the specified objects, removing any which no longer exist.
+        """
+        raise NotImplementedError
+
+    def remove_stale(self, object_type):
+        """
+        Delete any cached data pertaining to objects of the given type which no longer exist.
+        """
+        raise NotImplementedError
+
     def clear(self, object_types=None):
         """
         Delete *all* cached data (optionally filtered by object type).
@@ -105,9 +144,10 @@ class SearchBackend:
 
 class CachedValueSearchBackend(SearchBackend):
 
-    def search(self, value, user=None, object_types=None, lookup=DEFAULT_LOOKUP_TYPE):
-
-        # Build the filter used to find relevant CachedValue records
+    def get_query_filter(self, value, object_types=None, lookup=DEFAULT_LOOKUP_TYPE):
+        """
+        Return a Q object used to find CachedValue records matching the given value.
+        """
         query_filter = Q(**{f'value__{lookup}': value})
         if object_types:
             # Limit results by object type
@@ -125,15 +165,28 @@ class CachedValueSearchBackend(SearchBackend):
             except (AddrFormatError, ValueError):
                 pass
 
-        # Construct the base queryset to retrieve matching results
-        queryset = CachedValue.objects.filter(query_filter).annotate(
+        return query_filter
+
+    def get_queryset(self, value, object_types=None, lookup=DEFAULT_LOOKUP_TYPE):
+        """
+        Return a queryset of CachedValues matching the given value, annotated with the rank (`row_number`) of each
+        result for its object.
+        """
+        query_filter = self.get_query_filter(value, object_types=object_types, lookup=lookup)
+
+        return CachedValue.objects.filter(query_filter).annotate(
             # Annotate the rank of each result for its object according to its weight
             row_number=Window(
                 expression=window.RowNumber(),
                 partition_by=[F('object_type'), F('object_id')],
                 order_by=[F('weight').asc()],
             )
-        )[:MAX_RESULTS]
+        )
+
+    def search(self, value, user=None, object_types=None, lookup=DEFAULT_LOOKUP_TYPE):
+
+        # Construct the base queryset to retrieve matching results
+        queryset = self.get_queryset(value, object_types=object_types, lookup=lookup)[:MAX_RESULTS]
 
         # Gather all ObjectTypes present in the search results (used for prefetching related
         # objects). This must be done before generating the final results list, which returns
@@ -253,6 +306,29 @@ class CachedValueSearchBackend(SearchBackend):
         # Call _raw_delete() on the queryset to avoid first loading instances into memory
         return qs._raw_delete(using=qs.db)
 
+    def reindex(self, object_type, object_ids):
+        model = object_type.model_class()
+        try:
+            indexer = get_indexer(model)
+        except KeyError:
+            return 0
+
+        # Delete any existing cache entries in a single query, then regenerate them for objects which still exist
+        qs = CachedValue.objects.filter(object_type=object_type, object_id__in=object_ids)
+        qs._raw_delete(using=qs.db)
+        instances = model.objects.filter(pk__in=object_ids)
+
+        return self.cache(instances.iterator(), indexer=indexer, remove_existing=False)
+
+    def remove_stale(self, object_type):
+        model = object_type.model_class()
+        qs = CachedValue.objects.filter(object_type=object_type).exclude(
+            object_id__in=model.objects.values('pk')
+        )
+
+        # Call _raw_delete() on the queryset to avoid first loading instances into memory
+        return qs._raw_delete(using=qs.db)
+
     def clear(self, object_types=None):
         qs = CachedValue.objects.all()
         if object_types:
@@ -272,6 +348,50 @@ class CachedValueSearchBackend(SearchBackend):
         return CachedValue.objects.count()
 
 
+class PostgreSQLSearchBackend(CachedValueSearchBackend):
+    """
+    Extends CachedValueSearchBackend to leverage PostgreSQL full text search and trigram matching. Partial matches
+    employ the trigram and full text GIN indexes maintained on CachedValue, and results for each object are ranked
+    within the database by weight and relevance.
+    """
+    search_config = 'simple'
+
+    def get_search_vector(self):
+        # Must match the expression used by the extras_cachedvalue_value_fts index
+        return SearchVector('value', config=self.search_config)
+
+    def get_query_filter(self, value, object_types=None, lookup=DEFAULT_LOOKUP_TYPE):
+        query_filter = super().get_query_filter(value, object_types=object_types, lookup=lookup)
+
+        # Match partial values against the full text index as well (e.g. multiple words in any order)
+        if lookup == LookupTypes.PARTIAL:
+            fts_filter = Q(search=SearchQuery(value, config=self.search_config))
+            if object_types:
+                fts_filter &= Q(object_type__in=object_types)
+            query_filter |= fts_filter
+
+        return query_filter
+
+    def get_queryset(self, value, object_types=None, lookup=DEFAULT_LOOKUP_TYPE):
+        query_filter = self.get_query_filter(value, object_types=object_types, lookup=lookup)
+        rank = (
+            SearchRank(self.get_search_vector(), SearchQuery(value, config=self.search_config)) +
+            TrigramSimilarity('value', value)
+        )
+
+        return CachedValue.objects.alias(
+            search=self.get_search_vector()
+        ).filter(query_filter).annotate(
+            rank=rank,
+            # Annotate the rank of each result for its object according to its weight and relevance
+            row_number=Window(
+                expression=window.RowNumber(),
+                partition_by=[F('object_type'), F('object_id')],
+                order_by=[F('weight').asc(), F('rank').desc()],
+            )
+        ).order_by('weight', '-rank')
+
+
 def get_backend():
     """
     Initializes and returns the configured search backend.
@@ -285,6 +405,19 @@ def get_backend():
     return backend_cls()
 
 
+def cache_objects(objects):
+    """
+    Background job which re-indexes the given objects in the search cache.
+
+    Args:
+        objects: A dictionary mapping ContentType IDs to lists of object IDs
+    """
+    with transaction.atomic():
+        for object_type_id, object_ids in objects.items():
+            object_type = ContentType.objects.get_for_id(object_type_id)
+            search_backend.reindex(object_type, object_ids)
+
+
 search_backend = get_backend()
 
 # Connect handlers to the appropriate model signals
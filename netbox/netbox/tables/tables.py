@@ -21,7 +21,7 @@ from netbox.constants import EMPTY_TABLE_TEXT
 from netbox.registry import registry
 from netbox.tables import columns
 from utilities.html import highlight
-from utilities.paginator import EnhancedPaginator, get_paginate_count
+from utilities.paginator import EnhancedPaginator, get_count_mode, get_paginate_count
 from utilities.string import title
 from utilities.views import get_viewname
 from .template_code import *
@@ -182,7 +182,8 @@ class BaseTable(tables.Table):
         # Paginate the table results
         paginate = {
             'paginator_class': EnhancedPaginator,
-            'per_page': get_paginate_count(request)
+            'per_page': get_paginate_count(request),
+            'count_mode': get_count_mode(request),
         }
         tables.RequestConfig(request, paginate).configure(self)
 
@@ -1,7 +1,9 @@
 import uuid
 
 from django.urls import reverse
+from rest_framework import status
 
+from dcim.models import Site
 from utilities.testing import APITestCase
 
 
@@ -26,3 +28,63 @@ class AppTest(APITestCase):
         response = self.client.get(f'{url}?format=api', **self.header)
 
         self.assertEqual(response.status_code, 200)
+
+
+class PaginationTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Site.objects.bulk_create([
+            Site(name=f'Site {i}', slug=f'site-{i}') for i in range(1, 6)
+        ])
+
+    def test_cursor_pagination(self):
+        self.add_permissions('dcim.view_site')
+        site_ids = list(Site.objects.order_by('pk').values_list('pk', flat=True))
+
+        # Traverse all sites two at a time
+        url = f"{reverse('dcim-api:site-list')}?cursor=&limit=2"
+        results = []
+        while url:
+            response = self.client.get(url, **self.header)
+            self.assertHttpStatus(response, status.HTTP_200_OK)
+            self.assertIsNone(response.data['count'])
+            self.assertIsNone(response.data['previous'])
+            self.assertLessEqual(len(response.data['results']), 2)
+            results.extend(site['id'] for site in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(results, site_ids)
+
+        # Invalid cursors are rejected
+        response = self.client.get(f"{reverse('dcim-api:site-list')}?cursor=foo", **self.header)
+        self.assertHttpStatus(response, status.HTTP_404_NOT_FOUND)
+
+    def test_count_disabled(self):
+        self.add_permissions('dcim.view_site')
+        url = reverse('dcim-api:site-list')
+
+        response = self.client.get(f'{url}?count=false&limit=3', **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertIsNone(response.data['count'])
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIn('offset=3', response.data['next'])
+
+        response = self.client.get(response.data['next'], **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+
+    def test_count_estimate(self):
+        self.add_permissions('dcim.view_site')
+        url = reverse('dcim-api:site-list')
+
+        # Filtered queries are counted exactly
+        response = self.client.get(url, {'count': 'estimate', 'name': 'Site 1'}, **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+
+        response = self.client.get(f'{url}?count=estimate&limit=3', **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertIsInstance(response.data['count'], int)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNotNone(response.data['next'])
@@ -1,6 +1,10 @@
 import datetime
+import uuid
+from unittest.mock import Mock, patch
 
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client
 from django.test.utils import override_settings
 from django.urls import reverse
@@ -8,6 +12,7 @@ from rest_framework.test import APIClient
 
 from core.models import ObjectType
 from dcim.models import Rack, Site
+from netbox.authentication import OBJECT_PERMISSIONS_VERSION_CACHE_KEY, ObjectPermissionCache, object_permission_cache
 from users.models import Group, ObjectPermission, Token, User
 from utilities.testing import TestCase
 from utilities.testing.api import APITestCase
@@ -578,3 +583,43 @@ class ObjectPermissionAPIViewTestCase(TestCase):
         url = reverse('dcim-api:rack-detail', kwargs={'pk': self.racks[0].pk})
         response = self.client.delete(url, format='json', **self.header)
         self.assertEqual(response.status_code, 204)
+
+
+class ObjectPermissionCacheTestCase(TestCase):
+
+    def test_cache_invalidation(self):
+        permission_cache = ObjectPermissionCache()
+        build = Mock(return_value={'dcim.view_site': [{'name': 'Site 1'}]})
+
+        # Simulate operating outside a transaction, so that entries are retained
+        with patch.object(connection, 'in_atomic_block', False):
+            permissions, filters = permission_cache.get('key', build)
+            self.assertEqual(permissions, {'dcim.view_site': [{'name': 'Site 1'}]})
+            self.assertEqual(filters, {})
+            permission_cache.get('key', build)
+            self.assertEqual(build.call_count, 1)
+
+            # Changing the version (as in another process) invalidates the cache
+            cache.set(OBJECT_PERMISSIONS_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+            permission_cache.get('key', build)
+            self.assertEqual(build.call_count, 2)
+
+    def test_invalidate_on_change(self):
+        user = User.objects.create(username='testuser')
+        object_permission_cache.entries['key'] = ({}, {})
+
+        obj_perm = ObjectPermission.objects.create(name='Test permission', actions=['view'])
+        self.assertEqual(object_permission_cache.entries, {})
+
+        object_permission_cache.entries['key'] = ({}, {})
+        obj_perm.users.add(user)
+        self.assertEqual(object_permission_cache.entries, {})
+
+        object_permission_cache.entries['key'] = ({}, {})
+        obj_perm.object_types.add(ObjectType.objects.get_for_model(Site))
+        self.assertEqual(object_permission_cache.entries, {})
+
+        group = Group.objects.create(name='Group 1')
+        object_permission_cache.entries['key'] = ({}, {})
+        user.groups.add(group)
+        self.assertEqual(object_permission_cache.entries, {})
@@ -1,10 +1,22 @@
+import uuid
+from concurrent.futures import Future
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import django_rq
 from django.contrib.contenttypes.models import ContentType
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
 
 from dcim.models import Site
 from dcim.search import SiteIndex
+from extras.management.commands import reindex
 from extras.models import CachedValue
-from netbox.search.backends import search_backend
+from netbox.context import search_cache_queue
+from netbox.context_managers import search_cache_tracking
+from netbox.search.backends import PostgreSQLSearchBackend, cache_objects, search_backend
 
 
 class SearchBackendTestCase(TestCase):
@@ -151,3 +163,177 @@ class SearchBackendTestCase(TestCase):
         self.assertEqual(len(results), 1)
         results = search_backend.search('xxxxx')
         self.assertEqual(len(results), 0)
+
+    @override_settings(SEARCH_CACHE_ASYNC=True)
+    def test_cache_async(self):
+        """
+        Test that objects saved or deleted during a request are re-indexed by a single background job.
+        """
+        queue = django_rq.get_queue('default')
+        queue.empty()
+        request = RequestFactory().get('/')
+        request.id = uuid.uuid4()
+        content_type = ContentType.objects.get_for_model(Site)
+        search_backend.cache(Site.objects.all())
+
+        with search_cache_tracking(request):
+            site = Site.objects.first()
+            site.description = 'foo'
+            site.save()
+            site.description = 'bar'
+            site.save()
+            Site.objects.last().delete()
+            site4 = Site.objects.create(name='Site 4', slug='site-4')
+
+        # Cache should not have been updated yet
+        self.assertFalse(
+            CachedValue.objects.filter(object_type=content_type, object_id=site4.pk).exists()
+        )
+        self.assertEqual(queue.count, 1, msg="Expected a single job")
+        job = queue.get_jobs()[0]
+        self.assertEqual(len(job.kwargs['objects'][content_type.pk]), 3)
+        queue.empty()
+
+        # Run the job
+        cache_objects(**job.kwargs)
+        self.assertEqual(
+            CachedValue.objects.filter(object_type=content_type, object_id=site.pk, field='description').get().value,
+            'bar'
+        )
+        self.assertEqual(CachedValue.objects.filter(object_type=content_type).values('object_id').distinct().count(), 3)
+
+    @override_settings(SEARCH_CACHE_ASYNC=True)
+    def test_cache_async_exception(self):
+        """
+        Test that deferred caching is deactivated if an exception is raised while processing a request.
+        """
+        request = RequestFactory().get('/')
+        request.id = uuid.uuid4()
+
+        with self.assertRaises(ValueError):
+            with search_cache_tracking(request):
+                self.assertIsNotNone(search_cache_queue.get())
+                raise ValueError()
+        self.assertIsNone(search_cache_queue.get())
+
+
+class SynchronousExecutor:
+    """
+    Stand-in for ProcessPoolExecutor which runs submitted functions immediately within the current process. (Forked
+    workers cannot see data created within a test's transaction.)
+    """
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+    def shutdown(self):
+        pass
+
+
+@patch.object(reindex, 'CHUNK_SIZE', 2)
+class ReindexCommandTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Site.objects.bulk_create([
+            Site(name=f'Site {i}', slug=f'site-{i}', description=f'Description {i}') for i in range(1, 8)
+        ])
+
+    def setUp(self):
+        self.content_type = ContentType.objects.get_for_model(Site)
+        search_backend.clear()
+
+    def get_cached_values(self):
+        return set(
+            CachedValue.objects.filter(object_type=self.content_type).values_list('object_id', 'field', 'value')
+        )
+
+    def get_cached_ids(self):
+        return set(CachedValue.objects.filter(object_type=self.content_type).values_list('object_id', flat=True))
+
+    def test_since(self):
+        sites = list(Site.objects.order_by('pk'))
+        Site.objects.filter(pk__in=[site.pk for site in sites[:4]]).update(
+            last_updated=timezone.now() - timedelta(days=2)
+        )
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+
+        call_command('reindex', 'dcim.site', since=since, stdout=StringIO())
+        self.assertEqual(self.get_cached_ids(), {site.pk for site in sites[4:]})
+
+    def test_resume(self):
+        site_ids = list(Site.objects.order_by('pk').values_list('pk', flat=True))
+        reindex_chunk = reindex.reindex_chunk
+        chunks = []
+
+        def interrupt_after_first_chunk(object_type_id, object_ids):
+            if chunks:
+                raise RuntimeError()
+            chunks.append(object_ids)
+            return reindex_chunk(object_type_id, object_ids)
+
+        # Interrupt the run after the first chunk has been reindexed
+        with patch.object(reindex, 'reindex_chunk', interrupt_after_first_chunk):
+            with self.assertRaises(RuntimeError):
+                call_command('reindex', 'dcim.site', stdout=StringIO())
+        self.assertEqual(chunks, [site_ids[:2]])
+        self.assertEqual(self.get_cached_ids(), set(site_ids[:2]))
+
+        # Resuming the run reindexes only the remaining objects
+        with patch.object(reindex, 'reindex_chunk', wraps=reindex_chunk) as mock_reindex_chunk:
+            call_command('reindex', 'dcim.site', resume=True, stdout=StringIO())
+        resumed_ids = [pk for call in mock_reindex_chunk.call_args_list for pk in call.args[1]]
+        self.assertEqual(resumed_ids, site_ids[2:])
+        self.assertEqual(self.get_cached_ids(), set(site_ids))
+
+    @patch.object(reindex, 'ProcessPoolExecutor', SynchronousExecutor)
+    @patch.object(reindex.connections, 'close_all')
+    def test_workers(self, mock_close_all):
+        call_command('reindex', 'dcim.site', workers=1, stdout=StringIO())
+        cached_values = self.get_cached_values()
+        self.assertEqual(len({object_id for object_id, field, value in cached_values}), 7)
+
+        search_backend.clear()
+        call_command('reindex', 'dcim.site', workers=3, stdout=StringIO())
+        self.assertTrue(mock_close_all.called)
+        self.assertEqual(self.get_cached_values(), cached_values)
+
+
+class PostgreSQLSearchBackendTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        sites = (
+            Site(name='Site 1', slug='site-1', description='First test site'),
+            Site(name='Site 2', slug='site-2', description='Second test site'),
+            Site(name='Site 3', slug='site-3', description='Third test site'),
+        )
+        Site.objects.bulk_create(sites)
+
+        cls.backend = PostgreSQLSearchBackend()
+        cls.backend.cache(Site.objects.all())
+
+    def test_search(self):
+        """
+        Test various searches.
+        """
+        results = self.backend.search('site')
+        self.assertEqual(len(results), 3)
+        results = self.backend.search('first')
+        self.assertEqual(len(results), 1)
+        results = self.backend.search('site first')
+        self.assertEqual(len(results), 1)
+        results = self.backend.search('xxxxx')
+        self.assertEqual(len(results), 0)
+
+    def test_search_ranking(self):
+        """
+        Test that results are ordered by weight, and that each object is returned only once.
+        """
+        results = self.backend.search('site')
+        self.assertEqual(len({r.object_id for r in results}), 3)
+        self.assertEqual([r.field for r in results], ['name', 'name', 'name'])
@@ -1,11 +1,12 @@
 import logging
 
 from django.contrib.auth.signals import user_login_failed
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
+from netbox.authentication import invalidate_object_permissions
 from netbox.config import get_config
-from users.models import User, UserConfig
+from users.models import Group, ObjectPermission, User, UserConfig
 from utilities.request import get_client_ip
 
 
@@ -31,3 +32,29 @@ def create_userconfig(instance, created, raw=False, **kwargs):
     if created and not raw:
         config = get_config()
         UserConfig(user=instance, data=config.DEFAULT_USER_PREFERENCES).save()
+
+
+#
+# Object permissions cache
+#
+
+@receiver((post_save, post_delete), sender=ObjectPermission)
+@receiver(post_delete, sender=Group)
+def handle_objectpermission_changed(sender, instance, **kwargs):
+    """
+    Invalidate cached permissions when an ObjectPermission is created, modified, or deleted, or when a Group is deleted.
+    """
+    invalidate_object_permissions()
+
+
+@receiver(m2m_changed, sender=ObjectPermission.object_types.through)
+@receiver(m2m_changed, sender=User.object_permissions.through)
+@receiver(m2m_changed, sender=Group.object_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+def handle_objectpermission_assignments_changed(sender, instance, action, **kwargs):
+    """
+    Invalidate cached permissions when ObjectPermissions are assigned to or removed from users or groups, when object
+    types are assigned to or removed from an ObjectPermission, or when users are added to or removed from groups.
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_object_permissions()
@@ -1,20 +1,32 @@
-from django.core.paginator import Paginator, Page
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator, Page
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
 
 from netbox.config import get_config
+from utilities.query import get_estimated_count
 
 __all__ = (
+    'COUNT_MODE_DISABLED',
+    'COUNT_MODE_ESTIMATE',
     'EnhancedPage',
     'EnhancedPaginator',
+    'get_count_mode',
     'get_paginate_count',
 )
 
+# Values of the `count` query parameter
+COUNT_MODE_DISABLED = 'false'
+COUNT_MODE_ESTIMATE = 'estimate'
+
 
 class EnhancedPaginator(Paginator):
     default_page_lengths = (
         25, 50, 100, 250, 500, 1000
     )
 
-    def __init__(self, object_list, per_page, orphans=None, **kwargs):
+    def __init__(self, object_list, per_page, orphans=None, count_mode=None, **kwargs):
+        self.count_mode = count_mode
 
         # Determine the page size
         try:
@@ -24,8 +36,10 @@ class EnhancedPaginator(Paginator):
         except ValueError:
             per_page = get_config().PAGINATE_COUNT
 
-        # Set orphans count based on page size
-        if orphans is None and per_page <= 50:
+        # Set orphans count based on page size. Orphans cannot be merged into the last page if the count is unknown.
+        if count_mode in (COUNT_MODE_DISABLED, COUNT_MODE_ESTIMATE):
+            orphans = 0
+        elif orphans is None and per_page <= 50:
             orphans = 5
         elif orphans is None:
             orphans = 10
@@ -35,6 +49,58 @@ class EnhancedPaginator(Paginator):
     def _get_page(self, *args, **kwargs):
         return EnhancedPage(*args, **kwargs)
 
+    def _get_queryset(self):
+        """
+        Return the QuerySet being paginated (unwrapping table rows, if necessary), or None.
+        """
+        object_list = self.object_list
+        # BoundRows wrap TableData, which wraps the QuerySet
+        while not isinstance(object_list, QuerySet) and hasattr(object_list, 'data'):
+            object_list = object_list.data
+        return object_list if isinstance(object_list, QuerySet) else None
+
+    @cached_property
+    def estimated_count(self):
+        """
+        Return the approximate number of objects, for display only. Pagination never relies on an estimate.
+        """
+        if (queryset := self._get_queryset()) is not None:
+            return get_estimated_count(queryset)
+        return len(self.object_list)
+
+    @property
+    def display_count(self):
+        """
+        Return the count of objects for display: approximate if estimated, or None if the count is unknown.
+        """
+        if self.count_mode == COUNT_MODE_DISABLED:
+            return None
+        if self.count_mode == COUNT_MODE_ESTIMATE:
+            return f'~{self.estimated_count}'
+        return self.count
+
+    def page(self, number):
+        if self.count_mode not in (COUNT_MODE_DISABLED, COUNT_MODE_ESTIMATE):
+            return super().page(number)
+
+        # Without counting all objects, retrieve one additional object to determine whether another page follows
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        bottom = (number - 1) * self.per_page
+        object_list = [obj for obj in self.object_list[bottom:bottom + self.per_page + 1]]
+        if not object_list and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+
+        # The count is known only up to the end of this page (plus one object, if another page follows)
+        self.__dict__['count'] = bottom + len(object_list)
+        self.__dict__.pop('num_pages', None)
+
+        return self._get_page(object_list[:self.per_page], number, self)
+
     def get_page_lengths(self):
         if self.per_page not in self.default_page_lengths:
             return sorted([*self.default_page_lengths, self.per_page])
@@ -62,6 +128,17 @@ class EnhancedPage(Page):
         return page_list
 
 
+def get_count_mode(request):
+    """
+    Return the counting mode requested by the `count` query parameter: COUNT_MODE_DISABLED to skip counting objects,
+    COUNT_MODE_ESTIMATE to estimate the count of unfiltered objects, or None to count objects exactly.
+    """
+    count_mode = request.GET.get('count')
+    if count_mode in (COUNT_MODE_DISABLED, COUNT_MODE_ESTIMATE):
+        return count_mode
+    return None
+
+
 def get_paginate_count(request):
     """
     Determine the desired length of a page, using the following in order:
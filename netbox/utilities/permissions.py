@@ -8,6 +8,7 @@ from users.constants import CONSTRAINT_TOKEN_USER
 __all__ = (
     'get_permission_for_model',
     'permission_is_exempt',
+    'qs_filter_for_permission',
     'qs_filter_from_constraints',
     'resolve_permission',
     'resolve_permission_type',
@@ -112,3 +113,21 @@ def qs_filter_from_constraints(constraints, tokens=None):
             return Q()
 
     return params
+
+
+def qs_filter_for_permission(user, perm):
+    """
+    Return the Q filter compiled from the constraints of all ObjectPermissions granting the specified permission to the
+    user. Compiled filters are cached alongside the user's permissions (see ObjectPermissionMixin).
+
+    Args:
+        user: The User, whose permissions have been retrieved by get_all_permissions()
+        perm: Permission name in the format <app_label>.<action>_<model>
+    """
+    filters = user.__dict__.setdefault('_object_perm_filters', {})
+    if perm not in filters:
+        tokens = {
+            CONSTRAINT_TOKEN_USER: user,
+        }
+        filters[perm] = qs_filter_from_constraints(user._object_perm_cache[perm], tokens)
+    return filters[perm]
@@ -1,3 +1,4 @@
+from django.db import connections
 from django.db.models import Count, OuterRef, Subquery, QuerySet
 from django.db.models.functions import Coalesce
 
@@ -6,6 +7,7 @@ from utilities.mptt import TreeManager
 __all__ = (
     'count_related',
     'dict_to_filter_params',
+    'get_estimated_count',
     'reapply_model_ordering',
 )
 
@@ -27,6 +29,29 @@ def count_related(model, field):
     return Coalesce(subquery, 0)
 
 
+def get_estimated_count(queryset):
+    """
+    Return the approximate number of objects in an unfiltered QuerySet, as estimated by PostgreSQL's table statistics,
+    to avoid a full scan of the table. An exact count is returned if the QuerySet is filtered (or otherwise restricted)
+    or if the table has not yet been analyzed.
+    """
+    query = queryset.query
+    if query.where or query.distinct or query.combinator or query.is_sliced:
+        return queryset.count()
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            'SELECT "reltuples" FROM "pg_class" WHERE "oid" = %s::regclass',
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+
+    # reltuples is -1 for tables which have never been vacuumed or analyzed
+    if row is None or row[0] < 0:
+        return queryset.count()
+    return int(row[0])
+
+
 def dict_to_filter_params(d, prefix=''):
     """
     Translate a dictionary of attributes to a nested set of parameters suitable for QuerySet filtering. For example:
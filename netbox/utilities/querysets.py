@@ -1,7 +1,8 @@
-from django.db.models import Prefetch, QuerySet
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch, Q, QuerySet
+from django.db.models.constants import LOOKUP_SEP
 
-from users.constants import CONSTRAINT_TOKEN_USER
-from utilities.permissions import get_permission_for_model, permission_is_exempt, qs_filter_from_constraints
+from utilities.permissions import get_permission_for_model, permission_is_exempt, qs_filter_for_permission
 
 __all__ = (
     'RestrictedPrefetch',
@@ -35,6 +36,38 @@ class RestrictedPrefetch(Prefetch):
         return params
 
 
+def _is_multivalued_lookup(model, lookup):
+    """
+    Return True if the given filter lookup (e.g. "site__region__slug") traverses any multi-valued relationship (i.e. a
+    many-to-many relationship or the reverse side of a foreign key) and thus may match an object more than once.
+    """
+    for name in lookup.split(LOOKUP_SEP):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # The remainder of the lookup is a transform or lookup type (e.g. "in")
+            return False
+        if not field.is_relation:
+            return False
+        if field.many_to_many or field.one_to_many or field.related_model is None:
+            return True
+        model = field.related_model
+    return False
+
+
+def _has_multivalued_lookups(model, q):
+    """
+    Return True if any of the lookups within the given Q object traverses a multi-valued relationship.
+    """
+    for child in q.children:
+        if isinstance(child, Q):
+            if _has_multivalued_lookups(model, child):
+                return True
+        elif _is_multivalued_lookup(model, child[0]):
+            return True
+    return False
+
+
 class RestrictedQuerySet(QuerySet):
 
     def restrict(self, user, action='view'):
@@ -58,13 +91,14 @@ class RestrictedQuerySet(QuerySet):
 
         # Filter the queryset to include only objects with allowed attributes
         else:
-            tokens = {
-                CONSTRAINT_TOKEN_USER: user,
-            }
-            attrs = qs_filter_from_constraints(user._object_perm_cache[permission_required], tokens)
-            # #8715: Avoid duplicates when JOIN on many-to-many fields without using DISTINCT.
-            # DISTINCT acts globally on the entire request, which may not be desirable.
-            allowed_objects = self.model.objects.filter(attrs)
-            qs = self.filter(pk__in=allowed_objects)
+            attrs = qs_filter_for_permission(user, permission_required)
+            if _has_multivalued_lookups(self.model, attrs):
+                # #8715: Avoid duplicates when JOIN on many-to-many fields without using DISTINCT.
+                # DISTINCT acts globally on the entire request, which may not be desirable.
+                allowed_objects = self.model.objects.filter(attrs)
+                qs = self.filter(pk__in=allowed_objects)
+            else:
+                # Constraints which match each object at most once are applied directly to the query
+                qs = self.filter(attrs)
 
         return qs
@@ -1,3 +1,6 @@
+import json
+from unittest.mock import patch
+
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from drf_spectacular.drainage import GENERATOR_STATS
@@ -8,6 +11,7 @@ from dcim.models import Region, Site
 from extras.choices import CustomFieldTypeChoices
 from extras.models import CustomField
 from ipam.models import VLAN
+from netbox.api.pagination import OptionalLimitOffsetPagination
 from netbox.config import get_config
 from utilities.testing import APITestCase, disable_warnings
 
@@ -181,11 +185,26 @@ class APIPaginationTestCase(APITestCase):
     def test_max_page_size_disabled(self):
         response = self.client.get(f'{self.url}?limit=0', format='json', **self.header)
 
+        # The response is streamed when pagination is disabled
         self.assertHttpStatus(response, status.HTTP_200_OK)
-        self.assertEqual(response.data['count'], 100)
-        self.assertIsNone(response.data['next'])
-        self.assertIsNone(response.data['previous'])
-        self.assertEqual(len(response.data['results']), 100)
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['count'], 100)
+        self.assertIsNone(data['next'])
+        self.assertIsNone(data['previous'])
+        self.assertEqual(len(data['results']), 100)
+
+    @override_settings(MAX_PAGE_SIZE=0)
+    @patch.object(OptionalLimitOffsetPagination, 'streaming_chunk_size', 30)
+    def test_streaming_chunks(self):
+        site_ids = list(Site.objects.order_by('name').values_list('pk', flat=True))
+        response = self.client.get(f'{self.url}?limit=0&offset=5&ordering=name', format='json', **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['count'], 100)
+        self.assertIsNone(data['previous'])
+        self.assertEqual([site['id'] for site in data['results']], site_ids[5:])
 
 
 class APIOrderingTestCase(APITestCase):
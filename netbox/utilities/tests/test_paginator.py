@@ -0,0 +1,63 @@
+from unittest.mock import patch
+
+from django.core.paginator import EmptyPage
+from django.test import TestCase
+
+from dcim.models import Site
+from utilities.paginator import COUNT_MODE_DISABLED, COUNT_MODE_ESTIMATE, EnhancedPaginator
+
+
+class EnhancedPaginatorTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Site.objects.bulk_create([
+            Site(name=f'Site {i}', slug=f'site-{i}') for i in range(1, 6)
+        ])
+
+    def get_paginator(self, count_mode=None):
+        return EnhancedPaginator(Site.objects.order_by('pk'), 2, count_mode=count_mode)
+
+    def test_count_exact(self):
+        paginator = self.get_paginator()
+        page = paginator.page(3)
+
+        self.assertEqual(len(page), 1)
+        self.assertFalse(page.has_next())
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertEqual(paginator.display_count, 5)
+
+    def test_count_disabled(self):
+        paginator = self.get_paginator(count_mode=COUNT_MODE_DISABLED)
+
+        page = paginator.page(1)
+        self.assertEqual(len(page), 2)
+        self.assertTrue(page.has_next())
+        self.assertIsNone(paginator.display_count)
+
+        page = paginator.page(3)
+        self.assertEqual(len(page), 1)
+        self.assertFalse(page.has_next())
+
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
+
+    @patch('utilities.paginator.get_estimated_count', return_value=1000)
+    def test_count_estimate(self, _):
+        paginator = self.get_paginator(count_mode=COUNT_MODE_ESTIMATE)
+
+        # The estimate is displayed, but pages are determined by the objects actually retrieved
+        page = paginator.page(1)
+        self.assertEqual(len(page), 2)
+        self.assertTrue(page.has_next())
+        self.assertEqual(paginator.display_count, '~1000')
+
+        page = paginator.page(3)
+        self.assertEqual(len(page), 1)
+        self.assertFalse(page.has_next())
+        self.assertEqual(paginator.count, 5)
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertEqual(paginator.display_count, '~1000')
+
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
@@ -0,0 +1,58 @@
+from django.test import TestCase, override_settings
+
+from core.models import ObjectType
+from dcim.models import Region, Site
+from extras.models import Tag
+from users.models import ObjectPermission, User
+
+
+class RestrictedQuerySetTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        regions = (
+            Region.objects.create(name='Region 1', slug='region-1'),
+            Region.objects.create(name='Region 2', slug='region-2'),
+        )
+        sites = (
+            Site(name='Site 1', slug='site-1', region=regions[0]),
+            Site(name='Site 2', slug='site-2', region=regions[0]),
+            Site(name='Site 3', slug='site-3', region=regions[1]),
+        )
+        Site.objects.bulk_create(sites)
+
+        tags = (
+            Tag.objects.create(name='Tag 1', slug='tag-1'),
+            Tag.objects.create(name='Tag 2', slug='tag-2'),
+        )
+        sites[0].tags.set(tags)
+        sites[2].tags.set(tags)
+
+    def restrict(self, *constraints):
+        user = User.objects.create(username=f'user{User.objects.count()}')
+        obj_perm = ObjectPermission.objects.create(
+            name='Test permission',
+            actions=['view'],
+            constraints=list(constraints)
+        )
+        obj_perm.users.add(user)
+        obj_perm.object_types.add(ObjectType.objects.get_for_model(Site))
+        return Site.objects.restrict(user, 'view')
+
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=[])
+    def test_single_valued_constraints(self):
+        # Constraints on local fields and foreign keys are applied directly
+        qs = self.restrict({'region__slug': 'region-1'}, {'name': 'Site 3'})
+        self.assertNotIn('SELECT U0', str(qs.query))
+        self.assertEqual(sorted(qs.values_list('name', flat=True)), ['Site 1', 'Site 2', 'Site 3'])
+
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=[])
+    def test_multivalued_constraints(self):
+        # Constraints spanning many-to-many relationships are applied via a subquery to avoid duplicate results
+        qs = self.restrict({'tags__slug__in': ['tag-1', 'tag-2']})
+        self.assertIn('SELECT U0', str(qs.query))
+        self.assertEqual(sorted(qs.values_list('name', flat=True)), ['Site 1', 'Site 3'])
+
+        qs = self.restrict({'name': 'Site 2'}, {'tags__slug': 'tag-1'})
+        self.assertIn('SELECT U0', str(qs.query))
+        self.assertEqual(sorted(qs.values_list('name', flat=True)), ['Site 1', 'Site 2', 'Site 3'])